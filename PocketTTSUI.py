@@ -1,11 +1,31 @@
-﻿import gc
+﻿import argparse
+import collections
+import concurrent.futures
+import contextlib
+import gc
+import hashlib
+import http.server
+import io
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
+import queue
 import re
+import shutil
+import socket
+import sqlite3
+import struct
 import subprocess
 import sys
+import tempfile
 import threading
 import time
 import traceback
+import unicodedata
+import urllib.parse
+import urllib.request
 import webbrowser
 import tkinter as tk
 
@@ -22,13 +42,19 @@ scipy_wav = None
 torch = None
 TTSModel = None
 POCKET_AVAILABLE = False
-_libs_loaded = False
+import_times = {}
+startup_timings = {}
+_libs_lock = threading.Lock()
+_started = time.perf_counter()
 
 DEFAULT_CHUNK_SIZE = 100
 SAMPLE_TEXT = (
     "Greetings Human, I am here to tell you a cat fact. "
     "Did you know that cats sleep for 70% of their lives?"
 )
+PREVIEW_CHUNKS = 20
+WARMUP_TEXT = "Hello there."
+WARMUP_STATUS = "Warming up model..."
 VOICE_OPTIONS = [
     "alba",
     "marius",
@@ -40,40 +66,97 @@ VOICE_OPTIONS = [
     "azelma",
 ]
 
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "chunks")
+DEFAULT_CACHE_MB = 2048
+DEFAULT_VOICE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "voices")
+DEFAULT_AUDITION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "auditions")
+AUDITION_CACHE_MB = 256
+DEFAULT_WEB_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "web")
+CRAWL_MODES = ("page", "next", "toc")
+CRAWL_CONNECTIONS = 4
+CRAWL_MAX_PAGES = 500
+URL_TIMEOUT = 20
+PHRASE_MEMO_MB = 64
+DEFAULT_PAUSE_MS = 350
+DEFAULT_LOUDNESS_DBFS = -20.0
+DEFAULT_CROSSFADE_MS = 10
+SILENCE_FLOOR_DB = -40.0
+MAX_GAIN_DB = 12.0
+PEAK_CEILING_DBFS = -1.0
+AUDITION_TEMPERATURES = (0.5, 0.7, 1.0)
+AUDITION_SPEEDS = (1.0, 1.25)
+DEFAULT_OUTPUT_ROOT = os.path.dirname(os.path.abspath(__file__))
+BOOK_FORMATS = ("mp3", "m4b")
+CHUNKING_MODES = ("greedy", "stable")
+CHUNK_ANCHOR_MIN_SHARE = 0.6
+CHUNK_ANCHOR_SPAN_SHARE = 0.3
+CHAPTER_DIR = "chapters"
+SEGMENT_DIR = "segments"
+SPOOL_FILE = "chunks.pcm"
+SPOOL_EXTENT_MB = 64
+SPOOL_SAMPLE_BYTES = 2
+SPOOL_COMPACT_SHARE = 0.25
+CHAPTER_BITRATE = "64k"
+QUEUE_POLL_SECONDS = 2.0
+QUEUE_STALE_SECONDS = 60
+QUEUE_REFRESH_MS = 1000
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8765
+DEFAULT_SERVER_URL = os.environ.get("POCKET_TTS_SERVER", f"http://{DEFAULT_SERVER_HOST}:{DEFAULT_SERVER_PORT}")
+
 pocket_model = None
-is_model_loading = False
+model_ready = threading.Event()
+_model_load_lock = threading.Lock()
 stop_event = threading.Event()
+chunk_cache = None
+audition_cache = None
+metrics_log = None
+web_cache = None
+phrase_memo = None
+audio_polish = None
+chunk_format = "float32"
 
 
-def _ensure_libs_loaded():
-    global np, fitz, requests, BeautifulSoup, ebooklib, epub
-    global sf, scipy_wav, torch, TTSModel, POCKET_AVAILABLE, _libs_loaded
-    if _libs_loaded:
-        return
-
+def _import_audio_libs():
+    global np, sf, scipy_wav
     import numpy
     np = numpy
 
+    import soundfile as _soundfile
+    sf = _soundfile
+
+    import scipy.io.wavfile as _wavfile
+    scipy_wav = _wavfile
+
+
+def _import_pdf_libs():
+    global fitz
     import fitz as _fitz
     fitz = _fitz
 
-    import requests as _requests
-    requests = _requests
-
-    from bs4 import BeautifulSoup as _bs
-    BeautifulSoup = _bs
 
+def _import_epub_libs():
+    global ebooklib, epub
     import ebooklib as _ebooklib
     ebooklib = _ebooklib
     from ebooklib import epub as _epub
     epub = _epub
 
-    import soundfile as _soundfile
-    sf = _soundfile
 
-    import scipy.io.wavfile as _wavfile
-    scipy_wav = _wavfile
+def _import_html_libs():
+    global BeautifulSoup
+    from bs4 import BeautifulSoup as _bs
+    BeautifulSoup = _bs
+
+
+def _import_web_libs():
+    global requests
+    import requests as _requests
+    requests = _requests
+
 
+def _import_model_libs():
+    global torch, TTSModel, POCKET_AVAILABLE
     try:
         from pocket_tts import TTSModel as _tts_model
         import torch as _torch
@@ -85,257 +168,3809 @@ def _ensure_libs_loaded():
         POCKET_AVAILABLE = False
         print("WARNING: PocketTTS or Torch not found. Install them first.")
 
-    _libs_loaded = True
+
+LIB_LOADERS = {
+    "audio": _import_audio_libs,
+    "pdf": _import_pdf_libs,
+    "epub": _import_epub_libs,
+    "html": _import_html_libs,
+    "web": _import_web_libs,
+    "model": _import_model_libs,
+}
+
+
+def ensure_libs(*features):
+    # Each feature's stack is imported the first time something needs it, so
+    # opening a .txt file never pays for PyMuPDF, ebooklib or requests.
+    for feature in features:
+        if feature in import_times:
+            continue
+        with _libs_lock:
+            if feature in import_times:
+                continue
+            started = time.perf_counter()
+            LIB_LOADERS[feature]()
+            import_times[feature] = round(time.perf_counter() - started, 4)
 
 
 def ensure_model_loaded():
-    global pocket_model, is_model_loading
-    if pocket_model is not None:
+    global pocket_model
+    if model_ready.is_set():
         return True
 
-    if is_model_loading:
-        while is_model_loading:
-            time.sleep(0.5)
-        return pocket_model is not None
-
-    is_model_loading = True
-    _ensure_libs_loaded()
-    try:
-        print("[System] Loading PocketTTS model...")
-        pocket_model = TTSModel.load_model()
-        print("[System] Model loaded successfully (CPU).")
-    except Exception as exc:
-        print(f"[System] Failed to load model: {exc}")
-        pocket_model = None
-    finally:
-        is_model_loading = False
+    # Callers arriving during a load block on the lock until it finishes
+    # instead of polling.
+    with _model_load_lock:
+        if model_ready.is_set():
+            return True
+        ensure_libs("audio", "model")
+        try:
+            print("[System] Loading PocketTTS model...")
+            started = time.perf_counter()
+            pocket_model = TTSModel.load_model()
+            startup_timings["model_load"] = round(time.perf_counter() - started, 4)
+            print(f"[System] Model loaded successfully (CPU) in {startup_timings['model_load']:.2f}s.")
+            model_ready.set()
+        except Exception as exc:
+            print(f"[System] Failed to load model: {exc}")
+            pocket_model = None
 
     return pocket_model is not None
 
 
-def split_text_into_chunks(words, original_chunk_size, wiggle_room=20):
-    def is_sentence_end(word):
-        return word[-1] in ".!?" if word else False
+def warm_up_model(ref_audio_path="", voice_name=VOICE_OPTIONS[0]):
+    if not ensure_model_loaded():
+        return None
+    started = time.perf_counter()
+    state = prepare_voice_state(ref_audio_path, voice_name)
+    startup_timings["voice_state"] = round(time.perf_counter() - started, 4)
+    started = time.perf_counter()
+    _generate_pocket_safe(state, WARMUP_TEXT)
+    startup_timings["first_generation"] = round(time.perf_counter() - started, 4)
+    return report_startup()
+
+
+def report_startup():
+    report = {"imports": dict(import_times), **startup_timings}
+    parts = ["imports " + (", ".join(f"{name} {seconds:.2f}s" for name, seconds in import_times.items()) or "none")]
+    for key, label in (("window", "window"), ("model_load", "model load"), ("voice_state", "voice"), ("first_generation", "first generation")):
+        if key in startup_timings:
+            parts.append(f"{label} {startup_timings[key]:.2f}s")
+    print("[System] Startup: " + "; ".join(parts))
+    if metrics_log is not None:
+        metrics_log.record({"event": "startup", **report})
+    return report
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = collections.Counter()
+        self.calls = collections.Counter()
+        self.saved = collections.Counter()
+        self.reused = collections.Counter()
+        self.audio_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.seconds[name] += elapsed
+                self.calls[name] += 1
+
+    def add_audio(self, seconds):
+        with self._lock:
+            self.audio_seconds += seconds
+
+    def add_saved(self, name, seconds):
+        with self._lock:
+            self.saved[name] += seconds
+            self.reused[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.seconds), dict(self.calls), self.audio_seconds, dict(self.saved), dict(self.reused)
+
+    def since(self, snapshot):
+        seconds, calls, audio_seconds, saved, reused = snapshot
+        with self._lock:
+            return {
+                "stages": {name: self.seconds[name] - seconds.get(name, 0.0) for name in self.seconds if self.calls[name] > calls.get(name, 0)},
+                "calls": {name: self.calls[name] - calls.get(name, 0) for name in self.calls if self.calls[name] > calls.get(name, 0)},
+                "audio_s": self.audio_seconds - audio_seconds,
+                "saved": {name: self.saved[name] - saved.get(name, 0.0) for name in self.saved if self.reused[name] > reused.get(name, 0)},
+                "reused": {name: self.reused[name] - reused.get(name, 0) for name in self.reused if self.reused[name] > reused.get(name, 0)},
+            }
+
+
+stage_timer = StageTimer()
+
+
+class RenderMetrics:
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.words = 0
+        self.chars = 0
+        self.audio_seconds = 0.0
+        self.statuses = collections.Counter()
+        self.stages = collections.Counter()
+        self.calls = collections.Counter()
+        self.saved = collections.Counter()
+        self.reused = collections.Counter()
+
+    def add_stages(self, delta):
+        self.stages.update(delta["stages"])
+        self.calls.update(delta["calls"])
+        self.saved.update(delta.get("saved", {}))
+        self.reused.update(delta.get("reused", {}))
+        self.audio_seconds += delta["audio_s"]
+
+    def add_chunk(self, idx, chunk_text, status, elapsed, delta):
+        words = len(chunk_text.split())
+        self.statuses[status] += 1
+        if status != "failed":
+            self.words += words
+            self.chars += len(chunk_text)
+        self.add_stages(delta)
+        if metrics_log is not None:
+            metrics_log.record(
+                {
+                    "event": "chunk",
+                    "render": self.label,
+                    "chunk": idx + 1,
+                    "status": status,
+                    "words": words,
+                    "chars": len(chunk_text),
+                    "wall_s": round(elapsed, 4),
+                    "audio_s": round(delta["audio_s"], 3),
+                    "stages": {name: round(seconds, 4) for name, seconds in delta["stages"].items()},
+                    "calls": delta["calls"],
+                    "saved": {name: round(seconds, 4) for name, seconds in delta.get("saved", {}).items()},
+                    "reused": delta.get("reused", {}),
+                }
+            )
+
+    def summary(self, status):
+        wall = max(time.time() - self.started, 1e-9)
+        return {
+            "event": "render",
+            "render": self.label,
+            "status": status,
+            "chunks": dict(self.statuses),
+            "words": self.words,
+            "chars": self.chars,
+            "audio_s": round(self.audio_seconds, 3),
+            "wall_s": round(wall, 3),
+            "words_per_s": round(self.words / wall, 3),
+            "chars_per_s": round(self.chars / wall, 3),
+            "audio_s_per_wall_s": round(self.audio_seconds / wall, 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "calls": dict(self.calls),
+            "saved": {name: round(seconds, 4) for name, seconds in self.saved.items()},
+            "reused": dict(self.reused),
+        }
+
+    def finish(self, status):
+        summary = self.summary(status)
+        if metrics_log is not None:
+            metrics_log.record(summary)
+        return summary
+
+
+RENDER_STAGES = ("spool_write", "mp3_merge", "segment_encode", "chapter_encode", "m4b_package")
+
+
+class MetricsLog:
+    PROMETHEUS_PREFIX = "pocket_tts"
+
+    def __init__(self, log_path=None, prometheus_path=None):
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self.stage_seconds = collections.Counter()
+        self.stage_calls = collections.Counter()
+        self.saved_seconds = collections.Counter()
+        self.reused = collections.Counter()
+        self.chunks = collections.Counter()
+        self.renders = collections.Counter()
+        self.totals = collections.Counter()
+        self.last_render = {}
+        self._lock = threading.Lock()
+        for path in (log_path, prometheus_path):
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, event):
+        event = {"ts": round(time.time(), 3), **event}
+        with self._lock:
+            self._observe(event)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(event) + "\n")
+            if self.prometheus_path:
+                self._write_prometheus()
+
+    def _observe(self, event):
+        kind = event["event"]
+        if kind == "chunk":
+            self.chunks[event["status"]] += 1
+            if event["status"] != "failed":
+                self.totals["words"] += event["words"]
+                self.totals["chars"] += event["chars"]
+            self.totals["audio_seconds"] += event["audio_s"]
+        elif kind == "render":
+            self.renders[event["status"]] += 1
+            self.totals["wall_seconds"] += event["wall_s"]
+            self.last_render = event
+            # Per-chunk events already carry their stages; only the
+            # render-level ones (merging and packaging) are counted here.
+            event = {
+                "stages": {name: event["stages"][name] for name in RENDER_STAGES if name in event["stages"]},
+                "calls": {name: event["calls"][name] for name in RENDER_STAGES if name in event["calls"]},
+            }
+        self.stage_seconds.update(event.get("stages", {}))
+        self.stage_calls.update(event.get("calls", {}))
+        self.saved_seconds.update(event.get("saved", {}))
+        self.reused.update(event.get("reused", {}))
+
+    def _write_prometheus(self):
+        prefix = self.PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        metric("stage_seconds_total", "counter", "Wall time spent in each pipeline stage.", [(f'{{stage="{name}"}}', round(value, 6)) for name, value in sorted(self.stage_seconds.items())])
+        metric("stage_calls_total", "counter", "Number of times each pipeline stage ran.", [(f'{{stage="{name}"}}', value) for name, value in sorted(self.stage_calls.items())])
+        metric("saved_seconds_total", "counter", "Stage time avoided by reusing repeated phrases.", [(f'{{stage="{name}"}}', round(value, 6)) for name, value in sorted(self.saved_seconds.items())])
+        metric("reused_total", "counter", "Repeated phrases served from the in-run memo instead of the stage.", [(f'{{stage="{name}"}}', value) for name, value in sorted(self.reused.items())])
+        metric("chunks_total", "counter", "Chunks processed by outcome.", [(f'{{status="{name}"}}', value) for name, value in sorted(self.chunks.items())])
+        metric("renders_total", "counter", "Books rendered by outcome.", [(f'{{status="{name}"}}', value) for name, value in sorted(self.renders.items())])
+        metric("words_total", "counter", "Words synthesized.", [("", self.totals["words"])])
+        metric("chars_total", "counter", "Characters synthesized.", [("", self.totals["chars"])])
+        metric("audio_seconds_total", "counter", "Seconds of audio produced.", [("", round(self.totals["audio_seconds"], 3))])
+        metric("render_wall_seconds_total", "counter", "Wall time spent rendering books.", [("", round(self.totals["wall_seconds"], 3))])
+        if self.last_render:
+            metric("last_render_words_per_second", "gauge", "Words per wall-second of the last finished render.", [("", self.last_render["words_per_s"])])
+            metric("last_render_chars_per_second", "gauge", "Characters per wall-second of the last finished render.", [("", self.last_render["chars_per_s"])])
+            metric("last_render_audio_seconds_per_second", "gauge", "Audio seconds per wall-second of the last finished render.", [("", self.last_render["audio_s_per_wall_s"])])
+
+        temp_path = f"{self.prometheus_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.prometheus_path)
+
+
+def configure_metrics(log_path=None, prometheus_path=None):
+    global metrics_log
+    if not log_path and not prometheus_path:
+        metrics_log = None
+        return None
+    metrics_log = MetricsLog(log_path, prometheus_path)
+    return metrics_log
+
+
+ABBREVIATIONS = frozenset(
+    {
+        "mr", "mrs", "ms", "mx", "dr", "prof", "sr", "jr", "st", "mt", "ft", "vs", "fig", "gen", "col",
+        "lt", "sgt", "capt", "cmdr", "rev", "hon", "gov", "sen", "rep", "pres", "inc", "ltd", "co", "corp",
+        "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "approx", "dept",
+    }
+)
+MODEL_CHUNK_CHARS = 200
+
+_SENTENCE_END_RE = re.compile(r"(?:\.{2,}|\u2026|[.!?]+)[\"'\u201d\u2019)\]]*(?=\s|$)")
+_NEXT_CHAR_RE = re.compile(r"\s*(\S)")
+_WORD_START_RE = re.compile(r"[^\s.!?\u2026]*$")
+
+
+def build_sentence_index(text):
+    boundaries = []
+    for match in _SENTENCE_END_RE.finditer(text):
+        following = _NEXT_CHAR_RE.match(text, match.end())
+        if following and following.group(1).islower():
+            continue
+        start = match.start()
+        if text[start] == "." and (start + 1 == len(text) or text[start + 1] != "."):
+            if start > 0 and text[start - 1] == ".":
+                continue
+            word = _WORD_START_RE.search(text, max(0, start - 32), start).group(0)
+            if word.lower() in ABBREVIATIONS:
+                continue
+            if len(word) == 1 and word.isalpha() and word.isupper() and word != "I":
+                continue
+        boundaries.append(match.end())
+    return boundaries
+
+
+ChapterMark = collections.namedtuple("ChapterMark", "title")
 
+
+def split_chapter_marks(items):
     chunks = []
-    current_chunk = []
-    word_count = 0
-    i = 0
-
-    while i < len(words):
-        current_chunk.append(words[i])
-        word_count += 1
-        i += 1
-
-        if word_count >= original_chunk_size:
-            if is_sentence_end(words[i - 1]):
-                chunks.append(current_chunk)
-                current_chunk = []
-                word_count = 0
-            else:
-                found = False
-                for j in range(wiggle_room):
-                    if i + j < len(words) and is_sentence_end(words[i + j]):
-                        current_chunk.extend(words[i : i + j + 1])
-                        i += j + 1
-                        found = True
-                        break
+    chapters = {}
+    for item in items:
+        if isinstance(item, ChapterMark):
+            chapters[len(chunks)] = item.title
+        else:
+            chunks.append(item if isinstance(item, str) else " ".join(item))
+    return chunks, {idx: title for idx, title in chapters.items() if idx < len(chunks)}
+
+
+def join_chapter_marks(chunks, chapters):
+    for idx, chunk in enumerate(chunks):
+        if idx in chapters:
+            yield ChapterMark(chapters[idx])
+        yield chunk
+
+
+def segment_words(text):
+    words = text.split()
+    sentence_ends = [False] * len(words)
+    count = 0
+    previous = 0
+    for boundary in build_sentence_index(text):
+        count += len(text[previous:boundary].split())
+        if count:
+            sentence_ends[count - 1] = True
+        previous = boundary
+    return words, sentence_ends
+
+
+def split_text_into_chunks(words, original_chunk_size, wiggle_room=20, sentence_ends=None):
+    if sentence_ends is None:
+        words, sentence_ends = segment_words(" ".join(words))
+
+    total = len(words)
+    next_end = [total] * (total + 1)
+    for index in range(total - 1, -1, -1):
+        next_end[index] = index if sentence_ends[index] else next_end[index + 1]
+
+    chunks = []
+    start = 0
+    last_end = -1
+    scanned = 0
+    while start < total:
+        limit = start + original_chunk_size
+        if limit > total:
+            chunks.append(words[start:])
+            break
+
+        if sentence_ends[limit - 1]:
+            chunks.append(words[start:limit])
+            start = limit
+            continue
+
+        forward = next_end[limit]
+        if forward < min(limit + wiggle_room, total):
+            chunks.append(words[start : forward + 1])
+            start = forward + 1
+            continue
 
-                if not found:
-                    for k in range(len(current_chunk) - 1, 0, -1):
-                        if is_sentence_end(current_chunk[k]):
-                            leftover = current_chunk[k + 1 :]
-                            chunks.append(current_chunk[: k + 1])
-                            current_chunk = leftover
-                            word_count = len(leftover)
-                            found = True
-                            break
-
-                if found and word_count != len(current_chunk):
-                    chunks.append(current_chunk)
-                    current_chunk = []
-                    word_count = 0
-                elif not found:
-                    chunks.append(current_chunk)
-                    current_chunk = []
-                    word_count = 0
-
-    if current_chunk:
-        chunks.append(current_chunk)
+        for index in range(max(scanned, start), limit):
+            if sentence_ends[index]:
+                last_end = index
+        scanned = limit
+        if last_end > start:
+            chunks.append(words[start : last_end + 1])
+            start = last_end + 1
+            continue
+
+        chunks.append(words[start:limit])
+        start = limit
+
+    return chunks
 
+
+def _sentence_anchor(words):
+    digest = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64
+
+
+def stable_chunk_length(words, sentence_ends, start, original_chunk_size, wiggle_room=20):
+    # Boundaries fall after sentences whose own hash picks them, so an edit
+    # only moves the boundaries next to it. Past the minimum fill a sentence
+    # is picked with odds proportional to its length; the size limit and
+    # wiggle room still cap every chunk.
+    total = len(words)
+    longest = original_chunk_size + wiggle_room
+    min_words = max(1, int(original_chunk_size * CHUNK_ANCHOR_MIN_SHARE))
+    span = max(1.0, original_chunk_size * CHUNK_ANCHOR_SPAN_SHARE)
+    end = start
+    while end < total:
+        sentence_end = end
+        limit = min(total - 1, start + longest)
+        while sentence_end < limit and not sentence_ends[sentence_end]:
+            sentence_end += 1
+        length = sentence_end + 1 - start
+        if length <= original_chunk_size:
+            if length >= min_words and _sentence_anchor(words[end : sentence_end + 1]) * span < sentence_end + 1 - end:
+                return length
+            end = sentence_end + 1
+            continue
+        if length <= longest and end - start < original_chunk_size:
+            return length
+        return end - start if end > start else original_chunk_size
+    return total - start
+
+
+def split_text_into_stable_chunks(words, original_chunk_size, wiggle_room=20, sentence_ends=None):
+    if sentence_ends is None:
+        words, sentence_ends = segment_words(" ".join(words))
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = start + stable_chunk_length(words, sentence_ends, start, original_chunk_size, wiggle_room)
+        chunks.append(words[start:end])
+        start = end
     return chunks
 
 
+def split_for_model(text, max_chars=MODEL_CHUNK_CHARS):
+    spans = []
+    sentence_start = 0
+    piece_start = None
+    piece_end = 0
+    # Set while the pending piece is the tail of a sentence too long for one
+    # model call, so it can be joined to what follows instead of being sent
+    # on its own.
+    carried = False
+
+    def emit(start, end):
+        if carried and spans and spans[-1][1] == start:
+            # Nothing could join the tail: split the long sentence's last
+            # two pieces evenly rather than leave a clipped fragment.
+            first = spans.pop()[0]
+            middle = (first + end) // 2
+            low, high = max(end - max_chars, first + 1), min(first + max_chars, end - 1)
+            before = text.rfind(" ", low, middle + 1)
+            after = text.find(" ", middle, high + 1)
+            cut = min((c for c in (before, after) if c >= low), key=lambda c: abs(c - middle), default=start)
+            spans.append((first, cut))
+            start = cut
+        spans.append((start, end))
+
+    for boundary in build_sentence_index(text) + [len(text)]:
+        if boundary <= sentence_start:
+            continue
+        if piece_start is not None and boundary - piece_start >= max_chars:
+            emit(piece_start, piece_end)
+            piece_start = None
+            carried = False
+        if piece_start is None:
+            piece_start = sentence_start
+        else:
+            carried = False
+        piece_end = boundary
+        sentence_start = boundary
+        while piece_end - piece_start > max_chars:
+            cut = text.rfind(" ", piece_start, piece_start + max_chars)
+            if cut <= piece_start:
+                cut = piece_start + max_chars
+            spans.append((piece_start, cut))
+            piece_start = cut
+            carried = True
+
+    if piece_start is not None:
+        emit(piece_start, piece_end)
+    return [piece for piece in (text[start:end].strip() for start, end in spans) if piece]
+
+
+class VoiceStateStore:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._states = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
+    def get(self, key):
+        with self._lock:
+            state = self._states.get(key)
+        if state is not None or not self.cache_dir:
+            return state
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            state = torch.load(path, map_location="cpu", weights_only=True)
+        except Exception as exc:
+            print(f"[Warning] Failed to load cached voice state: {exc}")
+            return None
+        with self._lock:
+            self._states[key] = state
+        return state
+
+    def put(self, key, state):
+        with self._lock:
+            self._states[key] = state
+        if not self.cache_dir:
+            return
+
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            torch.save(state, temp_path)
+            os.replace(temp_path, path)
+        except Exception as exc:
+            print(f"[Warning] Failed to save voice state: {exc}")
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+
+voice_state_store = VoiceStateStore()
+
+
+def configure_voice_state_store(cache_dir=DEFAULT_VOICE_CACHE_DIR):
+    global voice_state_store
+    voice_state_store = VoiceStateStore(cache_dir or None)
+    return voice_state_store
+
+
+def _load_ref_audio(ref_audio_path):
+    data, samplerate = sf.read(ref_audio_path, dtype="float32")
+    max_samples = 5 * samplerate
+    if len(data) > max_samples:
+        print(f"[System] Truncating ref audio from {len(data)} to {max_samples} samples.")
+        data = data[:max_samples]
+    return data, samplerate
+
+
 def prepare_voice_state(ref_audio_path, voice_name):
+    if isinstance(pocket_model, RemoteModel):
+        # The server computes and caches the state; clients only name it.
+        return {"ref_audio": os.path.abspath(ref_audio_path) if ref_audio_path else "", "voice": voice_name}
+    started = time.perf_counter()
+    with stage_timer.stage("voice_state"):
+        state, cached = _resolve_voice_state(ref_audio_path, voice_name)
+    if metrics_log is not None:
+        metrics_log.record(
+            {
+                "event": "voice_state",
+                "voice": os.path.basename(ref_audio_path) if ref_audio_path else voice_name,
+                "cached": cached,
+                "stages": {"voice_state": round(time.perf_counter() - started, 4)},
+                "calls": {"voice_state": 1},
+            }
+        )
+    return state
+
+
+def _resolve_voice_state(ref_audio_path, voice_name):
     global pocket_model
-    final_prompt = voice_name
-    temp_file = None
+    ref_audio = None
+    digest = hashlib.sha256(model_version().encode("utf-8"))
 
     if ref_audio_path and os.path.exists(ref_audio_path):
         try:
-            data, samplerate = sf.read(ref_audio_path)
-            max_samples = 5 * samplerate
-            if len(data) > max_samples:
-                print(f"[System] Truncating ref audio from {len(data)} to {max_samples} samples.")
-                data = data[:max_samples]
-
-            temp_file = os.path.abspath("temp_pocket_ref.wav")
-            sf.write(temp_file, data, samplerate, subtype="PCM_16")
-            final_prompt = temp_file
-            print(f"[System] Using processed ref audio: {temp_file}")
+            ref_audio = _load_ref_audio(ref_audio_path)
+            digest.update(b"ref:%d:" % ref_audio[1])
+            digest.update(np.ascontiguousarray(ref_audio[0]).tobytes())
         except Exception as exc:
             print(f"[Warning] Failed to process ref audio: {exc}. Falling back to name.")
-            final_prompt = voice_name
+            ref_audio = None
+    if ref_audio is None:
+        digest.update(f"voice:{voice_name}".encode("utf-8"))
+
+    key = digest.hexdigest()
+    state = voice_state_store.get(key)
+    if state is not None:
+        return state, True
+
+    if ref_audio is None:
+        state = pocket_model.get_state_for_audio_prompt(voice_name)
+    else:
+        fd, temp_file = tempfile.mkstemp(prefix="pocket_ref_", suffix=".wav")
+        os.close(fd)
+        try:
+            sf.write(temp_file, ref_audio[0], ref_audio[1], subtype="PCM_16")
+            print(f"[System] Using processed ref audio: {temp_file}")
+            state = pocket_model.get_state_for_audio_prompt(temp_file)
+        finally:
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+    voice_state_store.put(key, state)
+    return state, False
+
+
+# Headings, epigraphs, refrains and scraped boilerplate repeat verbatim
+# across a book; within one render each distinct sub-chunk is synthesized
+# once per voice state and temperature and its audio reused afterwards.
+class PhraseMemo:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._states = {}
+        self._size = 0
+        self._scope = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def begin(self, scope):
+        with self._lock:
+            if scope != self._scope:
+                self._clear()
+                self._scope = scope
+
+    def end(self):
+        with self._lock:
+            self._clear()
+            self._scope = None
+
+    def _clear(self):
+        self._entries.clear()
+        self._states.clear()
+        self._size = 0
+
+    def _key(self, state, temp, text):
+        # The state is pinned below, so its id cannot be reused for another
+        # voice while the entry lives.
+        return id(state), round(float(temp), 4), self.normalize(text)
+
+    def get(self, state, temp, text):
+        with self._lock:
+            if self._scope is None:
+                return None
+            key = self._key(state, temp, text)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, state, temp, text, audio, seconds):
+        with self._lock:
+            if self._scope is None or audio.nbytes > self.max_bytes:
+                return
+            audio = np.array(audio, dtype=np.float32)
+            audio.setflags(write=False)
+            key = self._key(state, temp, text)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[0].nbytes
+            self._states[id(state)] = state
+            self._entries[key] = (audio, seconds)
+            self._size += audio.nbytes
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+
+
+def configure_phrase_memo(max_mb=PHRASE_MEMO_MB):
+    global phrase_memo
+    phrase_memo = PhraseMemo(int(max_mb * 1024 * 1024)) if max_mb > 0 else None
+    return phrase_memo
+
+
+def _generate_memoized(state, chunk):
+    memo = phrase_memo
+    temp = getattr(pocket_model, "temp", None)
+    if memo is not None:
+        entry = memo.get(state, temp, chunk)
+        if entry is not None:
+            audio, seconds = entry
+            stage_timer.add_saved("generate", seconds)
+            return audio
+
+    started = time.perf_counter()
+    with stage_timer.stage("generate"):
+        tensor = pocket_model.generate_audio(state, chunk)
+    if tensor is None:
+        return None
+    audio = tensor.numpy()
+    if memo is not None:
+        memo.put(state, temp, chunk, audio, time.perf_counter() - started)
+    return audio
+
+
+def iter_pocket_audio(state, text, stream=False, stop=None):
+    global pocket_model
+    if isinstance(pocket_model, RemoteModel):
+        yield from pocket_model.iter_audio(state, text, stop)
+        return
+    for chunk in split_for_model(text):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        if stop is not None and stop.is_set():
+            return
+        if not stream:
+            audio = _generate_memoized(state, chunk)
+            if audio is not None:
+                yield audio
+            continue
+
+        # Frame-by-frame generation: the first audio is ready after one
+        # decoder step instead of after the whole sub-chunk.
+        frames = pocket_model.generate_audio_stream(state, chunk)
+        try:
+            while True:
+                with stage_timer.stage("generate"):
+                    tensor = next(frames, None)
+                if tensor is None:
+                    break
+                yield tensor.numpy()
+                if stop is not None and stop.is_set():
+                    return
+        finally:
+            frames.close()
+
+
+def stream_speech(state, text, on_audio, temp_val=0.7, speed_val=1.0, stop=None):
+    global pocket_model
+    pocket_model.temp = temp_val
+    sample_rate = pocket_model.sample_rate
+    stretcher = TimeStretcher(speed_val, sample_rate) if speed_val != 1.0 else None
+    frames = 0
+
+    for block in iter_pocket_audio(state, text, stream=True, stop=stop):
+        if stretcher:
+            block = stretcher.process(block)
+        if len(block):
+            on_audio(block)
+            frames += len(block)
+    if stretcher and not (stop is not None and stop.is_set()):
+        block = stretcher.flush()
+        if len(block):
+            on_audio(block)
+            frames += len(block)
+    return frames / sample_rate
+
+
+class AudioPlayer:
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._batch = False
+        self._write, self._close, self._abort = self._open_output()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _open_output(self):
+        try:
+            import sounddevice
+        except ImportError:
+            sounddevice = None
+
+        if sounddevice is not None:
+            stream = sounddevice.OutputStream(samplerate=self.sample_rate, channels=1, dtype="float32")
+            stream.start()
+            return stream.write, stream.close, stream.abort
+
+        if sys.platform == "win32":
+            import winsound
+
+            def play(block):
+                buffer = io.BytesIO()
+                sf.write(buffer, block, self.sample_rate, format="WAV", subtype="PCM_16")
+                winsound.PlaySound(buffer.getvalue(), winsound.SND_MEMORY)
+
+            # winsound can only play whole clips, so hand it everything that
+            # queued up while the previous clip was playing.
+            self._batch = True
+            return play, lambda: None, lambda: winsound.PlaySound(None, 0)
+
+        aplay = shutil.which("aplay")
+        if aplay:
+            process = subprocess.Popen(
+                [aplay, "-q", "-t", "raw", "-f", "FLOAT_LE", "-r", str(self.sample_rate), "-c", "1"],
+                stdin=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+
+            def close():
+                process.stdin.close()
+                process.wait()
+
+            return lambda block: process.stdin.write(block.astype("<f4").tobytes()), close, process.kill
+
+        raise RuntimeError("No audio output available. Install sounddevice (pip install sounddevice) or aplay.")
+
+    def _run(self):
+        try:
+            finished = False
+            while not finished:
+                blocks = [self._queue.get()]
+                while self._batch:
+                    try:
+                        blocks.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for position, block in enumerate(blocks):
+                    if block is None:
+                        finished = True
+                        del blocks[position:]
+                        break
+                if blocks and not self._stopped.is_set():
+                    self._write(np.concatenate(blocks).astype(np.float32, copy=False))
+        except Exception as exc:
+            if not self._stopped.is_set():
+                print(f"[System] Audio playback failed: {exc}")
+        finally:
+            try:
+                self._close()
+            except Exception:
+                pass
+
+    def put(self, block):
+        if not self._stopped.is_set():
+            self._queue.put(block)
+
+    def finish(self, stop=None):
+        self._queue.put(None)
+        while self._thread.is_alive():
+            self._thread.join(0.1)
+            if stop is not None and stop.is_set():
+                self.stop()
+                break
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        try:
+            self._abort()
+        except Exception:
+            pass
+
+
+def play_audio_file(path, stop=None, block_seconds=0.25):
+    ensure_libs("audio")
+    audio, sample_rate = sf.read(path, dtype="float32")
+    player = AudioPlayer(sample_rate)
+    step = max(int(sample_rate * block_seconds), 1)
+    for start in range(0, len(audio), step):
+        player.put(audio[start : start + step])
+    player.finish(stop)
+
+
+# Model sub-chunks come back with their own lead-in and tail silence and
+# their own level. Each is trimmed to half the pause length on either side,
+# normalized to one loudness, and joined to the next with a short crossfade.
+class AudioPolisher:
+    def __init__(self, sample_rate, pause_ms=DEFAULT_PAUSE_MS, loudness_dbfs=DEFAULT_LOUDNESS_DBFS, crossfade_ms=DEFAULT_CROSSFADE_MS, frame_ms=10):
+        self.frame = max(1, int(sample_rate * frame_ms / 1000))
+        self.half_pause = int(sample_rate * pause_ms / 2000)
+        self.fade = min(int(sample_rate * crossfade_ms / 1000), self.half_pause)
+        self.target = 10 ** (loudness_dbfs / 20)
+        self.ceiling = 10 ** (PEAK_CEILING_DBFS / 20)
+        self.max_gain = 10 ** (MAX_GAIN_DB / 20)
+        self._pending = None
+
+    def _split(self, audio):
+        count = len(audio) // self.frame
+        if count == 0:
+            return audio[:0], audio, audio[:0]
+        rms = np.sqrt(np.mean(np.square(audio[: count * self.frame].reshape(count, self.frame), dtype=np.float64), axis=1))
+        voiced = rms > max(rms.max() * 10 ** (SILENCE_FLOOR_DB / 20), 1e-4)
+        if not voiced.any():
+            return None
+        start = int(np.argmax(voiced)) * self.frame
+        end = (count - int(np.argmax(voiced[::-1]))) * self.frame
+        if end == count * self.frame:
+            end = len(audio)
+
+        level = np.sqrt(np.mean(np.square(rms[voiced])))
+        gain = min(max(self.target / level, 1 / self.max_gain), self.max_gain)
+        peak = float(np.max(np.abs(audio[start:end])))
+        if peak * gain > self.ceiling:
+            gain = self.ceiling / peak
+        audio = audio * np.float32(gain)
+        return audio[:start], audio[start:end], audio[end:]
+
+    def _ramp(self, length):
+        return np.linspace(0.0, 1.0, length, endpoint=False, dtype=np.float32)
+
+    def _crossfade(self, left, right):
+        fade = min(self.fade, len(left), len(right))
+        if fade == 0:
+            return np.concatenate([left, right])
+        ramp = self._ramp(fade)
+        overlap = left[len(left) - fade :] * (1 - ramp) + right[:fade] * ramp
+        return np.concatenate([left[: len(left) - fade], overlap, right[fade:]])
+
+    def process(self, audio):
+        parts = self._split(np.asarray(audio, dtype=np.float32).reshape(-1))
+        if parts is None:
+            return np.zeros(0, dtype=np.float32)
+        lead, core, trail = parts
+        if len(trail) < self.fade and len(core):
+            # No silence to cut in: hold back the end of the speech itself so
+            # the next sub-chunk fades over it.
+            take = min(self.fade - len(trail), len(core))
+            trail = np.concatenate([core[len(core) - take :], trail])
+            core = core[: len(core) - take]
+
+        if self._pending is None:
+            out = np.concatenate([lead[len(lead) - min(len(lead), self.half_pause) :], core])
+            fade = min(self.fade, len(out))
+            out[:fade] *= self._ramp(fade)
+        else:
+            tail = self._pending[: self.half_pause]
+            keep = max(2 * self.half_pause - len(tail), 0)
+            out = self._crossfade(tail, np.concatenate([lead[len(lead) - min(len(lead), keep) :], core]))
+        self._pending = trail
+        return out
+
+    def flush(self):
+        if self._pending is None:
+            return np.zeros(0, dtype=np.float32)
+        out = self._pending[: self.half_pause].copy()
+        fade = min(self.fade, len(out))
+        if fade:
+            out[len(out) - fade :] *= 1 - self._ramp(fade)
+        self._pending = None
+        return out
+
+
+def configure_audio_polish(pause_ms=DEFAULT_PAUSE_MS, loudness_dbfs=DEFAULT_LOUDNESS_DBFS, crossfade_ms=DEFAULT_CROSSFADE_MS, enabled=True):
+    global audio_polish
+    audio_polish = {"pause_ms": int(pause_ms), "loudness_dbfs": float(loudness_dbfs), "crossfade_ms": int(crossfade_ms)} if enabled else None
+    return audio_polish
+
+
+def _iter_sub_chunk_audio(state, text):
+    if not isinstance(pocket_model, RemoteModel):
+        yield from iter_pocket_audio(state, text)
+        return
+    # The server streams frames; ask for one sub-chunk at a time so each
+    # polished segment is one model call, as it is locally.
+    for piece in split_for_model(text):
+        piece = piece.strip()
+        blocks = list(iter_pocket_audio(state, piece)) if piece else []
+        if blocks:
+            yield np.concatenate(blocks)
+
+
+def iter_chunk_audio(state, text):
+    if audio_polish is None:
+        yield from iter_pocket_audio(state, text)
+        return
+    polisher = AudioPolisher(pocket_model.sample_rate, **audio_polish)
+    for audio in _iter_sub_chunk_audio(state, text):
+        with stage_timer.stage("polish"):
+            block = polisher.process(audio)
+        if len(block):
+            yield block
+    with stage_timer.stage("polish"):
+        block = polisher.flush()
+    if len(block):
+        yield block
+
+
+def _generate_pocket_safe(state, text):
+    full_audio = list(iter_chunk_audio(state, text))
+    if not full_audio:
+        return None
+    with stage_timer.stage("concat"):
+        return np.concatenate(full_audio)
+
+
+class _StretchFailed(Exception):
+    pass
+
+
+def _stream_chunk_to_wav(state, text, out_path, sample_rate, stretcher=None, raw_path=None):
+    # Each sub-chunk goes through the stretcher and straight into the file, so
+    # peak memory is one model call's audio however long the chunk is.
+    # With raw_path the unstretched audio is also kept there, so a failed
+    # stretch can fall back to FFmpeg without synthesizing the chunk again.
+    frames = 0
+    failure = None
+    clip = chunk_format != "float32"
+    container, subtype = CHUNK_FORMATS[chunk_format]
+    with contextlib.ExitStack() as files:
+        writer = files.enter_context(sf.SoundFile(out_path, "w", samplerate=sample_rate, channels=1, subtype=subtype, format=container))
+        raw_writer = files.enter_context(sf.SoundFile(raw_path, "w", samplerate=sample_rate, channels=1, subtype=subtype, format=container)) if raw_path else None
+
+        def write(target, block):
+            if not len(block):
+                return 0
+            if clip:
+                block = np.clip(block, -1.0, 1.0)
+            with stage_timer.stage("wav_write"):
+                target.write(block)
+            return len(block)
+
+        def stretch(step, *args):
+            nonlocal failure
+            try:
+                with stage_timer.stage("speed"):
+                    return step(*args)
+            except Exception as exc:
+                if raw_writer is None:
+                    raise _StretchFailed(exc) from exc
+                failure = exc
+                return None
+
+        for block in iter_chunk_audio(state, text):
+            if raw_writer is not None:
+                write(raw_writer, block)
+            if failure is None:
+                stretched = stretch(stretcher.process, block) if stretcher else block
+                if stretched is not None:
+                    frames += write(writer, stretched)
+        if stretcher and failure is None:
+            stretched = stretch(stretcher.flush)
+            if stretched is not None:
+                frames += write(writer, stretched)
+    if failure is not None:
+        raise _StretchFailed(failure) from failure
+    return frames
+
+
+class TimeStretcher:
+    def __init__(self, speed, sample_rate, frame_ms=40, tolerance_ms=10, decimation=4):
+        self.speed = float(speed)
+        self.frame_len = int(sample_rate * frame_ms / 1000) // (2 * decimation) * (2 * decimation)
+        self.hop_out = self.frame_len // 2
+        self.hop_in = self.hop_out * self.speed
+        self.tolerance = int(sample_rate * tolerance_ms / 1000) // decimation * decimation
+        self.decimation = decimation
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame_len) / self.frame_len)).astype(np.float32)
+        self._buffer = np.zeros(self.tolerance, dtype=np.float32)
+        self._buffer_start = -self.tolerance
+        self._input_len = 0
+        self._frame = 0
+        self._prev_pos = None
+        self._overlap = np.zeros(self.frame_len, dtype=np.float32)
+        self._emitted = 0
+
+    def _best_position(self, nominal):
+        if self._prev_pos is None:
+            return 0
+
+        tol = self.tolerance
+        step = self.decimation
+        natural = self._prev_pos + self.hop_out
+        lo = nominal - tol
+        region = self._buffer[lo - self._buffer_start : nominal + tol + self.frame_len - self._buffer_start]
+        template = self._buffer[natural - self._buffer_start : natural + self.frame_len - self._buffer_start]
+
+        coarse = np.correlate(region[::step], template[::step], mode="valid")
+        best = int(np.argmax(coarse)) * step
+        fine_lo = max(best - step, 0)
+        fine_hi = min(best + step, 2 * tol)
+        fine_region = region[fine_lo : fine_hi + self.frame_len]
+        fine = np.correlate(fine_region, template, mode="valid")
+        return lo + fine_lo + int(np.argmax(fine))
+
+    def _required_end(self, nominal):
+        end = nominal + self.tolerance + self.frame_len
+        if self._prev_pos is not None:
+            end = max(end, self._prev_pos + self.hop_out + self.frame_len)
+        return end
+
+    def _run_frames(self, available_end):
+        produced = []
+        while True:
+            nominal = int(round(self._frame * self.hop_in))
+            if self._required_end(nominal) > available_end:
+                break
+
+            pos = self._best_position(nominal)
+            frame = self._buffer[pos - self._buffer_start : pos - self._buffer_start + self.frame_len]
+            self._overlap += frame * self.window
+            produced.append(self._overlap[: self.hop_out].copy())
+            self._overlap[: -self.hop_out] = self._overlap[self.hop_out :]
+            self._overlap[-self.hop_out :] = 0.0
+            self._prev_pos = pos
+            self._frame += 1
+
+        keep_from = int(round(self._frame * self.hop_in)) - self.tolerance
+        if self._prev_pos is not None:
+            keep_from = min(keep_from, self._prev_pos + self.hop_out)
+        drop = keep_from - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start = keep_from
+        return produced
+
+    def process(self, block):
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        self._buffer = np.concatenate([self._buffer, block])
+        self._input_len += len(block)
+        produced = self._run_frames(self._buffer_start + len(self._buffer))
+        return self._emit(produced, None)
+
+    def flush(self):
+        target = int(round(self._input_len / self.speed))
+        padding = self.tolerance + 2 * self.frame_len + int(self.hop_in) + 1
+        self._buffer = np.concatenate([self._buffer, np.zeros(padding, dtype=np.float32)])
+        produced = []
+        while self._emitted + sum(len(part) for part in produced) < target:
+            produced.extend(self._run_frames(self._buffer_start + len(self._buffer)))
+            self._buffer = np.concatenate([self._buffer, np.zeros(padding, dtype=np.float32)])
+        return self._emit(produced, target)
+
+    def _emit(self, produced, limit):
+        if not produced:
+            return np.zeros(0, dtype=np.float32)
+        out = np.concatenate(produced)
+        if limit is not None:
+            out = out[: max(limit - self._emitted, 0)]
+        self._emitted += len(out)
+        return out
+
+
+def time_stretch(audio, speed, sample_rate):
+    if speed == 1.0:
+        return audio
+    stretcher = TimeStretcher(speed, sample_rate)
+    return np.concatenate([stretcher.process(audio), stretcher.flush()])
+
+
+def apply_speed_to_audio(file_path, speed):
+    if speed == 1.0:
+        return True
+
+    temp_file = file_path + ".speed" + os.path.splitext(file_path)[1]
+    try:
+        command = [
+            "ffmpeg",
+            "-y",
+            "-i",
+            file_path,
+            "-filter:a",
+            f"atempo={speed}",
+            temp_file,
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode == 0:
+            os.replace(temp_file, file_path)
+            return True
+
+        print(f"[System] FFmpeg speed error: {result.stderr}")
+        return False
+    except Exception as exc:
+        print(f"[System] Failed to apply speed: {exc}")
+        return False
+    finally:
+        if os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+
+def model_version():
+    if isinstance(pocket_model, RemoteModel):
+        return pocket_model.version
+    try:
+        from importlib import metadata
+
+        return metadata.version("pocket-tts")
+    except Exception:
+        return "unknown"
+
+
+def voice_identity(ref_audio_path, voice_name):
+    if ref_audio_path and os.path.exists(ref_audio_path):
+        digest = hashlib.sha256()
+        with open(ref_audio_path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+        return f"ref:{digest.hexdigest()}"
+    return f"voice:{voice_name}"
+
+
+class ChunkAudioCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        with os.scandir(self.cache_dir) as entries:
+            return [entry for entry in entries if entry.is_file() and entry.name.endswith((".wav", ".flac"))]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{chunk_suffix()}")
+
+    @staticmethod
+    def make_key(text, voice_id, temp_val, speed_val, sample_rate, sample_format="float32", polish=None):
+        payload = json.dumps(
+            [text, voice_id, round(float(temp_val), 4), round(float(speed_val), 4), sample_rate, sample_format, model_version()] + ([polish] if polish else []),
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    def lookup(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def fetch(self, key, out_path):
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, out_path)
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key, src_path):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(src_path, temp_path)
+            os.replace(temp_path, path)
+            self._size += os.path.getsize(path)
+        except OSError as exc:
+            print(f"[System] Failed to cache chunk audio: {exc}")
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            return None
+        if self._size > self.max_bytes:
+            self.evict()
+        return path if os.path.exists(path) else None
+
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._size}
+
+
+def configure_chunk_cache(cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MB):
+    global chunk_cache
+    if not cache_dir or max_mb <= 0:
+        chunk_cache = None
+        return None
+    chunk_cache = ChunkAudioCache(cache_dir, int(max_mb * 1024 * 1024))
+    return chunk_cache
+
+
+def configure_audition_cache(cache_dir=DEFAULT_AUDITION_DIR, max_mb=AUDITION_CACHE_MB):
+    global audition_cache
+    if not cache_dir or max_mb <= 0:
+        audition_cache = None
+        return None
+    audition_cache = ChunkAudioCache(cache_dir, int(max_mb * 1024 * 1024))
+    return audition_cache
+
+
+def audition_grid(temperatures=AUDITION_TEMPERATURES, speeds=AUDITION_SPEEDS, voices=None):
+    return [(voice, temp, speed) for voice in (voices or VOICE_OPTIONS) for temp in temperatures for speed in speeds]
+
+
+def audition_key(text, voice_name, temp_val, speed_val, ref_audio_path="", streamed=False):
+    # A streamed sample plays the model's frames as they come, without the
+    # polisher, so it is cached as unpolished audio and never stands in for
+    # a rendered audition.
+    voice_id = voice_identity(ref_audio_path, voice_name)
+    return ChunkAudioCache.make_key(text, voice_id, temp_val, speed_val, pocket_model.sample_rate, chunk_format, None if streamed else audio_polish)
+
+
+def store_audition(key, audio):
+    fd, temp_path = tempfile.mkstemp(prefix="pocket_audition_", suffix=chunk_suffix())
+    os.close(fd)
+    try:
+        container, subtype = CHUNK_FORMATS[chunk_format]
+        sf.write(temp_path, audio, pocket_model.sample_rate, subtype=subtype, format=container)
+        return audition_cache.store(key, temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def render_audition(text, voice_name, temp_val, speed_val, ref_audio_path=""):
+    global pocket_model
+    key = audition_key(text, voice_name, temp_val, speed_val, ref_audio_path)
+    path = audition_cache.lookup(key)
+    if path:
+        return path
+
+    state = prepare_voice_state(ref_audio_path, voice_name)
+    pocket_model.temp = temp_val
+    sample_rate = pocket_model.sample_rate
+    stretcher = TimeStretcher(speed_val, sample_rate) if speed_val != 1.0 else None
+    fd, temp_path = tempfile.mkstemp(prefix="pocket_audition_", suffix=chunk_suffix())
+    os.close(fd)
+    try:
+        if not _stream_chunk_to_wav(state, text, temp_path, sample_rate, stretcher):
+            raise RuntimeError("No audio generated.")
+        return audition_cache.store(key, temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+# Container and sample type of the intermediate chunks. "spool" renders
+# int16 chunks and folds each one into a single raw PCM file for the book.
+CHUNK_FORMATS = {"float32": ("WAV", "FLOAT"), "int16": ("WAV", "PCM_16"), "flac": ("FLAC", "PCM_16"), "spool": ("WAV", "PCM_16")}
+
+
+def configure_chunk_format(sample_format="float32"):
+    global chunk_format
+    if sample_format not in CHUNK_FORMATS:
+        raise ValueError(f"Unknown chunk format: {sample_format}")
+    chunk_format = sample_format
+    return chunk_format
+
+
+def chunk_suffix():
+    return ".flac" if chunk_format == "flac" else ".wav"
+
+
+class PcmSpool:
+    # One raw int16 file for the whole book, grown in preallocated extents;
+    # the render journal keeps each chunk's offset and length.
+    def __init__(self, path, end=0, extent_mb=SPOOL_EXTENT_MB):
+        self.path = path
+        self.end = end
+        self.extent_bytes = int(extent_mb * 1024 * 1024)
+        self._handle = None
+
+    def _reserve(self, size):
+        allocated = os.fstat(self._handle.fileno()).st_size
+        if self.end + size <= allocated:
+            return
+        target = max(self.end + size, allocated + self.extent_bytes)
+        try:
+            os.posix_fallocate(self._handle.fileno(), allocated, target - allocated)
+        except (AttributeError, OSError):
+            self._handle.truncate(target)
+
+    def append(self, wav_path):
+        audio, sample_rate = sf.read(wav_path, dtype="int16")
+        data = audio.tobytes()
+        if self._handle is None:
+            self._handle = open(self.path, "r+b" if os.path.exists(self.path) else "w+b")
+        self._reserve(len(data))
+        offset = self.end
+        self._handle.seek(offset)
+        self._handle.write(data)
+        self._handle.flush()
+        self.end += len(data)
+        return offset, len(audio), sample_rate
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    @staticmethod
+    def copy_spans(path, spans, stream):
+        with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            with memoryview(view) as data:
+                for offset, frames in spans:
+                    stream.write(data[offset : offset + frames * SPOOL_SAMPLE_BYTES])
+
+    @staticmethod
+    def compact(path, spans):
+        # Rewrites the spool with only the given spans, back to back, and
+        # returns their new offsets.
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as stream:
+            PcmSpool.copy_spans(path, spans, stream)
+        os.replace(temp_path, path)
+        offsets = list(itertools.accumulate((frames * SPOOL_SAMPLE_BYTES for _, frames in spans), initial=0))
+        return offsets[:-1]
+
+    @staticmethod
+    def export_wav(path, offset, frames, sample_rate, out_path):
+        with open(path, "rb") as handle:
+            handle.seek(offset)
+            audio = np.frombuffer(handle.read(frames * SPOOL_SAMPLE_BYTES), dtype=np.int16)
+        sf.write(out_path, audio, sample_rate, subtype="PCM_16")
+
+
+def synthesize_chunk_to_file(state, text, out_path, temp_val=0.7, speed_val=1.0, voice_id=None):
+    global pocket_model
+    cache_key = None
+    if chunk_cache is not None and voice_id:
+        cache_key = ChunkAudioCache.make_key(text, voice_id, temp_val, speed_val, pocket_model.sample_rate, chunk_format, audio_polish)
+        with stage_timer.stage("cache_fetch"):
+            hit = chunk_cache.fetch(cache_key, out_path)
+        if hit:
+            stage_timer.add_audio(wav_duration(out_path))
+            return True
+
+    pocket_model.temp = temp_val
+    sample_rate = pocket_model.sample_rate
+
+    needs_ffmpeg_speed = False
+    if speed_val != 1.0:
+        raw_path = f"{out_path}.raw{chunk_suffix()}"
+        try:
+            frames = _stream_chunk_to_wav(state, text, out_path, sample_rate, TimeStretcher(speed_val, sample_rate), raw_path)
+        except _StretchFailed as exc:
+            print(f"[System] In-process speed change failed: {exc}. Falling back to FFmpeg.")
+            os.replace(raw_path, out_path)
+            frames = sf.info(out_path).frames
+            needs_ffmpeg_speed = True
+        finally:
+            _remove_quietly(raw_path)
+    else:
+        frames = _stream_chunk_to_wav(state, text, out_path, sample_rate)
+    if not frames:
+        os.remove(out_path)
+        raise RuntimeError("No audio generated.")
+
+    if needs_ffmpeg_speed:
+        with stage_timer.stage("speed"):
+            if not apply_speed_to_audio(out_path, speed_val):
+                cache_key = None
+        stage_timer.add_audio(wav_duration(out_path))
+    else:
+        stage_timer.add_audio(frames / sample_rate)
+
+    if cache_key:
+        with stage_timer.stage("cache_store"):
+            chunk_cache.store(cache_key, out_path)
+    return False
+
+
+def wav_duration(path):
+    info = sf.info(path)
+    return info.frames / info.samplerate
+
+
+def _write_concat_list(list_file, files):
+    with open(list_file, "w", encoding="utf-8") as handle:
+        for file_path in files:
+            abs_path = os.path.abspath(file_path).replace("'", "'\\''")
+            handle.write(f"file '{abs_path}'\n")
+
+
+def _escape_ffmetadata(value):
+    return re.sub(r"([=;#\\\n])", r"\\\1", str(value))
+
+
+def write_chapter_metadata(path, chapters, title=None):
+    lines = [";FFMETADATA1"]
+    if title:
+        lines.append(f"title={_escape_ffmetadata(title)}")
+    for name, start, end in chapters:
+        lines += ["[CHAPTER]", "TIMEBASE=1/1000", f"START={int(round(start * 1000))}", f"END={int(round(end * 1000))}", f"title={_escape_ffmetadata(name)}"]
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write("\n".join(lines) + "\n")
+
+
+def chapter_times(durations_by_chapter):
+    chapters = []
+    position = 0.0
+    for name, duration in durations_by_chapter:
+        chapters.append((name, position, position + duration))
+        position += duration
+    return chapters
+
+
+def _remove_quietly(*paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _id3_chapter_args(metadata_file, chapters, custom_name):
+    if not chapters:
+        return []
+    # ID3 CHAP frames, which most podcast and audiobook players show.
+    write_chapter_metadata(metadata_file, chapters, os.path.splitext(custom_name)[0])
+    return ["-i", metadata_file, "-map", "0:a", "-map_metadata", "1", "-map_chapters", "1", "-id3v2_version", "3"]
+
+
+def pipe_spool_to_ffmpeg(spool_path, spans, sample_rate, output_args):
+    # The chunks are read from a memory map of the spool in book order, so
+    # assembly opens one file however many chunks the book has.
+    command = ["ffmpeg", "-y", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0"] + output_args
+    with tempfile.TemporaryFile() as errors:
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=errors)
+        except OSError as exc:
+            return str(exc)
+        try:
+            PcmSpool.copy_spans(spool_path, spans, process.stdin)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.wait()
+        if process.returncode == 0:
+            return None
+        errors.seek(0)
+        return errors.read().decode("utf-8", "replace")
+
+
+def combine_spool_to_mp3(spool_path, spans, sample_rate, output_dir, custom_name="final_output", chapters=None):
+    if not spans:
+        return None
+
+    if not custom_name.lower().endswith(".mp3"):
+        custom_name += ".mp3"
+
+    metadata_file = os.path.join(output_dir, "chapters.ffmeta") if chapters else None
+    output_mp3 = os.path.join(output_dir, custom_name)
+
+    try:
+        output_args = _id3_chapter_args(metadata_file, chapters, custom_name) + ["-acodec", "libmp3lame", "-q:a", "2", output_mp3]
+        print(f"[System] Encoding {len(spans)} spooled chunks into {output_mp3}...")
+        error = pipe_spool_to_ffmpeg(spool_path, spans, sample_rate, output_args)
+        if error is None:
+            print("[System] MP3 encode successful. Keeping the spool for the next run.")
+            return output_mp3
+
+        print(f"[System] FFmpeg error: {error}")
+        return None
+    except Exception as exc:
+        print(f"[System] Failed to encode MP3: {exc}")
+        return None
+    finally:
+        _remove_quietly(metadata_file)
+
+
+def combine_output_to_mp3(output_files, output_dir, custom_name="final_output", cleanup=True, chapters=None, stream_copy=False):
+    if not output_files:
+        return None
+
+    if not custom_name.lower().endswith(".mp3"):
+        custom_name += ".mp3"
+
+    list_file = os.path.join(output_dir, "file_list.txt")
+    metadata_file = os.path.join(output_dir, "chapters.ffmeta") if chapters else None
+    output_mp3 = os.path.join(output_dir, custom_name)
+
+    try:
+        _write_concat_list(list_file, output_files)
+        command = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file]
+        command += _id3_chapter_args(metadata_file, chapters, custom_name)
+        command += ["-c", "copy", output_mp3] if stream_copy else ["-acodec", "libmp3lame", "-q:a", "2", output_mp3]
+
+        print(f"[System] Merging {len(output_files)} files into {output_mp3}...")
+        result = subprocess.run(command, capture_output=True, text=True)
+
+        if result.returncode == 0:
+            if stream_copy:
+                print("[System] MP3 merge successful. Keeping the encoded segments for the next run.")
+                return output_mp3
+            if not cleanup:
+                print("[System] MP3 merge successful. Keeping WAV files for the missing chunks.")
+                return output_mp3
+            print("[System] MP3 merge successful. Cleaning up WAV files...")
+            _remove_quietly(*output_files)
+            return output_mp3
+
+        print(f"[System] FFmpeg error: {result.stderr}")
+        return None
+    except Exception as exc:
+        print(f"[System] Failed to merge MP3: {exc}")
+        return None
+    finally:
+        _remove_quietly(list_file, metadata_file)
+
+
+def segment_file_name(chunk_file):
+    stem = os.path.splitext(os.path.basename(chunk_file))[0]
+    return os.path.join(SEGMENT_DIR, f"{stem.replace('output_', 'segment_', 1)}.mp3")
+
+
+def default_encode_workers():
+    return max(1, min(8, (os.cpu_count() or 2) // 2))
+
+
+def encode_segment(wav_path, out_path):
+    # Each chunk is its own MP3 so the book can be assembled by stream copy
+    # and a changed chunk costs one small encode.
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    temp_path = f"{out_path}.tmp.mp3"
+    try:
+        command = ["ffmpeg", "-y", "-i", wav_path, "-acodec", "libmp3lame", "-q:a", "2", temp_path]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True)
+        except (OSError, subprocess.SubprocessError) as exc:
+            print(f"[System] Failed to encode {os.path.basename(out_path)}: {exc}")
+            return None
+        if result.returncode != 0:
+            print(f"[System] FFmpeg error encoding {os.path.basename(out_path)}: {result.stderr}")
+            return None
+        duration = wav_duration(wav_path)
+        os.replace(temp_path, out_path)
+        return duration
+    finally:
+        _remove_quietly(temp_path)
+
+
+def chapter_file_name(ci, title):
+    safe = re.sub(r"[^\w\- ]+", "", title).strip()[:60] or "Chapter"
+    return os.path.join(CHAPTER_DIR, f"{ci + 1:03d} {safe}.m4a")
+
+
+def encode_chapter(wav_files, out_path):
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    list_file = f"{out_path}.list.txt"
+    try:
+        _write_concat_list(list_file, wav_files)
+        command = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-c:a", "aac", "-b:a", CHAPTER_BITRATE, out_path]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True)
+        except (OSError, subprocess.SubprocessError) as exc:
+            print(f"[System] Failed to encode {os.path.basename(out_path)}: {exc}")
+            return None
+        if result.returncode != 0:
+            print(f"[System] FFmpeg error encoding {os.path.basename(out_path)}: {result.stderr}")
+            return None
+        return sum(wav_duration(path) for path in wav_files)
+    finally:
+        _remove_quietly(list_file)
+
+
+def encode_spool_chapter(spool_path, spans, sample_rate, out_path):
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    error = pipe_spool_to_ffmpeg(spool_path, spans, sample_rate, ["-c:a", "aac", "-b:a", CHAPTER_BITRATE, out_path])
+    if error is not None:
+        print(f"[System] FFmpeg error encoding {os.path.basename(out_path)}: {error}")
+        return None
+    return sum(frames for _, frames in spans) / sample_rate
+
+
+def package_m4b(chapters, output_dir, custom_name="final_output"):
+    # Chapters are already AAC, so the book is a stream copy: re-encoding one
+    # chapter never touches the others.
+    if not custom_name.lower().endswith(".m4b"):
+        custom_name += ".m4b"
+    list_file = os.path.join(output_dir, "chapter_list.txt")
+    metadata_file = os.path.join(output_dir, "chapters.ffmeta")
+    output_m4b = os.path.join(output_dir, custom_name)
+    try:
+        _write_concat_list(list_file, [path for _, path, _ in chapters])
+        write_chapter_metadata(metadata_file, chapter_times((title, duration) for title, _, duration in chapters), os.path.splitext(custom_name)[0])
+        command = [
+            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-i", metadata_file,
+            "-map", "0:a", "-map_metadata", "1", "-map_chapters", "1", "-c", "copy", "-f", "mp4", output_m4b,
+        ]
+        print(f"[System] Packaging {len(chapters)} chapters into {output_m4b}...")
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[System] FFmpeg error: {result.stderr}")
+            return None
+        return output_m4b
+    except Exception as exc:
+        print(f"[System] Failed to package M4B: {exc}")
+        return None
+    finally:
+        _remove_quietly(list_file, metadata_file)
+
+
+PDF_PAGE_BATCH = 16
+CLEANUP_WINDOW = 8
+CLEANUP_EDGE_LINES = 2
+CLEANUP_MIN_REPEATS = 3
+CLEANUP_MIN_SHARE = 0.4
+SPOKEN_WORDS_PER_SECOND = 2.5
+TXT_LINE_BATCH = 2000
+
+
+def default_ingest_workers():
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def _extract_pdf_pages(file_path, start, stop):
+    ensure_libs("pdf")
+    with fitz.open(file_path) as doc:
+        return [doc[index].get_text() for index in range(start, stop)]
+
+
+def _extract_html_text(content):
+    ensure_libs("html")
+    soup = BeautifulSoup(content, "html.parser")
+    return soup.get_text(" ", strip=True)
+
+
+def _iter_ordered_results(executor, func, jobs, window):
+    pending = collections.deque()
+    jobs = iter(jobs)
+    for job in itertools.islice(jobs, window):
+        pending.append(executor.submit(func, *job))
+    while pending:
+        result = pending.popleft().result()
+        job = next(jobs, None)
+        if job is not None:
+            pending.append(executor.submit(func, *job))
+        yield result
+
+
+def _pdf_chapter_starts(doc):
+    # Top-level outline entries start chapters; deeper levels are sections.
+    toc = [entry for entry in doc.get_toc() if entry[2] >= 1]
+    if not toc:
+        return {}
+    top = min(entry[0] for entry in toc)
+    starts = {}
+    for level, title, page in toc:
+        if level == top:
+            starts.setdefault(page - 1, title.strip() or None)
+    return starts
+
+
+def _iter_pdf_parts(file_path, workers):
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+        starts = _pdf_chapter_starts(doc)
+        first_stop = min(PDF_PAGE_BATCH, page_count)
+        for index in range(first_stop):
+            if index in starts:
+                yield ChapterMark(starts[index])
+            yield doc[index].get_text()
+
+    batches = [(file_path, start, min(start + PDF_PAGE_BATCH, page_count)) for start in range(first_stop, page_count, PDF_PAGE_BATCH)]
+    if not batches:
+        return
+    if workers <= 1:
+        results = (_extract_pdf_pages(*job) for job in batches)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        results = _iter_ordered_results(executor, _extract_pdf_pages, batches, workers * 2)
+
+    try:
+        for (_, start, _), pages in zip(batches, results):
+            for index, text in enumerate(pages, start):
+                if index in starts:
+                    yield ChapterMark(starts[index])
+                yield text
+    finally:
+        if workers > 1:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_PAGE_NUMBER_RE = re.compile(r"^[\W_]*(?:page\s+)?(\d{1,4})(?:\s*(?:of|/)\s*\d{1,4})?[\W_]*$", re.IGNORECASE)
+_ROMAN_PAGE_RE = re.compile(r"^[\W_]*(?:page\s+)?((?=[ivxlcdm])m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3}))[\W_]*$")
+_ROMAN_VALUES = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+_HYPHEN_BREAK_RE = re.compile(r"([A-Za-z\u00C0-\u024F])[-\u00AD]$")
+_SENTENCE_TAIL_RE = re.compile(r"[.!?:\"'\u201d\u2019)]$")
+
+
+def _edge_signature(line):
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+def _page_number(line):
+    # Returns (kind, value) for a line that could be a page number; whether it
+    # is one depends on the pages around it.
+    match = _PAGE_NUMBER_RE.match(line)
+    if match:
+        return "arabic", int(match.group(1))
+    match = _ROMAN_PAGE_RE.match(line)
+    if not match:
+        return None
+    numeral = match.group(1)
+    total = 0
+    for char, following in zip(numeral, numeral[1:] + " "):
+        value = _ROMAN_VALUES[char]
+        total += -value if _ROMAN_VALUES.get(following, 0) > value else value
+    return "roman", total
+
+
+# Running headers and footers are found by comparing each page's first and
+# last lines with the pages around it, so the check streams with a window of
+# lookahead instead of needing the whole document.
+class PdfTextCleaner:
+    def __init__(self, window=CLEANUP_WINDOW, edge_lines=CLEANUP_EDGE_LINES, min_repeats=CLEANUP_MIN_REPEATS, min_share=CLEANUP_MIN_SHARE):
+        self.window = window
+        self.edge_lines = edge_lines
+        self.min_repeats = min_repeats
+        self.min_share = min_share
+        self.words_in = 0
+        self.removed = collections.Counter()
+        self.lines_joined = 0
+        self._carry = ""
+
+    def _edges(self, lines):
+        filled = [index for index, line in enumerate(lines) if line]
+        top = filled[: self.edge_lines]
+        bottom = filled[-self.edge_lines :] if len(filled) > self.edge_lines else []
+        return sorted(set(top + bottom))
+
+    def _strip_edges(self, page, neighbours):
+        lines, edges, signatures, numerals = page
+        seen = collections.Counter()
+        sequence = collections.Counter()
+        for offset, other in neighbours:
+            seen.update(set(other[2].values()))
+            # Shifted by its distance, a neighbour's number lines up with
+            # this page's when both count the pages.
+            sequence.update({(kind, value - offset) for kind, value in other[3].values()})
+        # Alternating running heads (book title on even pages, chapter on odd)
+        # each cover about half the pages; chapter openings are much rarer.
+        needed = max(self.min_repeats, self.min_share * (len(neighbours) + 1))
+        kept = list(lines)
+        for index in edges:
+            line = lines[index]
+            # A bare "3" or "1984" is as likely a chapter heading or a title,
+            # and "I", "Mix" or "CD" on a line of its own a heading or a word,
+            # so a number only goes when it keeps counting on the pages
+            # around it; roman ones also have to be lowercase.
+            if index in numerals:
+                if sequence[numerals[index]] + 1 < self.min_repeats:
+                    continue
+                reason = "page_numbers"
+            elif seen[signatures[index]] + 1 >= needed:
+                reason = "headers_footers"
+            else:
+                continue
+            self.removed[reason] += len(line.split())
+            kept[index] = None
+        return [line for line in kept if line is not None]
+
+    def _unwrap(self, lines):
+        lengths = sorted(len(line) for line in lines if line)
+        typical = lengths[len(lengths) // 2] if lengths else 0
+        paragraphs = []
+        current = ""
+        for line in lines:
+            if not line:
+                if current:
+                    paragraphs.append(current)
+                current = ""
+                continue
+            if not current:
+                current = line
+            elif _HYPHEN_BREAK_RE.search(current) and line[0].islower():
+                current = current[:-1] + line
+                self.removed["hyphenation"] += 1
+                self.lines_joined += 1
+            else:
+                current += " " + line
+                self.lines_joined += 1
+            # A short line ending a sentence closes its paragraph.
+            if _SENTENCE_TAIL_RE.search(line) and len(line) < 0.7 * typical:
+                paragraphs.append(current)
+                current = ""
+        if current:
+            paragraphs.append(current)
+        return paragraphs
+
+    def _emit(self, page, neighbours):
+        paragraphs = self._unwrap(self._strip_edges(page, neighbours))
+        text = "\n\n".join(paragraphs)
+        if self._carry:
+            if text[:1].islower():
+                text = self._carry + text
+                self.removed["hyphenation"] += 1
+            else:
+                text = f"{self._carry}-\n\n{text}" if text else self._carry + "-"
+            self._carry = ""
+        # A word split across the page break is held back for the next page.
+        match = re.search(r"(\S+)[-\u00AD]$", text)
+        if match and _HYPHEN_BREAK_RE.search(match.group(0)):
+            self._carry = match.group(1)
+            text = text[: match.start()].rstrip()
+        return text
+
+    def clean(self, parts):
+        pages = []
+        marks = []
+        done = 0
+
+        def emit(position):
+            start = max(0, position - self.window)
+            neighbours = list(range(start, position)) + list(range(position + 1, min(len(pages), position + 1 + self.window)))
+            page_marks, page = pages[position][0], pages[position][1:]
+            for mark in page_marks:
+                yield mark
+            text = self._emit(page, [(other - position, pages[other][1:]) for other in neighbours])
+            if text:
+                yield text + "\n\n"
+
+        for part in parts:
+            if isinstance(part, ChapterMark):
+                marks.append(part)
+                continue
+            self.words_in += len(part.split())
+            lines = [line.strip() for line in part.splitlines()]
+            edges = self._edges(lines)
+            numerals = {index: _page_number(lines[index]) for index in edges}
+            pages.append((marks, lines, edges, {index: _edge_signature(lines[index]) for index in edges}, {index: number for index, number in numerals.items() if number}))
+            marks = []
+            while len(pages) - done > self.window:
+                yield from emit(done)
+                done += 1
+                if done > self.window:
+                    del pages[0]
+                    done -= 1
+        while done < len(pages):
+            yield from emit(done)
+            done += 1
+        if self._carry:
+            yield self._carry + "-"
+            self._carry = ""
+        yield from marks
+
+    def report(self, words_per_second=None):
+        removed = sum(count for reason, count in self.removed.items() if reason != "hyphenation")
+        report = {
+            "words_in": self.words_in,
+            "words_removed": removed,
+            "removed": dict(self.removed),
+            "lines_joined": self.lines_joined,
+            "audio_s_est": round(removed / SPOKEN_WORDS_PER_SECOND, 1),
+        }
+        if words_per_second:
+            report["render_s_est"] = round(removed / words_per_second, 1)
+        return report
+
+
+def describe_cleanup(report):
+    if not report or not report["words_removed"]:
+        return ""
+    detail = f"~{report['audio_s_est'] / 60:.1f} min of audio"
+    if "render_s_est" in report:
+        detail += f", ~{report['render_s_est'] / 60:.1f} min of rendering"
+    return f"Cleanup removed {report['words_removed']} words of headers, footers and page numbers ({detail})."
+
+
+def _epub_toc_titles(book):
+    titles = {}
+
+    def walk(entries):
+        for entry in entries:
+            if isinstance(entry, (tuple, list)):
+                section, children = entry[0], entry[1]
+                walk([section])
+                walk(children)
+                continue
+            href = (getattr(entry, "href", "") or "").split("#")[0]
+            title = (getattr(entry, "title", "") or "").strip()
+            if href and title:
+                titles.setdefault(href, title)
+
+    walk(book.toc)
+    return titles
+
+
+def _iter_epub_parts(file_path, workers):
+    book = epub.read_epub(file_path)
+    documents = []
+    for item_id, _ in book.spine:
+        item = book.get_item_with_id(item_id)
+        if item is not None and item.get_type() == ebooklib.ITEM_DOCUMENT:
+            documents.append(item)
+    if not documents:
+        documents = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+
+    # Spine documents listed in the table of contents start chapters; the
+    # rest (split files, front matter) continue the current one. Without a
+    # table of contents every spine document is its own chapter.
+    titles = _epub_toc_titles(book)
+
+    def with_chapters(texts):
+        for position, (item, text) in enumerate(zip(documents, texts)):
+            name = item.get_name()
+            if not titles or name in titles or position == 0:
+                yield ChapterMark(titles.get(name))
+            if text:
+                yield text + "\n\n"
+
+    if workers <= 1 or len(documents) <= 1:
+        yield from with_chapters(_extract_html_text(item.get_body_content()) for item in documents)
+        return
+
+    jobs = ((item.get_body_content(),) for item in documents[1:])
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        first = [_extract_html_text(documents[0].get_body_content())]
+        yield from with_chapters(itertools.chain(first, _iter_ordered_results(executor, _extract_html_text, jobs, workers * 2)))
+
+
+def _iter_txt_parts(file_path):
+    with open(file_path, "r", encoding="utf-8") as handle:
+        while True:
+            lines = list(itertools.islice(handle, TXT_LINE_BATCH))
+            if not lines:
+                return
+            yield "".join(lines)
+
+
+def iter_document_parts(file_path, workers=None, cleaner=None):
+    workers = default_ingest_workers() if workers is None else workers
+    lower_path = file_path.lower()
+
+    if lower_path.endswith(".pdf"):
+        ensure_libs("pdf")
+        parts = _iter_pdf_parts(file_path, workers)
+        return cleaner.clean(parts) if cleaner is not None else parts
+    if lower_path.endswith(".txt"):
+        return _iter_txt_parts(file_path)
+    if lower_path.endswith(".epub"):
+        ensure_libs("epub", "html")
+        return _iter_epub_parts(file_path, workers)
+    return iter(())
+
+
+def is_url(path):
+    return bool(re.match(r"https?://", path or "", re.IGNORECASE))
+
+
+def input_stem(path):
+    if is_url(path):
+        parsed = urllib.parse.urlparse(path)
+        segments = [segment for segment in parsed.path.split("/") if segment]
+        return re.sub(r"[^\w\-]+", "_", segments[-1] if segments else parsed.netloc).strip("_") or "web"
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class HttpCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.body"
+
+    def load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+            with open(body_path, "rb") as handle:
+                return meta, handle.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def store(self, url, meta, body):
+        meta_path, body_path = self._paths(url)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # Body first, so a metadata file always has its body next to it.
+            with open(body_path + suffix, "wb") as handle:
+                handle.write(body)
+            os.replace(body_path + suffix, body_path)
+            with open(meta_path + suffix, "w", encoding="utf-8") as handle:
+                json.dump(meta, handle)
+            os.replace(meta_path + suffix, meta_path)
+        except OSError as exc:
+            print(f"[System] Failed to cache {url}: {exc}")
+            _remove_quietly(body_path + suffix, meta_path + suffix)
+
+
+def configure_web_cache(cache_dir=DEFAULT_WEB_CACHE_DIR):
+    global web_cache
+    web_cache = HttpCache(cache_dir) if cache_dir else None
+    return web_cache
+
+
+# One keep-alive session whose pool is capped at the crawl's connection
+# count; cached pages are revalidated with their ETag / Last-Modified and
+# served from disk on a 304.
+class WebClient:
+    def __init__(self, connections=CRAWL_CONNECTIONS, cache=None, timeout=URL_TIMEOUT):
+        ensure_libs("web")
+        from requests.adapters import HTTPAdapter
+
+        self.cache = cache
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, url):
+        meta, body = self.cache.load(url) if self.cache else (None, None)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and body is not None:
+            self._count("revalidated")
+            return meta.get("url") or url, body
+        response.raise_for_status()
+        self._count("downloaded")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self.cache and (etag or last_modified):
+            self.cache.store(url, {"url": response.url, "etag": etag, "last_modified": last_modified}, response.content)
+        return response.url, response.content
+
+    def close(self):
+        self.session.close()
+
+
+WebPage = collections.namedtuple("WebPage", "url title text next_url links")
+_NEXT_TEXT_RE = re.compile(r"^\W*next\b|^\s*(?:\u203a|\u00bb|\u2192|>>?)\s*$", re.IGNORECASE)
+
+
+def parse_web_page(url, content):
+    ensure_libs("html")
+    soup = BeautifulSoup(content, "html.parser")
+    heading = soup.find(["h1", "h2"]) or soup.find("title")
+    title = heading.get_text(" ", strip=True) if heading else ""
+    text = "\n".join(paragraph.get_text(" ", strip=True) for paragraph in soup.find_all("p")).strip()
+
+    links = []
+    next_url = None
+    for anchor in soup.find_all(["a", "link"], href=True):
+        href = urllib.parse.urldefrag(urllib.parse.urljoin(url, anchor["href"]))[0]
+        label = anchor.get_text(" ", strip=True)
+        if anchor.name == "a":
+            links.append((href, label))
+        if next_url is None and ("next" in (anchor.get("rel") or []) or (anchor.name == "a" and _NEXT_TEXT_RE.search(label))):
+            next_url = href
+    return WebPage(url, title, text, next_url, links)
+
+
+def _link_shape(href):
+    # Chapter links share a path shape once numbers and the final slug are
+    # folded, e.g. /fiction/#/story/chapter/#/*.
+    segments = [segment for segment in urllib.parse.urlparse(href).path.split("/") if segment]
+    return tuple(re.sub(r"\d+", "#", segment) for segment in segments[:-1]) + ("*",) * bool(segments)
+
+
+def toc_links(page, link_pattern=None):
+    host = urllib.parse.urlparse(page.url).netloc
+    seen = {page.url}
+    links = []
+    for href, label in page.links:
+        parsed = urllib.parse.urlparse(href)
+        if parsed.scheme not in ("http", "https") or parsed.netloc != host or href in seen:
+            continue
+        if link_pattern and not (re.search(link_pattern, href) or re.search(link_pattern, label)):
+            continue
+        seen.add(href)
+        links.append((href, label))
+    if link_pattern or not links:
+        return links
+    shape, count = collections.Counter(_link_shape(href) for href, _ in links).most_common(1)[0]
+    if count < 2:
+        return links
+    return [(href, label) for href, label in links if _link_shape(href) == shape]
+
+
+def iter_url_parts(url, mode="page", max_pages=CRAWL_MAX_PAGES, connections=CRAWL_CONNECTIONS, link_pattern=None, on_page=None):
+    on_page = on_page or (lambda count, page: None)
+    client = WebClient(connections, web_cache)
+    try:
+        start = parse_web_page(*client.get(url))
+        if mode == "page":
+            on_page(1, start)
+            if start.text:
+                yield start.text
+            return
+
+        if mode == "toc":
+            links = toc_links(start, link_pattern)[:max_pages]
+            # Chapters download in parallel but come out in table order.
+            with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+                fetched = _iter_ordered_results(executor, client.get, ((href,) for href, _ in links), connections * 2)
+                for count, ((_, label), response) in enumerate(zip(links, fetched), start=1):
+                    page = parse_web_page(*response)
+                    on_page(count, page)
+                    yield ChapterMark(page.title or label or None)
+                    if page.text:
+                        yield page.text + "\n\n"
+            return
+
+        # Each page names the next one, so "next" crawls walk the chain
+        # one request at a time over the same kept-alive connection.
+        page, seen = start, {url}
+        for count in range(1, max_pages + 1):
+            on_page(count, page)
+            yield ChapterMark(page.title or None)
+            if page.text:
+                yield page.text + "\n\n"
+            if not page.next_url or page.next_url in seen or count == max_pages:
+                return
+            seen.add(page.next_url)
+            page = parse_web_page(*client.get(page.next_url))
+    finally:
+        if client.stats:
+            print(f"[System] Fetched {client.stats['downloaded']} pages, {client.stats['revalidated']} unchanged from the web cache.")
+        client.close()
+
+
+def extract_text_from_file(file_path, workers=None):
+    return "".join(part for part in iter_document_parts(file_path, workers, PdfTextCleaner()) if isinstance(part, str)).rstrip("\n")
+
+
+def iter_text_chunks(parts, original_chunk_size, wiggle_room=20, chapters=False, chunking="greedy"):
+    if isinstance(parts, str):
+        parts = [parts]
+
+    stable = chunking == "stable"
+    split = split_text_into_stable_chunks if stable else split_text_into_chunks
+    window = original_chunk_size + wiggle_room
+    words = []
+    sentence_ends = []
+    for part in parts:
+        if isinstance(part, ChapterMark):
+            if not chapters:
+                continue
+            # Chunks never straddle a chapter boundary.
+            if words:
+                yield from split(words, original_chunk_size, wiggle_room, sentence_ends)
+                words, sentence_ends = [], []
+            yield part
+            continue
+        part_words, part_ends = segment_words(part)
+        if part_words and sentence_ends and sentence_ends[-1] and part_words[0][0].islower():
+            sentence_ends[-1] = False
+        words.extend(part_words)
+        sentence_ends.extend(part_ends)
+        # Advance a cursor instead of deleting from the front of the buffer,
+        # which would be quadratic when a single part holds a whole book.
+        pos = 0
+        while len(words) - pos > window:
+            if stable:
+                chunk = words[pos : pos + stable_chunk_length(words, sentence_ends, pos, original_chunk_size, wiggle_room)]
+            else:
+                chunk = split_text_into_chunks(words[pos : pos + window], original_chunk_size, wiggle_room, sentence_ends[pos : pos + window])[0]
+            pos += len(chunk)
+            yield chunk
+        del words[:pos]
+        del sentence_ends[:pos]
+
+    if words:
+        yield from split(words, original_chunk_size, wiggle_room, sentence_ends)
+
+
+def synthesize_chunk_with_retries(state, chunk_text, out_path, temp_val, speed_val, label, attempts=3, voice_id=None):
+    for attempt in range(1, attempts + 1):
+        try:
+            synthesize_chunk_to_file(state, chunk_text, out_path, temp_val, speed_val, voice_id)
+            return True
+        except Exception as chunk_error:
+            print(f"[{label}] Attempt {attempt} failed: {chunk_error}")
+            if attempt >= attempts:
+                print(f"[{label}] Skipping.")
+                break
+            time.sleep(1)
+    return False
+
+
+def _chunk_progress_info(prefix, journal, avg_time):
+    total = journal.expected_total or len(journal.chunks)
+    info = f"{prefix}/{total}" if journal.expected_total else prefix
+    if avg_time > 0:
+        remaining_time = avg_time * max(total - journal.done_count, 0)
+        info += f" | Avg: {avg_time:.2f}m | Est. Remaining: {remaining_time:.2f}m"
+    return info, total
+
+
+def _render_chunks_sequential(
+    state, voice_id, journal, tasks, temp_val, speed_val, on_status, on_progress, on_chunk, metrics, stop, model_lock
+):
+    hits_before, misses_before = (chunk_cache.hits, chunk_cache.misses) if chunk_cache else (0, 0)
+    times = []
+    output_files = []
+    failed_chunks = []
+
+    for idx, chunk_text, out_path in tasks:
+        if stop.is_set():
+            on_status(f"Stopped. Saved {len(output_files)} files so far.")
+            break
+
+        started = time.time()
+        avg_time = (sum(times) / len(times)) / 60.0 if times else 0.0
+        info, total = _chunk_progress_info(f"Processing chunk {idx + 1}", journal, avg_time)
+        on_progress(journal.done_count, total, info)
+        on_status(f"Generating chunk {idx + 1}...")
+        on_chunk(idx, "rendering")
+        chunk_hits = chunk_cache.hits if chunk_cache else 0
+        before = stage_timer.snapshot()
+
+        # The lock is held one chunk at a time, so a preview or audition
+        # waiting for the model gets it between two chunks of a book.
+        with model_lock:
+            success = synthesize_chunk_with_retries(
+                state, chunk_text, out_path, temp_val, speed_val, f"Chunk {idx + 1}", voice_id=voice_id
+            )
+        if not success:
+            failed_chunks.append(idx + 1)
+            journal.mark(idx, "failed")
+            on_chunk(idx, "failed")
+            metrics.add_chunk(idx, chunk_text, "failed", time.time() - started, stage_timer.since(before))
+            continue
+
+        status = "cached" if chunk_cache and chunk_cache.hits > chunk_hits else "done"
+        journal.mark(idx, "done")
+        on_chunk(idx, status)
+        output_files.append(out_path)
+        on_progress(journal.done_count, total, info)
+        with stage_timer.stage("gc"):
+            gc.collect()
+        elapsed = time.time() - started
+        times.append(elapsed)
+        metrics.add_chunk(idx, chunk_text, status, elapsed, stage_timer.since(before))
+        print(f"[Chunk {idx + 1}] Done in {elapsed:.2f}s")
+
+    cache_stats = {"hits": 0, "misses": 0}
+    if chunk_cache:
+        cache_stats = {"hits": chunk_cache.hits - hits_before, "misses": chunk_cache.misses - misses_before}
+    return output_files, failed_chunks, cache_stats
+
+
+_worker_voice = (None, None)
+
+
+def _worker_voice_state(voice_key):
+    # A worker renders many chunks in the same voice, so the state is
+    # resolved once and only again when the voice or its reference clip
+    # changes.
+    global _worker_voice
+    ref_audio_path = voice_key[0]
+    key = (voice_key, os.path.getmtime(ref_audio_path) if ref_audio_path and os.path.exists(ref_audio_path) else None)
+    if _worker_voice[0] != key:
+        _worker_voice = (key, prepare_voice_state(*voice_key))
+    return _worker_voice[1]
+
+
+def _init_render_worker(torch_threads, cache_dir, cache_mb, voice_cache_dir, sample_format, memo_mb, polish, voice_key):
+    sys.stdout = sys.stderr
+    configure_chunk_cache(cache_dir, cache_mb)
+    configure_voice_state_store(voice_cache_dir)
+    configure_chunk_format(sample_format)
+    configure_phrase_memo(memo_mb)
+    configure_audio_polish(**(polish or {}), enabled=bool(polish))
+    ensure_libs("audio", "model")
+    if torch_threads and torch is not None:
+        torch.set_num_threads(torch_threads)
+    if not ensure_model_loaded():
+        raise RuntimeError("Failed to load PocketTTS model in worker.")
+    if voice_key is not None:
+        _worker_voice_state(voice_key)
+
+
+def _render_chunk_task(voice_key, voice_id, idx, chunk_text, out_path, temp_val, speed_val, memo_scope):
+    started = time.time()
+    hits_before, misses_before = (chunk_cache.hits, chunk_cache.misses) if chunk_cache else (0, 0)
+    before = stage_timer.snapshot()
+    if phrase_memo is not None:
+        phrase_memo.begin(memo_scope)
+    state = _worker_voice_state(voice_key)
+    success = synthesize_chunk_with_retries(
+        state, chunk_text, out_path, temp_val, speed_val, f"Chunk {idx + 1}", voice_id=voice_id
+    )
+    with stage_timer.stage("gc"):
+        gc.collect()
+    cache_delta = (0, 0)
+    if chunk_cache:
+        cache_delta = (chunk_cache.hits - hits_before, chunk_cache.misses - misses_before)
+    return idx, success, time.time() - started, cache_delta, stage_timer.since(before)
+
+
+def create_render_pool(workers, torch_threads=0, cache_dir=None, cache_mb=0, voice_key=None):
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_render_worker,
+        initargs=(
+            torch_threads,
+            cache_dir,
+            cache_mb,
+            voice_state_store.cache_dir,
+            chunk_format,
+            phrase_memo.max_bytes / (1024 * 1024) if phrase_memo else 0,
+            audio_polish,
+            voice_key,
+        ),
+    )
+
+
+def _render_chunks_parallel(
+    pool, workers, voice_key, voice_id, journal, tasks, temp_val, speed_val, on_status, on_progress, on_chunk, metrics, memo_scope, stop
+):
+    started_at = time.time()
+    cache_stats = {"hits": 0, "misses": 0}
+    finished = {}
+    failed_chunks = []
+    pending = {}
+    queued = iter(tasks)
+    in_flight = max(workers, 1)
+
+    def submit_next():
+        if stop.is_set():
+            return
+        task = next(queued, None)
+        if task is None:
+            return
+        idx, chunk_text, out_path = task
+        future = pool.submit(_render_chunk_task, voice_key, voice_id, idx, chunk_text, out_path, temp_val, speed_val, memo_scope)
+        pending[future] = (idx, chunk_text, out_path)
+        on_chunk(idx, "rendering")
+
+    for _ in range(in_flight):
+        submit_next()
+    on_status(f"Generating chunks on {in_flight} workers...")
+
+    while pending:
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            idx, chunk_text, out_path = pending.pop(future)
+            try:
+                _, success, elapsed, (hits, misses), stage_delta = future.result()
+                cache_stats["hits"] += hits
+                cache_stats["misses"] += misses
+            except Exception as exc:
+                print(f"[Chunk {idx + 1}] Worker failed: {exc}")
+                success = False
+                elapsed = 0.0
+                hits = 0
+                stage_delta = {"stages": {}, "calls": {}, "audio_s": 0.0}
+
+            if success:
+                status = "cached" if hits else "done"
+                finished[idx] = out_path
+                journal.mark(idx, "done")
+                on_chunk(idx, status)
+                print(f"[Chunk {idx + 1}] Done in {elapsed:.2f}s")
+            else:
+                status = "failed"
+                failed_chunks.append(idx + 1)
+                journal.mark(idx, "failed")
+                on_chunk(idx, "failed")
+            metrics.add_chunk(idx, chunk_text, status, elapsed, stage_delta)
 
-    state = pocket_model.get_state_for_audio_prompt(final_prompt)
-    return state, temp_file
+            completed = len(finished) + len(failed_chunks)
+            avg_time = (time.time() - started_at) / completed / 60.0
+            info, total = _chunk_progress_info(f"Finished {journal.done_count} chunks", journal, avg_time)
+            on_progress(journal.done_count, total, info)
+            submit_next()
 
+    if stop.is_set():
+        on_status(f"Stopped. Saved {len(finished)} files so far.")
+    output_files = [finished[idx] for idx in sorted(finished)]
+    return output_files, sorted(failed_chunks), cache_stats
 
-def _generate_pocket_safe(state, text):
-    global pocket_model
-    chunk_size = 200
 
-    raw_chunks = re.split(r"([.!?]+)", text)
-    chunks = []
-    current = ""
-    for part in raw_chunks:
-        if len(current) + len(part) < chunk_size:
-            current += part
-        else:
-            if current:
-                chunks.append(current)
-            current = part
-    if current:
-        chunks.append(current)
-
-    final_chunks = []
-    for chunk in chunks:
-        if not chunk.strip():
+class FairScheduler:
+    def __init__(self):
+        self._queues = collections.OrderedDict()
+        self._cond = threading.Condition()
+
+    def submit(self, client_id, job):
+        with self._cond:
+            self._queues.setdefault(client_id, collections.deque()).append(job)
+            self._cond.notify()
+
+    def requeue(self, client_id, job):
+        # A job with sub-chunks left keeps its place among its client's jobs,
+        # but the client has had its turn and waits behind the others.
+        with self._cond:
+            self._queues.setdefault(client_id, collections.deque()).appendleft(job)
+            self._cond.notify()
+
+    def next_job(self):
+        # Round-robin over clients, one model sub-chunk per turn: the worker
+        # requeues a job after each sub-chunk, so a long request cannot hold
+        # the model while a preview from another window waits.
+        with self._cond:
+            while not self._queues:
+                self._cond.wait()
+            client_id, jobs = self._queues.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                self._queues[client_id] = jobs
+            return client_id, job
+
+    def pending(self):
+        with self._cond:
+            return {client_id: len(jobs) for client_id, jobs in self._queues.items()}
+
+
+class _SynthesisJob:
+    def __init__(self, text, ref_audio_path, voice_name, temp_val):
+        self.text = text
+        self.ref_audio_path = ref_audio_path
+        self.voice_name = voice_name
+        self.temp_val = temp_val
+        self.pieces = collections.deque(piece.strip() for piece in split_for_model(text) if piece.strip())
+        self.state = None
+        self.blocks = queue.Queue()
+        self.stop = threading.Event()
+
+
+# Block lengths are whole float32 samples, so a multiple of four: the two
+# markers can never collide with a real (possibly empty) audio block.
+_FRAME_END = 0xFFFFFFFF
+_FRAME_ERROR = 0xFFFFFFFE
+
+
+def _pack_frame(block):
+    if block is None:
+        return struct.pack("<I", _FRAME_END)
+    if isinstance(block, Exception):
+        message = str(block).encode("utf-8")
+        return struct.pack("<II", _FRAME_ERROR, len(message)) + message
+    data = np.ascontiguousarray(block, dtype="<f4").tobytes()
+    return struct.pack("<I", len(data)) + data
+
+
+def _read_frame(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        raise ConnectionError("Model server closed the stream early.")
+    (size,) = struct.unpack("<I", header)
+    if size == _FRAME_END:
+        return None
+    if size == _FRAME_ERROR:
+        (length,) = struct.unpack("<I", stream.read(4))
+        raise RuntimeError(f"Model server: {stream.read(length).decode('utf-8', 'replace')}")
+    data = stream.read(size)
+    if len(data) < size:
+        raise ConnectionError("Model server closed the stream early.")
+    return np.frombuffer(data, dtype="<f4")
+
+
+def _model_server_worker(scheduler, stats):
+    while True:
+        client_id, job = scheduler.next_job()
+        if job.stop.is_set():
+            job.blocks.put(None)
             continue
-        while len(chunk) > chunk_size:
-            split = chunk[:chunk_size].rfind(" ")
-            if split == -1:
-                split = chunk_size
-            final_chunks.append(chunk[:split])
-            chunk = chunk[split:]
-        final_chunks.append(chunk)
-
-    full_audio = []
-    for chunk in final_chunks:
-        chunk = chunk.strip()
-        if not chunk:
+        try:
+            if job.state is None:
+                job.state = prepare_voice_state(job.ref_audio_path, job.voice_name)
+            pocket_model.temp = job.temp_val
+            if job.pieces:
+                for block in iter_pocket_audio(job.state, job.pieces.popleft(), stream=True, stop=job.stop):
+                    if len(block):
+                        job.blocks.put(np.ascontiguousarray(block, dtype="<f4"))
+        except Exception as exc:
+            traceback.print_exc()
+            stats["errors"] += 1
+            job.blocks.put(exc)
             continue
-        tensor = pocket_model.generate_audio(state, chunk)
-        if tensor is not None:
-            full_audio.append(tensor.numpy())
+        if job.pieces and not job.stop.is_set():
+            scheduler.requeue(client_id, job)
+        else:
+            stats["jobs"] += 1
+            job.blocks.put(None)
 
-    if not full_audio:
-        return None
-    return np.concatenate(full_audio)
 
+class _ModelRequestHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        print(f"[Server] {self.address_string()} {fmt % args}")
 
-def apply_speed_to_audio(file_path, speed):
-    if speed == 1.0:
-        return True
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-    temp_file = file_path + ".speed.wav"
-    try:
-        command = [
-            "ffmpeg",
-            "-y",
-            "-i",
-            file_path,
-            "-filter:a",
-            f"atempo={speed}",
-            temp_file,
-        ]
-        result = subprocess.run(command, capture_output=True, text=True)
-        if result.returncode == 0:
-            os.replace(temp_file, file_path)
-            return True
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(
+            200,
+            {
+                "model_version": model_version(),
+                "sample_rate": pocket_model.sample_rate,
+                "pending": self.server.scheduler.pending(),
+                **self.server.stats,
+            },
+        )
 
-        print(f"[System] FFmpeg speed error: {result.stderr}")
-        return False
-    except Exception as exc:
-        print(f"[System] Failed to apply speed: {exc}")
-        return False
+    def do_POST(self):
+        if self.path != "/synthesize":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            job = _SynthesisJob(str(request["text"]), request.get("ref_audio") or "", request.get("voice") or VOICE_OPTIONS[0], float(request.get("temperature", 0.7)))
+        except (KeyError, TypeError, ValueError) as exc:
+            self._send_json(400, {"error": f"bad request: {exc}"})
+            return
+
+        self.server.scheduler.submit(request.get("client") or self.address_string(), job)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("X-Sample-Rate", str(pocket_model.sample_rate))
+        self.end_headers()
+        try:
+            while True:
+                block = job.blocks.get()
+                self.wfile.write(_pack_frame(block))
+                if block is None or isinstance(block, Exception):
+                    return
+        except OSError:
+            # The client hung up (a cancelled preview); stop generating for it.
+            job.stop.set()
+
+
+def serve_model(host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, torch_threads=0):
+    if not ensure_model_loaded():
+        print("[System] Failed to load PocketTTS model.")
+        return 1
+    if torch_threads and torch is not None:
+        torch.set_num_threads(torch_threads)
+
+    server = http.server.ThreadingHTTPServer((host, port), _ModelRequestHandler)
+    server.daemon_threads = True
+    server.scheduler = FairScheduler()
+    server.stats = collections.Counter(jobs=0, errors=0)
+    threading.Thread(target=_model_server_worker, args=(server.scheduler, server.stats), daemon=True).start()
+    print(f"[System] Model server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
     finally:
-        if os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except OSError:
-                pass
+        server.server_close()
+    return 0
+
+
+class RemoteModel:
+    def __init__(self, url, client_id=None, timeout=2.0):
+        self.url = url.rstrip("/")
+        self.client_id = client_id or f"{socket.gethostname()}:{os.getpid()}"
+        info = self.health(timeout)
+        self.sample_rate = int(info["sample_rate"])
+        self.version = info["model_version"]
+        self.temp = 0.7
+
+    def health(self, timeout=5.0):
+        with urllib.request.urlopen(f"{self.url}/health", timeout=timeout) as response:
+            return json.loads(response.read())
+
+    def iter_audio(self, state, text, stop=None):
+        payload = json.dumps({"client": self.client_id, "text": text, "temperature": self.temp, **state}).encode("utf-8")
+        request = urllib.request.Request(f"{self.url}/synthesize", data=payload, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            while True:
+                with stage_timer.stage("generate"):
+                    block = _read_frame(response)
+                if block is None:
+                    return
+                yield block
+                if stop is not None and stop.is_set():
+                    return
 
 
-def synthesize_chunk_to_file(state, text, out_path, temp_val=0.7, speed_val=1.0):
+def connect_model_server(url, timeout=2.0):
     global pocket_model
-    pocket_model.temp = temp_val
-
-    audio_np = _generate_pocket_safe(state, text)
-    if audio_np is None:
-        raise RuntimeError("No audio generated.")
-
-    scipy_wav.write(out_path, pocket_model.sample_rate, audio_np)
+    ensure_libs("audio")
+    started = time.perf_counter()
+    try:
+        remote = RemoteModel(url, timeout=timeout)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"[System] No model server at {url}: {exc}")
+        return False
+    with _model_load_lock:
+        pocket_model = remote
+        startup_timings["model_load"] = round(time.perf_counter() - started, 4)
+        model_ready.set()
+    print(f"[System] Using model server at {url} (model {remote.version}).")
+    return True
+
+
+def write_json_atomic(path, payload):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=1)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+
+
+def chunk_text_hash(chunk_text):
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()[:20]
+
+
+class ChunkMatcher:
+    # Pairs each chunk with a previous one holding the same text: at the same
+    # position, or with content-anchored chunking anywhere in the book.
+    def __init__(self, previous_hashes, by_content=False):
+        self.previous = list(previous_hashes)
+        self.by_content = by_content
+        self.used = set()
+        self._positions = collections.defaultdict(collections.deque)
+        if by_content:
+            for index, chunk_hash in enumerate(self.previous):
+                self._positions[chunk_hash].append(index)
+
+    def match(self, idx, chunk_hash):
+        if idx < len(self.previous) and idx not in self.used and self.previous[idx] == chunk_hash:
+            self.used.add(idx)
+            return idx
+        positions = self._positions.get(chunk_hash)
+        while positions:
+            index = positions.popleft()
+            if index not in self.used:
+                self.used.add(index)
+                return index
+        return None
 
-    if speed_val != 1.0:
-        apply_speed_to_audio(out_path, speed_val)
+    def unmatched(self):
+        return [index for index in range(len(self.previous)) if index not in self.used]
+
+
+def diff_chunks(previous_hashes, chunk_texts, by_content=False):
+    # Matches chunks the way the render journal does, so "changed" is exactly
+    # what a re-render would synthesize.
+    matcher = ChunkMatcher(previous_hashes, by_content)
+    summary = {"event": "summary", "chunks": 0, "reused": 0, "moved": 0, "changed": 0, "changed_words": 0, "removed": 0}
+    run = None
+    for idx, chunk_text in enumerate(chunk_texts):
+        summary["chunks"] += 1
+        match = matcher.match(idx, chunk_text_hash(chunk_text))
+        if match is not None:
+            summary["reused"] += 1
+            summary["moved"] += match != idx
+            if run:
+                yield run
+                run = None
+            continue
+        words = len(chunk_text.split())
+        summary["changed"] += 1
+        summary["changed_words"] += words
+        if run is None:
+            run = {"event": "changed", "chunks": [idx + 1, idx + 1], "words": 0, "text": chunk_text[:80]}
+        run["chunks"][1] = idx + 1
+        run["words"] += words
+    if run:
+        yield run
+
+    removed = matcher.unmatched()
+    summary["removed"] = len(removed)
+    first = 0
+    for pos in range(1, len(removed) + 1):
+        if pos == len(removed) or removed[pos] != removed[pos - 1] + 1:
+            yield {"event": "removed", "previous_chunks": [removed[first] + 1, removed[pos - 1] + 1]}
+            first = pos
+    yield summary
+
+
+class RenderJournal:
+    # The JSON file is a snapshot; each finished chunk or chapter appends one
+    # line to the log beside it, and the log is folded into the snapshot at
+    # the start and end of a render. A mark therefore costs one short write
+    # rather than a rewrite of the whole book's journal.
+    FILE_NAME = "render_journal.json"
+    LOG_NAME = "render_journal.log"
+    DONE_STATUSES = ("done", "encoded", "spooled")
+    # Appends reach the OS at once, which survives a crash of the app; they
+    # are synced to disk at most this often, so a power cut costs at most
+    # the chunks of the last few seconds.
+    SYNC_SECONDS = 5.0
+
+    def __init__(self, output_directory, params):
+        self.output_directory = output_directory
+        self.path = os.path.join(output_directory, self.FILE_NAME)
+        self.log_path = os.path.join(output_directory, self.LOG_NAME)
+        self.params = params
+        self.chunks = []
+        self.mp3 = None
+        self.done_count = 0
+        self.expected_total = None
+        self._previous = []
+        self._previous_mp3 = None
+        self.chapters = []
+        self._previous_chapters = []
+        self.spool_path = os.path.join(output_directory, SPOOL_FILE)
+        self.spool_end = 0
+        self.sample_rate = None
+        self._stale_mp3 = False
+        self._log = None
+        self._synced = 0.0
+
+        previous = self._load()
+        self._generation = previous.get("log", 0) if previous is not None else 0
+        if previous is not None and previous.get("params") == params:
+            self._previous = previous.get("chunks", [])
+            self._previous_mp3 = previous.get("mp3")
+            self._previous_chapters = previous.get("chapters", [])
+            self.sample_rate = previous.get("sample_rate")
+            if os.path.exists(self.spool_path):
+                # Regions of chunks that are about to be replaced stay
+                # reserved until the run has registered every chunk.
+                self.spool_end = max((entry["offset"] + entry["frames"] * SPOOL_SAMPLE_BYTES for entry in self._previous if "offset" in entry), default=0)
+        elif previous is not None:
+            print("[System] Render settings changed since the last run; starting a fresh journal.")
+        self.by_content = params.get("chunking") == "stable"
+        self._matcher = ChunkMatcher((entry.get("hash") for entry in self._previous), self.by_content)
+        # Fold the previous run's log in, so the log only ever extends the
+        # snapshot next to it.
+        self.save()
+
+    @classmethod
+    def read(cls, output_directory):
+        # The snapshot with its log replayed on top; raises OSError or
+        # ValueError when the snapshot cannot be read.
+        with open(os.path.join(output_directory, cls.FILE_NAME), "r", encoding="utf-8") as handle:
+            journal = json.load(handle)
+        try:
+            with open(os.path.join(output_directory, cls.LOG_NAME), "r", encoding="utf-8") as handle:
+                lines = handle.readlines()
+        except FileNotFoundError:
+            return journal
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A line torn by a crash ends the log.
+                break
+        # A log left behind by an interrupted compaction belongs to an older
+        # snapshot and is already part of this one.
+        if not records or records[0].get("log") != journal.get("log"):
+            return journal
+        pending = {"hash": "", "file": "", "status": "pending"}
+        for record in records[1:]:
+            key, entries = ("chunk", journal.setdefault("chunks", [])) if "chunk" in record else ("chapter", journal.setdefault("chapters", []))
+            while len(entries) <= record[key]:
+                entries.append(dict(pending))
+            entries[record[key]] = record["entry"]
+            if record.get("sample_rate"):
+                journal["sample_rate"] = record["sample_rate"]
+        return journal
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            return self.read(self.output_directory)
+        except (OSError, ValueError) as exc:
+            print(f"[Warning] Ignoring unreadable render journal: {exc}")
+            return None
+
+    def save(self):
+        # Rewrites the snapshot and starts a new log.
+        self._close_log()
+        self._generation += 1
+        chunks = self.chunks + self._previous[len(self.chunks) :]
+        chapters = self.chapters + self._previous_chapters[len(self.chapters) :]
+        write_json_atomic(
+            self.path,
+            {
+                "version": 1,
+                "params": self.params,
+                "chunks": chunks,
+                "chapters": chapters,
+                "mp3": self.mp3 or self._previous_mp3,
+                "sample_rate": self.sample_rate,
+                "log": self._generation,
+            },
+        )
+        _remove_quietly(self.log_path)
+
+    def _append(self, record):
+        if self._log is None:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+            if not self._log.tell():
+                self._log.write(json.dumps({"log": self._generation}) + "\n")
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+        if time.monotonic() - self._synced >= self.SYNC_SECONDS:
+            os.fsync(self._log.fileno())
+            self._synced = time.monotonic()
+
+    def _close_log(self):
+        if self._log is not None:
+            os.fsync(self._log.fileno())
+            self._log.close()
+            self._log = None
+
+    def _record_chunk(self, idx):
+        self._append({"chunk": idx, "entry": self.chunks[idx], "sample_rate": self.sample_rate})
+
+    def _record_chapter(self, ci):
+        self._append({"chapter": ci, "entry": self.chapters[ci]})
+
+    def close(self):
+        # Called once the render is over, finished or not.
+        if self._log is not None:
+            self.save()
+
+    def start_chapter(self, title):
+        if self.chapters and not self.chapters[-1]["count"]:
+            # Nothing was registered under the previous mark; retitle it.
+            ci = len(self.chapters) - 1
+            self.chapters[ci]["title"] = title or f"Chapter {ci + 1}"
+            return ci
+        ci = len(self.chapters)
+        self.chapters.append(
+            {"title": title or f"Chapter {ci + 1}", "first": len(self.chunks), "count": 0, "hash": None, "file": None, "status": "pending", "duration": 0.0}
+        )
+        return ci
+
+    def close_chapter(self, ci):
+        # A chapter whose title and chunks are unchanged keeps its previous
+        # encoding; returns whether it is still valid.
+        chapter = self.chapters[ci]
+        digest = hashlib.sha256(chapter["title"].encode("utf-8"))
+        for idx in self.chapter_indexes(ci):
+            digest.update(self.chunks[idx]["hash"].encode("ascii"))
+        chapter["hash"] = digest.hexdigest()
+        previous = self._previous_chapters[ci] if ci < len(self._previous_chapters) else None
+        if (
+            previous
+            and previous.get("hash") == chapter["hash"]
+            and previous.get("status") == "encoded"
+            and previous.get("file")
+            and os.path.exists(os.path.join(self.output_directory, previous["file"]))
+        ):
+            chapter.update(status="encoded", file=previous["file"], duration=previous.get("duration", 0.0))
+        self._record_chapter(ci)
+        return chapter["status"] == "encoded"
+
+    def chapter_indexes(self, ci):
+        chapter = self.chapters[ci]
+        return range(chapter["first"], chapter["first"] + chapter["count"])
+
+    def chapter_path(self, ci):
+        return os.path.join(self.output_directory, self.chapters[ci]["file"])
+
+    def mark_chapter(self, ci, relative_file, duration):
+        self.chapters[ci].update(status="encoded", file=relative_file, duration=round(duration, 3))
+        self._record_chapter(ci)
+
+    def register(self, chunk_hash):
+        if not self.chapters:
+            self.start_chapter(None)
+        idx = len(self.chunks)
+        self.chapters[-1]["count"] += 1
+        # Content-anchored chunks move when text is inserted before them, so
+        # their files carry the hash and never collide with a moved chunk's.
+        name = f"output_{idx + 1}_{chunk_hash[:8]}" if self.by_content else f"output_{idx + 1}"
+        entry = {"hash": chunk_hash, "file": f"{name}{chunk_suffix()}", "status": "pending", "chapter": len(self.chapters) - 1}
+        match = self._matcher.match(idx, chunk_hash)
+        if match is not None:
+            previous = self._previous[match]
+            entry["file"] = previous.get("file", entry["file"])
+            entry["status"] = previous.get("status", "pending")
+            if previous.get("segment"):
+                entry.update(segment=previous["segment"], duration=previous.get("duration", 0.0))
+            if "offset" in previous:
+                entry.update(offset=previous["offset"], frames=previous["frames"], duration=previous.get("duration", 0.0))
+        # Chunks rendered during registration must not pass for carried over.
+        if entry["status"] not in ("merged", "encoded", "spooled") or match != idx:
+            self._stale_mp3 = True
+        self.chunks.append(entry)
+        if self.is_done(idx):
+            self.done_count += 1
+        return idx
+
+    def finish_registration(self):
+        if self.by_content:
+            referenced = {entry["file"] for entry in self.chunks} | {entry.get("segment") for entry in self.chunks}
+            for index in self._matcher.unmatched():
+                for name in (self._previous[index].get("file"), self._previous[index].get("segment")):
+                    if name and name not in referenced:
+                        _remove_quietly(os.path.join(self.output_directory, name))
+        self._previous_chapters = []
+        self._previous = self._previous[: len(self.chunks)]
+        if (
+            self._previous_mp3
+            and os.path.exists(self._previous_mp3)
+            and len(self._previous) == len(self.chunks)
+            and not self._stale_mp3
+            and (
+                all(entry["status"] == "merged" for entry in self.chunks)
+                or all(entry["status"] in ("encoded", "spooled") and self.is_done(idx) for idx, entry in enumerate(self.chunks))
+            )
+        ):
+            self.mp3 = self._previous_mp3
+        self._previous = []
+        self._previous_mp3 = None
+        self.save()
+
+    def file_path(self, idx):
+        return os.path.join(self.output_directory, self.chunks[idx]["file"])
+
+    def segment_path(self, idx):
+        return os.path.join(self.output_directory, self.chunks[idx].get("segment") or segment_file_name(self.chunks[idx]["file"]))
+
+    def is_done(self, idx):
+        # An encoded chunk's WAV is gone; its MP3 segment stands in for it.
+        if self.chunks[idx]["status"] == "encoded":
+            return os.path.exists(self.segment_path(idx))
+        if self.chunks[idx]["status"] == "spooled":
+            return os.path.exists(self.spool_path)
+        return self.chunks[idx]["status"] == "done" and os.path.exists(self.file_path(idx))
+
+    def output_path(self, idx):
+        status = self.chunks[idx]["status"]
+        if status == "spooled":
+            return self.spool_path
+        return self.segment_path(idx) if status == "encoded" else self.file_path(idx)
+
+    def spool_spans(self, indexes):
+        return [(self.chunks[idx]["offset"], self.chunks[idx]["frames"]) for idx in indexes]
+
+    def is_merged(self):
+        return bool(self.mp3) and os.path.exists(self.mp3)
+
+    def mark(self, idx, status):
+        done = self.DONE_STATUSES
+        if status in done and self.chunks[idx]["status"] not in done:
+            self.done_count += 1
+        elif status not in done and self.chunks[idx]["status"] in done:
+            self.done_count -= 1
+        self.chunks[idx]["status"] = status
+        self._record_chunk(idx)
+
+    def mark_segment(self, idx, relative_file, duration):
+        self.chunks[idx].update(status="encoded", segment=relative_file, duration=round(duration, 3))
+        self._record_chunk(idx)
+
+    def mark_spooled(self, idx, offset, frames, sample_rate):
+        self.sample_rate = sample_rate
+        self.chunks[idx].update(status="spooled", offset=offset, frames=frames, duration=round(frames / sample_rate, 3))
+        self._record_chunk(idx)
+
+    def compact_spool(self, end):
+        # Re-rendered chunks leave their old regions behind; once they are a
+        # large enough share of the spool it is rewritten with the live ones.
+        spooled = [idx for idx, entry in enumerate(self.chunks) if entry["status"] == "spooled"]
+        live = sum(self.chunks[idx]["frames"] for idx in spooled) * SPOOL_SAMPLE_BYTES
+        if not spooled or end - live <= SPOOL_COMPACT_SHARE * end:
+            return 0
+        offsets = PcmSpool.compact(self.spool_path, self.spool_spans(spooled))
+        for idx, offset in zip(spooled, offsets):
+            self.chunks[idx]["offset"] = offset
+        self.spool_end = live
+        self.save()
+        return end - live
+
+    def done_indexes(self):
+        return [idx for idx in range(len(self.chunks)) if self.is_done(idx)]
+
+    def mark_merged(self, mp3_path, cleaned_up):
+        self.mp3 = mp3_path
+        if cleaned_up:
+            for entry in self.chunks:
+                entry["status"] = "merged"
+            self.done_count = 0
+        self.save()
+
+
+def _timed(function, *args):
+    started = time.perf_counter()
+    return function(*args), time.perf_counter() - started
+
+
+class ChunkOutput:
+    # Turns each finished chunk into what the merge reads: a region of the
+    # spool, an MP3 segment, or the WAV itself.
+    def __init__(self, journal, metrics, combine_mp3, segmented_mp3, m4b, on_status):
+        self.journal = journal
+        self.metrics = metrics
+        # A spooled book keeps every chunk in one raw PCM file and is encoded
+        # from it in a single pass.
+        # Without a merge there is nothing to read it back, so the chunks stay
+        # int16 WAVs.
+        self.spool = PcmSpool(journal.spool_path, journal.spool_end) if chunk_format == "spool" and combine_mp3 else None
+        if chunk_format == "spool" and not combine_mp3:
+            on_status("The spool is only used when merging; keeping the chunks as WAV files.")
+        # With segmented_mp3 every finished chunk is encoded to its own MP3
+        # segment right away, in parallel, and the book is a stream copy of
+        # them. That is fast to re-merge but not gapless: each LAME segment
+        # brings its own encoder delay and padding to the join.
+        self.segmented = segmented_mp3 and combine_mp3 and not m4b and self.spool is None
+        self.segmenter = concurrent.futures.ThreadPoolExecutor(max_workers=default_encode_workers()) if self.segmented else None
+        self.segments = {}
+        self.failures = []
+
+    def chunk_ready(self, idx):
+        self._spool_chunk(idx)
+        if self.segmented:
+            self._collect_segments()
+            self._encode_segment_soon(idx)
+
+    def _spool_chunk(self, idx):
+        journal = self.journal
+        if self.spool is None and journal.chunks[idx]["status"] == "spooled" and journal.is_done(idx):
+            entry = journal.chunks[idx]
+            try:
+                PcmSpool.export_wav(journal.spool_path, entry["offset"], entry["frames"], journal.sample_rate, journal.file_path(idx))
+            except Exception as exc:
+                print(f"[Chunk {idx + 1}] Failed to export from the spool: {exc}")
+                return
+            journal.mark(idx, "done")
+            return
+        if self.spool is None or journal.chunks[idx]["status"] != "done" or not journal.is_done(idx):
+            return
+        started = time.perf_counter()
+        try:
+            offset, frames, sample_rate = self.spool.append(journal.file_path(idx))
+        except Exception as exc:
+            print(f"[Chunk {idx + 1}] Failed to spool: {exc}")
+            return
+        self.metrics.add_stages({"stages": {"spool_write": time.perf_counter() - started}, "calls": {"spool_write": 1}, "audio_s": 0.0})
+        journal.mark_spooled(idx, offset, frames, sample_rate)
+        _remove_quietly(journal.file_path(idx))
 
+    def _encode_segment_soon(self, idx):
+        journal = self.journal
+        if self.failures or idx in self.segments or journal.chunks[idx]["status"] != "done" or not journal.is_done(idx):
+            return
+        self.segments[idx] = self.segmenter.submit(_timed, encode_segment, journal.file_path(idx), journal.segment_path(idx))
 
-def combine_output_to_mp3(output_files, output_dir, custom_name="final_output"):
-    if not output_files:
-        return None
+    def _collect_segments(self):
+        for idx, future in list(self.segments.items()):
+            if not future.done():
+                continue
+            del self.segments[idx]
+            try:
+                duration, elapsed = future.result()
+            except Exception as exc:
+                print(f"[Chunk {idx + 1}] Segment encode failed: {exc}")
+                duration, elapsed = None, 0.0
+            self.metrics.add_stages({"stages": {"segment_encode": elapsed}, "calls": {"segment_encode": 1}, "audio_s": 0.0})
+            if duration is not None:
+                self.journal.mark_segment(idx, segment_file_name(self.journal.chunks[idx]["file"]), duration)
+                _remove_quietly(self.journal.file_path(idx))
+            else:
+                # Keep the WAV; once one encode fails the rest are left for
+                # the final merge instead of failing one by one.
+                self.failures.append(idx)
+
+    def close(self):
+        if self.segmenter is not None:
+            self.segmenter.shutdown(wait=True)
+            self._collect_segments()
+        if self.spool is not None:
+            self.spool.close()
+
+    def compact(self):
+        if self.spool is None:
+            return
+        reclaimed = self.journal.compact_spool(self.spool.end)
+        if reclaimed:
+            print(f"[System] Compacted the spool, reclaiming {reclaimed / (1024 * 1024):.1f} MB.")
+
+    def merge(self, output_directory, mp3_name, complete_files, result, on_status):
+        # Returns whether the MP3 holds every chunk of the book.
+        journal = self.journal
+        wav_only = self.spool is None and not any(journal.chunks[idx]["status"] == "encoded" for idx in journal.done_indexes())
+        if self.spool is None and not wav_only:
+            # Once a book has segments it stays a stream copy, so chunks whose
+            # encode failed, or that were rendered as WAVs, are encoded now.
+            for idx in journal.done_indexes():
+                if journal.chunks[idx]["status"] == "done":
+                    duration = encode_segment(journal.file_path(idx), journal.segment_path(idx))
+                    if duration is not None:
+                        journal.mark_segment(idx, segment_file_name(journal.chunks[idx]["file"]), duration)
+                        _remove_quietly(journal.file_path(idx))
+        if wav_only:
+            encoded = journal.done_indexes()
+        else:
+            ready_status = "spooled" if self.spool is not None else "encoded"
+            encoded = [idx for idx in journal.done_indexes() if journal.chunks[idx]["status"] == ready_status]
+            if len(encoded) < len(complete_files):
+                result["error"] = f"{len(complete_files) - len(encoded)} chunks could not be {ready_status}."
+        all_complete = len(encoded) == len(journal.chunks)
+
+        def chunk_duration(idx):
+            return journal.chunks[idx].get("duration") or wav_duration(journal.file_path(idx))
+
+        chapters = None
+        if all_complete and len(journal.chapters) > 1:
+            chapters = chapter_times(
+                (chapter["title"], sum(chunk_duration(idx) for idx in journal.chapter_indexes(ci)))
+                for ci, chapter in enumerate(journal.chapters)
+            )
+        on_status("Merging to MP3...")
+        before = stage_timer.snapshot()
+        with stage_timer.stage("mp3_merge"):
+            if self.spool is not None:
+                mp3_path = combine_spool_to_mp3(
+                    self.spool.path, journal.spool_spans(encoded), journal.sample_rate, output_directory, mp3_name, chapters=chapters
+                )
+            elif wav_only:
+                # Single-pass encode of the WAV chunks, also the fallback when
+                # no segment could be encoded.
+                mp3_path = combine_output_to_mp3(
+                    [journal.file_path(idx) for idx in encoded], output_directory, mp3_name, cleanup=all_complete, chapters=chapters
+                )
+            else:
+                mp3_path = combine_output_to_mp3(
+                    [journal.segment_path(idx) for idx in encoded], output_directory, mp3_name, chapters=chapters, stream_copy=True
+                )
+        self.metrics.add_stages(stage_timer.since(before))
+        if mp3_path:
+            journal.mark_merged(mp3_path, wav_only and all_complete)
+            result["mp3"] = mp3_path
+            on_status(f"Done. MP3 saved: {os.path.basename(mp3_path)}")
+        else:
+            result["error"] = "MP3 merge failed."
+            on_status("Done. Files saved, but MP3 merge failed.")
+        return all_complete
+
+
+class ChapterPackager:
+    # For an M4B each chapter is encoded as soon as its last chunk is
+    # written, on a background thread so synthesis carries on.
+    def __init__(self, journal, metrics, spool, output_directory, stop, on_status):
+        self.journal = journal
+        self.metrics = metrics
+        self.spool = spool
+        self.output_directory = output_directory
+        self.stop = stop
+        self.on_status = on_status
+        self.encoder = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.held = collections.defaultdict(list)
+        self.outstanding = collections.defaultdict(set)
+        self.closed = set()
+        self.encodes = {}
+        self.failures = []
+
+    def hold(self, task):
+        # Merged chunks of an unchanged chapter are not needed again; a
+        # changed chapter re-renders them (mostly from the chunk cache).
+        self.held[self.journal.chunks[task[0]]["chapter"]].append(task)
+
+    def rendering(self, idx):
+        self.outstanding[self.journal.chunks[idx]["chapter"]].add(idx)
+
+    def chapter_closed(self, ci, unchanged):
+        # Returns the held chunks the chapter needs rendered again.
+        self.closed.add(ci)
+        tasks = [] if unchanged else self.held.pop(ci, [])
+        self.outstanding[ci].update(task[0] for task in tasks)
+        self._encode_when_ready(ci)
+        return tasks
+
+    def chunk_finished(self, idx, status):
+        if status not in ("done", "cached", "failed"):
+            return
+        ci = self.journal.chunks[idx]["chapter"]
+        self.outstanding[ci].discard(idx)
+        self._collect_encodes()
+        self._encode_when_ready(ci)
+
+    def _chapter_job(self, ci):
+        journal = self.journal
+        indexes = journal.chapter_indexes(ci)
+        ready = ("spooled",) if self.spool is not None else RenderJournal.DONE_STATUSES
+        if journal.chapters[ci]["status"] == "encoded" or not all(journal.chunks[idx]["status"] in ready and journal.is_done(idx) for idx in indexes):
+            return None
+        out_path = os.path.join(self.output_directory, chapter_file_name(ci, journal.chapters[ci]["title"]))
+        if self.spool is not None:
+            return encode_spool_chapter, (self.spool.path, journal.spool_spans(indexes), journal.sample_rate, out_path)
+        return encode_chapter, ([journal.file_path(idx) for idx in indexes], out_path)
+
+    def _encode_when_ready(self, ci):
+        # After a failed encode the rest wait for the retry at the end.
+        if self.failures or ci not in self.closed or self.outstanding[ci] or ci in self.encodes or self.stop.is_set():
+            return
+        job = self._chapter_job(ci)
+        if job is not None:
+            self.encodes[ci] = self.encoder.submit(_timed, job[0], *job[1])
+
+    def _collect_encodes(self):
+        for ci, future in list(self.encodes.items()):
+            if not future.done():
+                continue
+            del self.encodes[ci]
+            try:
+                duration, elapsed = future.result()
+            except Exception as exc:
+                print(f"[System] Chapter {ci + 1} encode failed: {exc}")
+                duration, elapsed = None, 0.0
+            self.metrics.add_stages({"stages": {"chapter_encode": elapsed}, "calls": {"chapter_encode": 1}, "audio_s": 0.0})
+            if duration is not None:
+                self._chapter_encoded(ci, duration)
+            else:
+                self.failures.append(ci)
+
+    def _chapter_encoded(self, ci, duration):
+        title = self.journal.chapters[ci]["title"]
+        self.journal.mark_chapter(ci, chapter_file_name(ci, title), duration)
+        self.on_status(f"Chapter {ci + 1} ready: {title}")
+
+    def close(self):
+        self.encoder.shutdown(wait=True)
+        self._collect_encodes()
+
+    def package(self, mp3_name, complete_files, stopped, result):
+        # Returns whether the book is complete and whether it has any output.
+        journal = self.journal
+        if self.failures and not stopped:
+            for ci in range(len(journal.chapters)):
+                job = self._chapter_job(ci)
+                if job is None:
+                    continue
+                duration = job[0](*job[1])
+                if duration is None:
+                    break
+                self._chapter_encoded(ci, duration)
+        encoded = [ci for ci, chapter in enumerate(journal.chapters) if chapter["status"] == "encoded"]
+        all_complete = bool(journal.chapters) and len(encoded) == len(journal.chapters)
+        has_output = bool(encoded) or bool(complete_files)
+        result["chapters"] = [{"title": journal.chapters[ci]["title"], "file": journal.chapter_path(ci)} for ci in encoded]
+        if self.failures and not all_complete and not stopped:
+            result["error"] = "Chapter encoding failed."
+            self.on_status("Done. Files saved, but chapter encoding failed.")
+        if not all_complete or stopped:
+            return all_complete, has_output
+        self.on_status("Packaging M4B...")
+        before = stage_timer.snapshot()
+        with stage_timer.stage("m4b_package"):
+            m4b_path = package_m4b(
+                [(chapter["title"], journal.chapter_path(ci), chapter["duration"]) for ci, chapter in enumerate(journal.chapters)],
+                self.output_directory,
+                mp3_name,
+            )
+        self.metrics.add_stages(stage_timer.since(before))
+        if m4b_path:
+            _remove_quietly(*complete_files)
+            journal.mark_merged(m4b_path, True)
+            result["m4b"] = m4b_path
+            self.on_status(f"Done. M4B saved: {os.path.basename(m4b_path)}")
+        else:
+            result["error"] = "M4B packaging failed."
+            self.on_status("Done. Chapters saved, but M4B packaging failed.")
+        return all_complete, has_output
+
+
+def _iter_book_tasks(journal, chunk_texts, start_chunk_idx, chapters, output, packager, deferred, result, on_chunk):
+    # Registers every chunk with the journal and yields the ones left to
+    # synthesize; chunks an earlier run finished go straight to the output.
+    def close_chapter():
+        ci = len(journal.chapters) - 1
+        if ci < 0 or journal.chapters[ci]["hash"] is not None or not journal.chapters[ci]["count"]:
+            return []
+        unchanged = journal.close_chapter(ci)
+        return packager.chapter_closed(ci, unchanged) if packager is not None else []
+
+    for chunk_text in chunk_texts:
+        if isinstance(chunk_text, ChapterMark):
+            if chapters:
+                yield from close_chapter()
+                journal.start_chapter(chunk_text.title)
+            continue
+        idx = journal.register(chunk_text_hash(chunk_text))
+        if idx < start_chunk_idx:
+            continue
+        if journal.is_done(idx):
+            result["resumed"] += 1
+            on_chunk(idx, "done")
+            output.chunk_ready(idx)
+            continue
+        task = (idx, chunk_text, journal.file_path(idx))
+        if journal.chunks[idx]["status"] == "merged":
+            if packager is not None:
+                packager.hold(task)
+            else:
+                deferred.append(task)
+            on_chunk(idx, "done")
+            continue
+        if packager is not None:
+            packager.rendering(idx)
+        yield task
+    yield from close_chapter()
+    journal.finish_registration()
+
+
+def render_book(
+    state,
+    source,
+    output_directory,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    temp_val=0.7,
+    speed_val=1.0,
+    start_chunk=1,
+    combine_mp3=True,
+    mp3_name="final_output",
+    book_format="mp3",
+    on_status=None,
+    on_progress=None,
+    pool=None,
+    workers=1,
+    voice_key=None,
+    chunks=None,
+    on_chunk=None,
+    chunking="greedy",
+    segmented_mp3=False,
+    chapters=False,
+    stop=None,
+    model_lock=None,
+):
+    on_status = on_status or (lambda text: None)
+    on_progress = on_progress or (lambda done, total, info: None)
+    on_chunk = on_chunk or (lambda idx, status: None)
+    stop = stop or stop_event
+    model_lock = model_lock or contextlib.nullcontext()
+    mp3_name = mp3_name or "final_output"
+    ensure_libs("audio")
+    started_at = time.time()
+    result = {
+        "output_dir": output_directory,
+        "status": "failed",
+        "chunks": 0,
+        "written": 0,
+        "failed_chunks": [],
+        "files": [],
+        "resumed": 0,
+        "mp3": None,
+        "elapsed": 0.0,
+        "cache": {"hits": 0, "misses": 0},
+        "error": None,
+    }
+
+    start_chunk_idx = start_chunk - 1
+    if start_chunk_idx < 0:
+        result["error"] = "Invalid start chunk."
+        on_status(result["error"])
+        return result
+
+    os.makedirs(output_directory, exist_ok=True)
+    voice_id = voice_identity(*voice_key) if voice_key else None
+    params = {
+        "chunk_size": chunk_size,
+        "wiggle_room": 20,
+        "chunking": chunking,
+        "voice": voice_id,
+        "temperature": round(float(temp_val), 4),
+        "speed": round(float(speed_val), 4),
+        "format": chunk_format,
+        "polish": audio_polish,
+        "model_version": model_version(),
+    }
+    # Chapters split the chunks, so they only apply when the output marks
+    # them; a plain render keeps the boundaries and cache keys it always had.
+    chapters = chapters or (combine_mp3 and book_format == "m4b")
+    if chapters:
+        params["chapters"] = True
+    journal = RenderJournal(output_directory, params)
+    metrics = RenderMetrics(output_directory)
+    if chunks is not None:
+        chunk_texts = list(chunks)
+        journal.expected_total = sum(1 for chunk in chunk_texts if not isinstance(chunk, ChapterMark))
+    else:
+        chunk_texts = (chunk if isinstance(chunk, ChapterMark) else " ".join(chunk) for chunk in iter_text_chunks(source, chunk_size, chapters=chapters, chunking=chunking))
+        if isinstance(source, str):
+            chunk_texts = list(chunk_texts)
+            journal.expected_total = len(chunk_texts)
+
+    m4b = combine_mp3 and book_format == "m4b"
+    output = ChunkOutput(journal, metrics, combine_mp3, segmented_mp3, m4b, on_status)
+    packager = ChapterPackager(journal, metrics, output.spool, output_directory, stop, on_status) if m4b else None
+    deferred = []
+
+    def chunk_finished(idx, status):
+        output.chunk_ready(idx)
+        on_chunk(idx, status)
+        if packager is not None:
+            packager.chunk_finished(idx, status)
+
+    def render_tasks(tasks):
+        if pool is not None:
+            return _render_chunks_parallel(
+                pool, workers, voice_key, voice_id, journal, tasks, temp_val, speed_val, on_status, on_progress, chunk_finished, metrics, memo_scope, stop
+            )
+        return _render_chunks_sequential(
+            state, voice_id, journal, tasks, temp_val, speed_val, on_status, on_progress, chunk_finished, metrics, stop, model_lock
+        )
 
-    if not custom_name.lower().endswith(".mp3"):
-        custom_name += ".mp3"
+    # Worker processes keep their memo until the next book's scope arrives.
+    memo_scope = f"{os.path.abspath(output_directory)}:{started_at}"
+    if phrase_memo is not None:
+        phrase_memo.begin(memo_scope)
+    try:
+        tasks = _iter_book_tasks(journal, chunk_texts, start_chunk_idx, chapters, output, packager, deferred, result, on_chunk)
+        output_files, failed_chunks, cache_stats = render_tasks(tasks)
+        stopped = stop.is_set()
+        already_complete = not stopped and journal.is_merged() and journal.mp3.lower().endswith(".m4b") == m4b
+        if deferred and not stopped and not already_complete:
+            more_files, more_failed, more_stats = render_tasks(deferred)
+            output_files += more_files
+            failed_chunks = sorted(failed_chunks + more_failed)
+            cache_stats = {key: cache_stats[key] + more_stats[key] for key in cache_stats}
+            stopped = stop.is_set()
+    finally:
+        if phrase_memo is not None:
+            phrase_memo.end()
+        if packager is not None:
+            packager.close()
+        output.close()
+        journal.close()
+    result["chunks"] = len(journal.chunks)
+
+    if already_complete:
+        result["status"] = "ok"
+        result["resumed"] = len(journal.chunks)
+        result["m4b" if m4b else "mp3"] = journal.mp3
+        result["elapsed"] = round(time.time() - started_at, 3)
+        on_progress(len(journal.chunks), len(journal.chunks), "")
+        on_status(f"Already complete. Output: {os.path.basename(journal.mp3)}")
+        result["metrics"] = metrics.finish(result["status"])
+        return result
+
+    if not stopped:
+        output.compact()
+    if not journal.chunks and not stopped:
+        result["error"] = "No text found to synthesize."
+        on_status(result["error"])
+        return result
+    if start_chunk_idx >= len(journal.chunks) and not stopped:
+        result["error"] = "Invalid start chunk."
+        on_status(result["error"])
+        return result
+
+    if result["resumed"]:
+        print(f"[System] Resumed: {result['resumed']} chunks were already rendered.")
+    result["failed_chunks"] = failed_chunks
+    result["cache"] = cache_stats
+    if cache_stats["hits"]:
+        print(f"[System] Chunk cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.")
+    if metrics.reused["generate"]:
+        print(f"[System] Phrase memo: {metrics.reused['generate']} repeated phrases reused, {metrics.saved['generate']:.1f}s of synthesis saved.")
+
+    if not stopped:
+        on_status(f"Done. Saved {len(output_files)} files.")
+
+    complete_files = [journal.output_path(idx) for idx in journal.done_indexes()]
+    all_complete = len(complete_files) == len(journal.chunks)
+    has_output = bool(complete_files)
+    result["written"] = len(output_files)
+    result["files"] = list(dict.fromkeys(complete_files))
+    if packager is not None:
+        all_complete, has_output = packager.package(mp3_name, complete_files, stopped, result)
+    elif combine_mp3 and complete_files and not stopped:
+        all_complete = output.merge(output_directory, mp3_name, complete_files, result, on_status)
+    journal.close()
+
+    if stopped:
+        result["status"] = "stopped"
+    elif not has_output:
+        result["status"] = "failed"
+        result["error"] = result["error"] or "No chunks were synthesized."
+    elif result["failed_chunks"] or result["error"] or not all_complete:
+        result["status"] = "partial"
+    else:
+        result["status"] = "ok"
+    result["elapsed"] = round(time.time() - started_at, 3)
+    result["metrics"] = metrics.finish(result["status"])
+    return result
+
+
+# The Treeview only ever holds one screenful of rows; scrolling re-binds them
+# to a different slice of chunks instead of inserting the whole book.
+class ChunkBrowser(ttk.Frame):
+    ROW_HEIGHT = 24
+    PREVIEW_CHARS = 160
+    STATUS_COLORS = {
+        "pending": "#b1bbd1",
+        "rendering": "#8ec5ff",
+        "done": "#9ee6a8",
+        "cached": "#7fd9c5",
+        "failed": "#f08ea2",
+    }
+
+    def __init__(self, parent):
+        super().__init__(parent, style="Card.TFrame")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.chunks = []
+        self.statuses = []
+        self.chapters = {}
+        self.layout = None
+        self.top = 0
+        self.visible = 1
+        self.selected = None
+        self._refresh_pending = False
+
+        self.tree = ttk.Treeview(self, columns=("index", "words", "status", "preview"), show="headings", selectmode="browse", height=1)
+        for column, title, width, stretch in (
+            ("index", "#", 60, False),
+            ("words", "Words", 70, False),
+            ("status", "Status", 90, False),
+            ("preview", "Text", 400, True),
+        ):
+            self.tree.heading(column, text=title, anchor="w")
+            self.tree.column(column, width=width, minwidth=40, stretch=stretch, anchor="w")
+        for status, color in self.STATUS_COLORS.items():
+            self.tree.tag_configure(status, foreground=color)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_by(-3 if event.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self._move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda event: self._move_selection(self.visible))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Double-1>", lambda event: self.edit_selected())
+
+    def clear(self, layout=None):
+        self.set_chunks([], layout=layout)
+
+    def set_chunks(self, chunks, chapters=None, layout=None):
+        self.chunks = list(chunks)
+        self.chapters = dict(chapters or {})
+        self.statuses = ["pending"] * len(self.chunks)
+        self.layout = layout
+        self.top = 0
+        self.selected = None
+        self.schedule_refresh()
+
+    def append(self, chunks, chapters=None):
+        self.chapters.update(chapters or {})
+        self.chunks.extend(chunks)
+        self.statuses.extend(["pending"] * len(chunks))
+        self.schedule_refresh()
+
+    def reset_statuses(self):
+        self.statuses = ["pending"] * len(self.chunks)
+        self.schedule_refresh()
+
+    def set_status(self, idx, status):
+        if idx < len(self.statuses):
+            self.statuses[idx] = status
+            if self.top <= idx < self.top + self.visible:
+                self.schedule_refresh()
+
+    def scroll_by(self, rows):
+        self.top += rows
+        self.schedule_refresh()
+        return "break"
+
+    def schedule_refresh(self):
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def refresh(self):
+        self._refresh_pending = False
+        total = len(self.chunks)
+        self.top = max(0, min(self.top, total - self.visible))
+
+        rows = min(self.visible, total - self.top)
+        items = self.tree.get_children()
+        if len(items) > rows:
+            self.tree.delete(*items[rows:])
+        for _ in range(len(items), rows):
+            self.tree.insert("", "end")
+
+        selected_item = None
+        for offset, item in enumerate(self.tree.get_children()):
+            idx = self.top + offset
+            text = self.chunks[idx]
+            status = self.statuses[idx]
+            preview = text[: self.PREVIEW_CHARS].replace("\n", " ")
+            if idx in self.chapters:
+                preview = f"[{self.chapters[idx]}] {preview}"
+            self.tree.item(item, values=(idx + 1, len(text.split()), status, preview), tags=(status,))
+            if idx == self.selected:
+                selected_item = item
+        if selected_item:
+            self.tree.selection_set(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if total:
+            self.scrollbar.set(self.top / total, min(self.top + self.visible, total) / total)
+        else:
+            self.scrollbar.set(0, 1)
 
-    list_file = os.path.join(output_dir, "file_list.txt")
-    output_mp3 = os.path.join(output_dir, custom_name)
+    def selected_index(self):
+        return self.selected
 
-    try:
-        with open(list_file, "w", encoding="utf-8") as handle:
-            for file_path in output_files:
-                abs_path = os.path.abspath(file_path).replace("'", "'\\''")
-                handle.write(f"file '{abs_path}'\n")
+    def edit_selected(self):
+        idx = self.selected
+        if idx is None or idx >= len(self.chunks):
+            return
 
-        print(f"[System] Merging {len(output_files)} files into {output_mp3}...")
-        command = [
-            "ffmpeg",
-            "-y",
-            "-f",
-            "concat",
-            "-safe",
-            "0",
-            "-i",
-            list_file,
-            "-acodec",
-            "libmp3lame",
-            "-q:a",
-            "2",
-            output_mp3,
-        ]
-        result = subprocess.run(command, capture_output=True, text=True)
+        dialog = tk.Toplevel(self)
+        dialog.title(f"Edit Chunk {idx + 1}")
+        dialog.configure(bg="#1f2430")
+        dialog.geometry("640x360")
+        dialog.transient(self.winfo_toplevel())
 
-        if result.returncode == 0:
-            print("[System] MP3 merge successful. Cleaning up WAV files...")
-            for file_path in output_files:
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except OSError:
-                        pass
-            return output_mp3
+        editor = tk.Text(dialog, wrap="word", bg="#2a3142", fg="#edf2ff", insertbackground="#edf2ff", relief="flat", padx=10, pady=10)
+        editor.pack(fill="both", expand=True, padx=12, pady=(12, 8))
+        editor.insert("1.0", self.chunks[idx])
 
-        print(f"[System] FFmpeg error: {result.stderr}")
-        return None
-    except Exception as exc:
-        print(f"[System] Failed to merge MP3: {exc}")
-        return None
-    finally:
-        if os.path.exists(list_file):
-            try:
-                os.remove(list_file)
-            except OSError:
-                pass
+        def save():
+            text = " ".join(editor.get("1.0", "end-1c").split())
+            if not text:
+                messagebox.showerror("Edit Chunk", "A chunk cannot be empty.", parent=dialog)
+                return
+            if text != self.chunks[idx]:
+                self.chunks[idx] = text
+                self.statuses[idx] = "pending"
+                self.schedule_refresh()
+            dialog.destroy()
+
+        buttons = ttk.Frame(dialog, style="Card.TFrame")
+        buttons.pack(fill="x", padx=12, pady=(0, 12))
+        ttk.Button(buttons, text="Save", style="Accent.TButton", command=save).pack(side="right")
+        ttk.Button(buttons, text="Cancel", command=dialog.destroy).pack(side="right", padx=(0, 8))
+        editor.focus_set()
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.ROW_HEIGHT) // self.ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.schedule_refresh()
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.chunks))
+        elif action == "scroll":
+            self.top += int(amount) * (self.visible if unit == "pages" else 1)
+        self.schedule_refresh()
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self.top + self.tree.index(selection[0])
+
+    def _move_selection(self, step):
+        if not self.chunks:
+            return "break"
+        current = self.top if self.selected is None else self.selected
+        self.selected = max(0, min(current + step, len(self.chunks) - 1))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible:
+            self.top = self.selected - self.visible + 1
+        self.schedule_refresh()
+        return "break"
 
 
 class PocketTTSWindow(tk.Tk):
@@ -350,16 +3985,35 @@ class PocketTTSWindow(tk.Tk):
         self.output_dir_var = tk.StringVar()
         self.voice_var = tk.StringVar(value=VOICE_OPTIONS[0])
         self.chunk_size_var = tk.IntVar(value=DEFAULT_CHUNK_SIZE)
+        self.stable_chunks_var = tk.BooleanVar(value=False)
         self.temp_var = tk.DoubleVar(value=0.7)
         self.speed_var = tk.DoubleVar(value=1.0)
         self.start_chunk_var = tk.IntVar(value=1)
         self.combine_mp3_var = tk.BooleanVar(value=True)
+        self.book_format_var = tk.StringVar(value=BOOK_FORMATS[0])
         self.mp3_name_var = tk.StringVar(value="final_output")
         self.status_var = tk.StringVar(value="Ready")
         self.chunk_info_var = tk.StringVar(value="")
+        self._loading = False
+        self._preview_stop = threading.Event()
+        self._preview_stop.set()
+        self._model_lock = threading.Lock()
+        self.audition_text = SAMPLE_TEXT
+        self._auditions_started = False
+        self._audition_generation = 0
+        self._audition_tree = None
+        self.render_queue = None
+        self.scheduler = None
+        self._draining = []
+        self._browser_job = None
+        self._followed_job = None
+        self._last_job_message = None
+        self._queue_tree = None
 
         self._configure_theme()
         self._build_layout()
+        self.after(100, self._start_warmup)
+        self.after(QUEUE_REFRESH_MS, self._poll_queue)
 
     def _configure_theme(self):
         style = ttk.Style(self)
@@ -377,6 +4031,7 @@ class PocketTTSWindow(tk.Tk):
         style.map("TCombobox", fieldbackground=[("readonly", "#2a3142")], foreground=[("readonly", "#edf2ff")])
         style.configure("TSpinbox", fieldbackground="#2a3142", foreground="#edf2ff")
         style.configure("TCheckbutton", background="#1f2430", foreground="#d7deed")
+        style.configure("TRadiobutton", background="#1f2430", foreground="#d7deed")
         style.configure("TButton", background="#36415a", foreground="#f4f7ff", padding=8)
         style.map("TButton", background=[("active", "#475675")])
         style.configure("Accent.TButton", background="#8ec5ff", foreground="#102030", padding=9)
@@ -386,6 +4041,12 @@ class PocketTTSWindow(tk.Tk):
         style.configure("Sample.TButton", background="#7fd9c5", foreground="#112822", padding=9)
         style.map("Sample.TButton", background=[("active", "#93ead6")])
         style.configure("TProgressbar", troughcolor="#2a3142", background="#8ec5ff", bordercolor="#2a3142")
+        style.configure("TNotebook", background="#1f2430", borderwidth=0)
+        style.configure("TNotebook.Tab", background="#2a3142", foreground="#d7deed", padding=(12, 4))
+        style.map("TNotebook.Tab", background=[("selected", "#36415a")])
+        style.configure("Treeview", background="#2a3142", fieldbackground="#2a3142", foreground="#edf2ff", rowheight=ChunkBrowser.ROW_HEIGHT, borderwidth=0)
+        style.configure("Treeview.Heading", background="#36415a", foreground="#8ec5ff")
+        style.map("Treeview", background=[("selected", "#475675")])
 
     def _build_layout(self):
         root = ttk.Frame(self, style="Root.TFrame", padding=18)
@@ -431,8 +4092,10 @@ class PocketTTSWindow(tk.Tk):
         frame = self._card(parent, "Text to Speak")
         frame.rowconfigure(1, weight=1)
 
-        text_frame = ttk.Frame(frame, style="Card.TFrame")
-        text_frame.grid(row=1, column=0, sticky="nsew")
+        self.notebook = ttk.Notebook(frame)
+        self.notebook.grid(row=1, column=0, sticky="nsew")
+
+        text_frame = ttk.Frame(self.notebook, style="Card.TFrame")
         text_frame.columnconfigure(0, weight=1)
         text_frame.rowconfigure(0, weight=1)
 
@@ -453,10 +4116,17 @@ class PocketTTSWindow(tk.Tk):
         scrollbar.grid(row=0, column=1, sticky="ns")
         self.text_input.configure(yscrollcommand=scrollbar.set)
 
+        self.chunk_browser = ChunkBrowser(self.notebook)
+        self.notebook.add(text_frame, text="Text")
+        self.notebook.add(self.chunk_browser, text="Chunks")
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
         actions = ttk.Frame(frame, style="Card.TFrame")
         actions.grid(row=2, column=0, sticky="ew", pady=(10, 0))
         ttk.Button(actions, text="Load PDF/Text/EPUB", command=self.load_text).pack(side="left")
         ttk.Button(actions, text="Scrape from URL", command=self.load_url).pack(side="left", padx=(8, 0))
+        ttk.Button(actions, text="Edit Chunk", command=self.edit_chunk).pack(side="left", padx=(8, 0))
+        ttk.Button(actions, text="Preview from Cursor", style="Sample.TButton", command=self.preview_from_cursor).pack(side="left", padx=(8, 0))
         return frame
 
     def _build_settings_card(self, parent):
@@ -467,10 +4137,17 @@ class PocketTTSWindow(tk.Tk):
             body.columnconfigure(col, weight=1 if col in (1, 3) else 0)
 
         ttk.Label(body, text="Voice Name:", style="Body.TLabel").grid(row=0, column=0, sticky="w", padx=(0, 10), pady=5)
-        ttk.Combobox(body, textvariable=self.voice_var, values=VOICE_OPTIONS, state="readonly").grid(row=0, column=1, sticky="ew", pady=5)
+        voice_row = ttk.Frame(body, style="Card.TFrame")
+        voice_row.grid(row=0, column=1, sticky="ew", pady=5)
+        voice_row.columnconfigure(0, weight=1)
+        ttk.Combobox(voice_row, textvariable=self.voice_var, values=VOICE_OPTIONS, state="readonly").grid(row=0, column=0, sticky="ew")
+        ttk.Button(voice_row, text="Audition", command=self.open_auditions).grid(row=0, column=1, padx=(8, 0))
 
         ttk.Label(body, text="Chunk Size (words):", style="Body.TLabel").grid(row=0, column=2, sticky="w", padx=(12, 10), pady=5)
-        ttk.Spinbox(body, from_=10, to=5000, textvariable=self.chunk_size_var, width=10).grid(row=0, column=3, sticky="w", pady=5)
+        size_row = ttk.Frame(body, style="Card.TFrame")
+        size_row.grid(row=0, column=3, sticky="w", pady=5)
+        ttk.Spinbox(size_row, from_=10, to=5000, textvariable=self.chunk_size_var, width=10).pack(side="left")
+        ttk.Checkbutton(size_row, text="Stable boundaries", variable=self.stable_chunks_var).pack(side="left", padx=(8, 0))
 
         ttk.Label(body, text="Temperature:", style="Body.TLabel").grid(row=1, column=0, sticky="w", padx=(0, 10), pady=5)
         tk.Scale(body, from_=0.1, to=2.0, resolution=0.1, orient="horizontal", variable=self.temp_var, bg="#1f2430", fg="#d7deed", highlightthickness=0, troughcolor="#2a3142").grid(row=1, column=1, sticky="ew", pady=5)
@@ -483,8 +4160,9 @@ class PocketTTSWindow(tk.Tk):
 
         mp3_row = ttk.Frame(body, style="Card.TFrame")
         mp3_row.grid(row=2, column=2, columnspan=2, sticky="w", pady=5)
-        ttk.Checkbutton(mp3_row, text="Combine into MP3", variable=self.combine_mp3_var).pack(side="left")
-        ttk.Entry(mp3_row, textvariable=self.mp3_name_var, width=22).pack(side="left", padx=(10, 0))
+        ttk.Checkbutton(mp3_row, text="Combine into", variable=self.combine_mp3_var).pack(side="left")
+        ttk.Combobox(mp3_row, textvariable=self.book_format_var, values=BOOK_FORMATS, state="readonly", width=5).pack(side="left", padx=(6, 0))
+        ttk.Entry(mp3_row, textvariable=self.mp3_name_var, width=18).pack(side="left", padx=(10, 0))
         return frame
 
     def _build_actions_card(self, parent):
@@ -500,6 +4178,7 @@ class PocketTTSWindow(tk.Tk):
         self.generate_btn.pack(side="left", padx=(8, 0))
         ttk.Button(body, text="Stop", style="Danger.TButton", command=self.stop_generation).pack(side="left", padx=(8, 0))
         ttk.Button(body, text="Quick Sample", style="Sample.TButton", command=self.generate_quick_sample).pack(side="left", padx=(8, 0))
+        ttk.Button(body, text="Queue", command=self.open_queue).pack(side="left", padx=(8, 0))
         return frame
 
     def _build_progress_card(self, parent):
@@ -521,21 +4200,37 @@ class PocketTTSWindow(tk.Tk):
         self.text_input.delete("1.0", "end")
         self.text_input.insert("1.0", value)
 
+    def _chunk_layout(self):
+        return self.chunk_size_var.get(), "stable" if self.stable_chunks_var.get() else "greedy"
+
+    def _current_chunks(self):
+        # Typed or pasted text is split once per edit; a loaded document is
+        # already chunked and only re-split when the chunk size or mode changes.
+        chunk_size, chunking = layout = self._chunk_layout()
+        browser = self.chunk_browser
+        if self.text_input.edit_modified():
+            self.text_input.edit_modified(False)
+            chunks = iter_text_chunks(self._get_text(), chunk_size, chunking=chunking)
+            browser.set_chunks([" ".join(chunk) for chunk in chunks], layout=layout)
+        elif browser.chunks and browser.layout != layout:
+            chunks = iter_text_chunks(join_chapter_marks(browser.chunks, browser.chapters), chunk_size, chapters=True, chunking=chunking)
+            browser.set_chunks(*split_chapter_marks(chunks), layout=layout)
+        return list(browser.chunks)
+
+    def _on_tab_changed(self, event):
+        if self.notebook.select() == str(self.chunk_browser) and not self._loading:
+            self._current_chunks()
+
+    def _finish_loading(self, message):
+        self._loading = False
+        self.status_var.set(message)
+
     def _ui(self, callback, *args):
         self.after(0, lambda: callback(*args))
 
     def _set_status(self, text):
         self._ui(self.status_var.set, text)
 
-    def _set_chunk_info(self, text):
-        self._ui(self.chunk_info_var.set, text)
-
-    def _set_progress(self, value, maximum):
-        self._ui(self.progress_bar.configure, maximum=max(maximum, 1), value=value)
-
-    def _set_generate_enabled(self, enabled):
-        self._ui(self.generate_btn.configure, state=("normal" if enabled else "disabled"))
-
     def browse_ref_file(self):
         filename = filedialog.askopenfilename(title="Select Reference Audio", filetypes=[("Audio Files", "*.wav *.mp3"), ("All Files", "*.*")])
         if filename:
@@ -545,78 +4240,194 @@ class PocketTTSWindow(tk.Tk):
         directory = filedialog.askdirectory(title="Select Output Directory")
         if directory:
             self.output_dir_var.set(directory)
+            if self.render_queue is not None:
+                self._use_queue(directory)
+
+    def _use_queue(self, output_root):
+        # Opened on the first Generate or queue action, not at launch; jobs
+        # queued in an earlier session then pick up where they left off.
+        # The queue lives in the output root, as it does for "queue --out",
+        # so the window and CLI runners share one queue per folder.
+        path = os.path.join(os.path.abspath(output_root), RenderQueue.FILE_NAME)
+        if self.render_queue is not None and os.path.abspath(self.render_queue.path) == path:
+            return
+        if self.scheduler is not None:
+            # The old runner finishes the job it is on and then stops; the
+            # model lock keeps it from rendering alongside the new one.
+            self.scheduler.shutdown()
+            self._draining = [scheduler for scheduler in self._draining + [self.scheduler] if scheduler.current_job is not None]
+        self.render_queue = RenderQueue(path)
+        scheduler = RenderScheduler(self.render_queue, model_lock=self._model_lock, on_chunk=lambda job_id, idx, status: self._on_job_chunk(scheduler, job_id, idx, status))
+        self.scheduler = scheduler
+        self._browser_job = None
+        self._followed_job = None
+        threading.Thread(target=scheduler.run, kwargs={"watch": True}, daemon=True).start()
 
     def load_text(self):
         file_path = filedialog.askopenfilename(title="Select Document", filetypes=[("Documents", "*.pdf *.txt *.epub"), ("All Files", "*.*")])
         if not file_path:
             return
 
-        try:
-            _ensure_libs_loaded()
-            loaded_text = ""
-            lower_path = file_path.lower()
-
-            if lower_path.endswith(".pdf"):
-                with fitz.open(file_path) as doc:
-                    loaded_text = "".join(page.get_text() for page in doc)
-            elif lower_path.endswith(".txt"):
-                with open(file_path, "r", encoding="utf-8") as handle:
-                    loaded_text = handle.read()
-            elif lower_path.endswith(".epub"):
-                book = epub.read_epub(file_path)
-                parts = []
-                for item in book.get_items():
-                    if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                        soup = BeautifulSoup(item.get_body_content(), "html.parser")
-                        parts.append(soup.get_text(" ", strip=True))
-                loaded_text = "\n\n".join(part for part in parts if part)
-
-            self._set_text(loaded_text)
-            self.status_var.set(f"Loaded text from {os.path.basename(file_path)}.")
-        except Exception as exc:
-            traceback.print_exc()
-            messagebox.showerror("Load Error", f"Failed to load document:\n{exc}")
-            self.status_var.set(f"Load error: {exc}")
+        chunk_size, chunking = layout = self._chunk_layout()
+        self._loading = True
+        self._set_text("")
+        self.text_input.edit_modified(False)
+        self.chunk_browser.clear(layout)
+        self.notebook.select(self.chunk_browser)
+        self.status_var.set(f"Loading {os.path.basename(file_path)}...")
+
+        def task():
+            count = 0
+            batch = []
+            chapters = {}
+            chapter_total = 0
+            cleaner = PdfTextCleaner()
+            try:
+                for chunk in iter_text_chunks(iter_document_parts(file_path, cleaner=cleaner), chunk_size, chapters=True, chunking=chunking):
+                    if isinstance(chunk, ChapterMark):
+                        chapters[count + len(batch)] = chunk.title
+                        chapter_total += 1
+                        continue
+                    batch.append(" ".join(chunk))
+                    if len(batch) >= 200:
+                        self._ui(self.chunk_browser.append, batch, chapters)
+                        count += len(batch)
+                        batch, chapters = [], {}
+                self._ui(self.chunk_browser.append, batch, chapters)
+                count += len(batch)
+                detail = f" in {chapter_total} chapters" if chapter_total > 1 else ""
+                cleanup = describe_cleanup(cleaner.report())
+                self._ui(self._finish_loading, f"Loaded {count} chunks{detail} from {os.path.basename(file_path)}. {cleanup}".strip())
+            except Exception as exc:
+                traceback.print_exc()
+                self._ui(messagebox.showerror, "Load Error", f"Failed to load document:\n{exc}")
+                self._ui(self._finish_loading, f"Load error: {exc}")
+
+        threading.Thread(target=task, daemon=True).start()
 
     def load_url(self):
-        url = simpledialog.askstring("Scrape URL", "Enter URL:", parent=self)
-        if not url:
+        dialog = tk.Toplevel(self)
+        dialog.title("Scrape URL")
+        dialog.configure(bg="#1f2430")
+        dialog.transient(self)
+
+        body = ttk.Frame(dialog, style="Card.TFrame", padding=12)
+        body.pack(fill="both", expand=True)
+        body.columnconfigure(1, weight=1)
+        url_var = tk.StringVar()
+        mode_var = tk.StringVar(value="page")
+        pages_var = tk.IntVar(value=CRAWL_MAX_PAGES)
+
+        ttk.Label(body, text="URL", style="Body.TLabel").grid(row=0, column=0, sticky="w", padx=(0, 8))
+        url_entry = ttk.Entry(body, textvariable=url_var, width=60)
+        url_entry.grid(row=0, column=1, columnspan=2, sticky="ew")
+        for row, (mode, label) in enumerate(
+            (("page", "This page only"), ("next", "Follow \"next chapter\" links"), ("toc", "Every chapter linked from this page")), start=1
+        ):
+            ttk.Radiobutton(body, text=label, value=mode, variable=mode_var).grid(row=row, column=1, columnspan=2, sticky="w", pady=(6 if row == 1 else 0, 0))
+        ttk.Label(body, text="Max chapters", style="Body.TLabel").grid(row=4, column=0, sticky="w", padx=(0, 8), pady=(8, 0))
+        ttk.Spinbox(body, from_=1, to=5000, textvariable=pages_var, width=8).grid(row=4, column=1, sticky="w", pady=(8, 0))
+
+        def start():
+            url = url_var.get().strip()
+            if not url:
+                return
+            if not is_url(url):
+                url = f"https://{url}"
+            try:
+                max_pages = max(1, pages_var.get())
+            except tk.TclError:
+                max_pages = CRAWL_MAX_PAGES
+            dialog.destroy()
+            self._scrape(url, mode_var.get(), max_pages)
+
+        buttons = ttk.Frame(body, style="Card.TFrame")
+        buttons.grid(row=5, column=0, columnspan=3, sticky="e", pady=(12, 0))
+        ttk.Button(buttons, text="Scrape", style="Accent.TButton", command=start).pack(side="right")
+        ttk.Button(buttons, text="Cancel", command=dialog.destroy).pack(side="right", padx=(0, 8))
+        url_entry.bind("<Return>", lambda event: start())
+        url_entry.focus_set()
+
+    def _scrape(self, url, mode, max_pages):
+        if mode == "page":
+
+            def task():
+                try:
+                    scraped = "".join(part for part in iter_url_parts(url) if isinstance(part, str))
+                    self._ui(self._set_text, scraped)
+                    self._set_status("Text loaded from URL.")
+                except Exception as exc:
+                    self._set_status(f"Error loading URL: {exc}")
+
+            threading.Thread(target=task, daemon=True).start()
             return
 
+        # Crawled chapters go straight to the Chunks tab, like a loaded book.
+        chunk_size, chunking = layout = self._chunk_layout()
+        self._loading = True
+        self._set_text("")
+        self.text_input.edit_modified(False)
+        self.chunk_browser.clear(layout)
+        self.notebook.select(self.chunk_browser)
+        self.status_var.set(f"Crawling {url}...")
+
+        def on_page(count, page):
+            self._set_status(f"Fetched chapter {count}: {page.title or page.url}")
+
         def task():
+            count = 0
+            batch = []
+            chapters = {}
+            chapter_total = 0
             try:
-                _ensure_libs_loaded()
-                response = requests.get(url, timeout=20)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, "html.parser")
-                scraped = "\n".join(p.get_text(" ", strip=True) for p in soup.find_all("p"))
-                self._ui(self._set_text, scraped)
-                self._set_status("Text loaded from URL.")
+                parts = iter_url_parts(url, mode, max_pages, CRAWL_CONNECTIONS, on_page=on_page)
+                for chunk in iter_text_chunks(parts, chunk_size, chapters=True, chunking=chunking):
+                    if isinstance(chunk, ChapterMark):
+                        chapters[count + len(batch)] = chunk.title
+                        chapter_total += 1
+                        continue
+                    batch.append(" ".join(chunk))
+                    if len(batch) >= 200:
+                        self._ui(self.chunk_browser.append, batch, chapters)
+                        count += len(batch)
+                        batch, chapters = [], {}
+                self._ui(self.chunk_browser.append, batch, chapters)
+                count += len(batch)
+                self._ui(self._finish_loading, f"Loaded {count} chunks in {chapter_total} chapters from {url}.")
             except Exception as exc:
-                self._set_status(f"Error loading URL: {exc}")
+                traceback.print_exc()
+                self._ui(self._finish_loading, f"Error crawling URL: {exc}")
 
         threading.Thread(target=task, daemon=True).start()
 
+    def edit_chunk(self):
+        if self._loading:
+            self.status_var.set("Still loading document...")
+            return
+        self._current_chunks()
+        if self.chunk_browser.selected_index() is None:
+            self.notebook.select(self.chunk_browser)
+            self.status_var.set("Select a chunk to edit.")
+            return
+        self.chunk_browser.edit_selected()
+
     def export_chunk(self, all_chunks=False):
         try:
-            full_text = self._get_text().strip()
-            words = full_text.split()
-            chunk_size = self.chunk_size_var.get()
-            chunks = split_text_into_chunks(words, chunk_size)
+            chunks = self._current_chunks()
 
             script_dir = os.path.dirname(os.path.abspath(__file__))
             if all_chunks:
                 for index, chunk in enumerate(chunks, start=1):
                     path = os.path.join(script_dir, f"chunk_{index}.txt")
                     with open(path, "w", encoding="utf-8") as handle:
-                        handle.write(" ".join(chunk))
+                        handle.write(chunk)
                 self.status_var.set(f"All {len(chunks)} chunks exported.")
             else:
                 chunk_id = self.start_chunk_var.get()
                 if 1 <= chunk_id <= len(chunks):
                     path = os.path.join(script_dir, f"chunk_{chunk_id}.txt")
                     with open(path, "w", encoding="utf-8") as handle:
-                        handle.write(" ".join(chunks[chunk_id - 1]))
+                        handle.write(chunks[chunk_id - 1])
                     self.status_var.set(f"Chunk {chunk_id} exported.")
                 else:
                     self.status_var.set("Invalid chunk ID.")
@@ -624,7 +4435,7 @@ class PocketTTSWindow(tk.Tk):
             self.status_var.set(f"Export error: {exc}")
 
     def open_output_folder(self):
-        output_dir = self.output_dir_var.get().strip() or os.path.dirname(os.path.abspath(__file__))
+        output_dir = self.output_dir_var.get().strip() or DEFAULT_OUTPUT_ROOT
         try:
             if sys.platform == "win32":
                 os.startfile(output_dir)
@@ -634,167 +4445,1104 @@ class PocketTTSWindow(tk.Tk):
             self.status_var.set(f"Open folder error: {exc}")
 
     def start_generation(self):
-        stop_event.clear()
-        self._set_generate_enabled(False)
-        threading.Thread(target=self._generate_speech, daemon=True).start()
+        if self._loading:
+            self.status_var.set("Still loading document...")
+            return
+        chunks = self._current_chunks()
+        output_directory = self.output_dir_var.get().strip() or DEFAULT_OUTPUT_ROOT
+        self.output_dir_var.set(output_directory)
+        self._use_queue(output_directory)
+        name = self.mp3_name_var.get().strip() or "final_output"
+        settings = {
+            "voice": self.voice_var.get().strip(),
+            "ref_audio": self.ref_audio_var.get().strip(),
+            "chunk_size": self.chunk_size_var.get(),
+            "chunking": self._chunk_layout()[1],
+            "chapters": True,
+            "temperature": float(self.temp_var.get()),
+            "speed": float(self.speed_var.get()),
+            "start_chunk": self.start_chunk_var.get(),
+            "combine_mp3": self.combine_mp3_var.get(),
+            "book_format": self.book_format_var.get(),
+            "name": name,
+        }
+        job_id = self.render_queue.enqueue(name, output_directory, settings, chunks=list(join_chapter_marks(chunks, self.chunk_browser.chapters)))
+        self._browser_job = job_id
+        self._followed_job = job_id
+        self.chunk_browser.reset_statuses()
+        self.scheduler.wake()
+        self.status_var.set(f"Queued job #{job_id} ({name}).")
 
     def stop_generation(self):
-        stop_event.set()
-        self.status_var.set("Stopping after current chunk...")
-
-    def _generate_speech(self):
-        temp_file = None
+        # A playing preview is stopped on its own; the next press pauses the
+        # running book.
+        if not self._preview_stop.is_set():
+            self._preview_stop.set()
+            return
+        if self.scheduler is None:
+            return
+        for scheduler in [self.scheduler] + self._draining:
+            job_id = scheduler.current_job
+            if job_id is not None and scheduler.queue.pause(job_id):
+                scheduler.stop_job(job_id)
+                self.status_var.set(f"Pausing job #{job_id} after the current chunk...")
+
+    def _on_job_chunk(self, scheduler, job_id, idx, status):
+        if scheduler is self.scheduler and job_id == self._browser_job:
+            self._ui(self.chunk_browser.set_status, idx, status)
+
+    def _poll_queue(self):
+        # The progress card follows the chosen job (or whichever is running)
+        # by reading the queue, so it also shows jobs run by another process.
+        if self.render_queue is None:
+            self.after(QUEUE_REFRESH_MS, self._poll_queue)
+            return
         try:
-            output_directory = self.output_dir_var.get().strip() or os.path.dirname(os.path.abspath(__file__))
-            self._ui(self.output_dir_var.set, output_directory)
-            os.makedirs(output_directory, exist_ok=True)
+            job_id = self._followed_job or self.scheduler.current_job
+            job = self.render_queue.get(job_id) if job_id else None
+            if job is not None:
+                self.progress_bar.configure(maximum=max(job["total"], 1), value=job["done"])
+                info = f" · {job['info']}" if job["info"] else ""
+                self.chunk_info_var.set(f"Job #{job['id']} {job['name']}: {job['status']} · {job['done']}/{job['total']} chunks{info}")
+                if job["message"] and (job["id"], job["message"]) != self._last_job_message:
+                    self._last_job_message = (job["id"], job["message"])
+                    self.status_var.set(job["message"])
+            self._refresh_queue()
+        except sqlite3.Error as exc:
+            print(f"[System] Queue read failed: {exc}")
+        self.after(QUEUE_REFRESH_MS, self._poll_queue)
+
+    def open_queue(self):
+        if self._queue_tree is not None and self._queue_tree.winfo_exists():
+            self._queue_tree.winfo_toplevel().lift()
+            return
+        self._use_queue(self.output_dir_var.get().strip() or DEFAULT_OUTPUT_ROOT)
 
-            self._set_status("Loading model...")
-            if not ensure_model_loaded():
-                self._set_status("Failed to load PocketTTS model.")
+        dialog = tk.Toplevel(self)
+        dialog.title("Render Queue")
+        dialog.configure(bg="#1f2430")
+        dialog.geometry("720x420")
+        dialog.transient(self)
+
+        body = ttk.Frame(dialog, style="Card.TFrame", padding=12)
+        body.pack(fill="both", expand=True)
+        body.columnconfigure(0, weight=1)
+        body.rowconfigure(0, weight=1)
+
+        tree = ttk.Treeview(body, columns=("id", "name", "status", "progress", "priority"), show="headings", selectmode="browse")
+        for column, title, width in (("id", "#", 50), ("name", "Book", 260), ("status", "Status", 110), ("progress", "Progress", 110), ("priority", "Priority", 80)):
+            tree.heading(column, text=title, anchor="w")
+            tree.column(column, width=width, anchor="w")
+        colors = ChunkBrowser.STATUS_COLORS
+        for statuses, color in (
+            (("queued",), colors["pending"]),
+            (("running", "pausing"), colors["rendering"]),
+            (("ok",), colors["done"]),
+            (("paused", "partial"), "#f5d38e"),
+            (("failed", "cancelling", "cancelled"), colors["failed"]),
+        ):
+            for status in statuses:
+                tree.tag_configure(status, foreground=color)
+        tree.grid(row=0, column=0, sticky="nsew")
+        self._queue_tree = tree
+
+        def selected():
+            selection = tree.selection()
+            return int(selection[0]) if selection else None
+
+        def act(action):
+            job_id = selected()
+            if job_id is None:
                 return
+            if action == "follow":
+                self._followed_job = job_id
+            elif action == "up":
+                self.render_queue.move(job_id, -1)
+            elif action == "down":
+                self.render_queue.move(job_id, 1)
+            elif not getattr(self.render_queue, action)(job_id):
+                self.status_var.set(f"Job #{job_id} cannot be {QUEUE_ACTION_PAST[action]} from its current state.")
+            if action in ("pause", "cancel"):
+                self.scheduler.stop_job(job_id)
+            self.scheduler.wake()
+            self._refresh_queue()
+
+        tree.bind("<Double-1>", lambda event: act("follow"))
+        buttons = ttk.Frame(body, style="Card.TFrame")
+        buttons.grid(row=1, column=0, sticky="ew", pady=(10, 0))
+        for label, action in (("Follow", "follow"), ("Up", "up"), ("Down", "down"), ("Pause", "pause"), ("Resume", "resume"), ("Cancel", "cancel"), ("Remove", "remove")):
+            ttk.Button(buttons, text=label, command=lambda action=action: act(action)).pack(side="left", padx=(0, 8))
+        ttk.Button(buttons, text="Close", command=dialog.destroy).pack(side="right")
+        self._refresh_queue()
+
+    def _refresh_queue(self):
+        tree = self._queue_tree
+        if tree is None or not tree.winfo_exists():
+            return
+        selection = tree.selection()
+        tree.delete(*tree.get_children())
+        for job in self.render_queue.list_jobs():
+            tree.insert(
+                "",
+                "end",
+                iid=str(job["id"]),
+                values=(job["id"], job["name"], job["status"], f"{job['done']}/{job['total']}", job["priority"]),
+                tags=(job["status"],),
+            )
+        if selection and tree.exists(selection[0]):
+            tree.selection_set(selection[0])
+
+    def generate_quick_sample(self):
+        self._start_preview(self.audition_text, "Quick sample", audition=True)
+
+    def preview_from_cursor(self):
+        if self.notebook.select() == str(self.chunk_browser):
+            start = self.chunk_browser.selected_index() or 0
+            text = " ".join(self.chunk_browser.chunks[start : start + PREVIEW_CHUNKS])
+        else:
+            text = self.text_input.get("insert", "end-1c")
+        if not text.strip():
+            self.status_var.set("Nothing to preview after the cursor.")
+            return
+        self._start_preview(text, "Preview")
 
-            ref_path = self.ref_audio_var.get().strip()
-            voice_name = self.voice_var.get().strip()
+    def _start_preview(self, text, label, voice_name=None, temp_val=None, speed_val=None, audition=False):
+        self._preview_stop.set()
+        stop = threading.Event()
+        self._preview_stop = stop
+        ref_path = "" if voice_name else self.ref_audio_var.get().strip()
+        voice_name = voice_name or self.voice_var.get().strip()
+        temp_val = float(self.temp_var.get()) if temp_val is None else temp_val
+        speed_val = float(self.speed_var.get()) if speed_val is None else speed_val
 
+        def task():
             try:
-                state, temp_file = prepare_voice_state(ref_path, voice_name)
+                # Cached auditions play straight from disk, even while a
+                # render is holding the model.
+                if audition and pocket_model is not None and audition_cache is not None:
+                    path = audition_cache.lookup(audition_key(text, voice_name, temp_val, speed_val, ref_path)) or audition_cache.lookup(
+                        audition_key(text, voice_name, temp_val, speed_val, ref_path, streamed=True)
+                    )
+                    if path:
+                        self._set_status(f"{label}: playing from cache...")
+                        play_audio_file(path, stop)
+                        self._set_status(f"{label} stopped." if stop.is_set() else f"{label} done.")
+                        return
+
+                if self._model_lock.locked():
+                    self._set_status(f"{label}: waiting for the model...")
+                # The model is not re-entrant; wait for a render, the audition
+                # job or a cancelled preview to let go of it.
+                with self._model_lock:
+                    if not stop.is_set():
+                        run()
             except Exception as exc:
-                self._set_status(f"Voice load error: {exc}")
-                return
-
-            full_text = self._get_text().strip()
-            if not full_text:
-                self._set_status("No text found to synthesize.")
-                return
+                traceback.print_exc()
+                self._set_status(f"{label} error: {exc}")
+            finally:
+                # A finished preview no longer takes the Stop button.
+                stop.set()
 
-            all_chunks = split_text_into_chunks(full_text.split(), self.chunk_size_var.get())
-            start_chunk_idx = self.start_chunk_var.get() - 1
-            if start_chunk_idx < 0 or start_chunk_idx >= len(all_chunks):
-                self._set_status("Invalid start chunk.")
-                return
+        def run():
+            player = None
+            try:
+                self._set_status(f"{label}: loading model...")
+                if not ensure_model_loaded():
+                    self._set_status("Failed to load PocketTTS model.")
+                    return
+                self._model_ready()
+
+                state = prepare_voice_state(ref_path, voice_name)
+                player = AudioPlayer(pocket_model.sample_rate)
+                started = time.perf_counter()
+                first_audio = []
+                blocks = []
+
+                def on_audio(block):
+                    if not first_audio:
+                        first_audio.append(time.perf_counter() - started)
+                        self._set_status(f"{label}: playing (first audio after {first_audio[0]:.2f}s)...")
+                    player.put(block)
+                    if audition:
+                        blocks.append(block)
+
+                stream_speech(state, text, on_audio, temp_val, speed_val, stop)
+                if audition and blocks and not stop.is_set() and audition_cache is not None:
+                    store_audition(audition_key(text, voice_name, temp_val, speed_val, ref_path, streamed=True), np.concatenate(blocks))
+                    self._ui(self._refresh_auditions)
+                player.finish(stop)
+                self._set_status(f"{label} stopped." if stop.is_set() else f"{label} done.")
+            except Exception as exc:
+                traceback.print_exc()
+                self._set_status(f"{label} error: {exc}")
+                if player is not None:
+                    player.stop()
 
-            total_chunks = len(all_chunks[start_chunk_idx:])
-            self._set_progress(0, len(all_chunks))
-            temp_val = float(self.temp_var.get())
-            speed_val = float(self.speed_var.get())
-            times = []
-            output_files = []
+        threading.Thread(target=task, daemon=True).start()
 
-            for idx, chunk in enumerate(all_chunks[start_chunk_idx:], start=start_chunk_idx):
-                if stop_event.is_set():
-                    self._set_status(f"Stopped. Saved {len(output_files)} files so far.")
-                    break
+    def _start_warmup(self):
+        startup_timings["window"] = round(time.perf_counter() - _started, 4)
+        ref_path = self.ref_audio_var.get().strip()
+        voice_name = self.voice_var.get().strip()
 
-                started = time.time()
-                chunk_text = " ".join(chunk)
-                if times:
-                    avg_time = (sum(times) / len(times)) / 60.0
-                    remaining_chunks = total_chunks - (idx - start_chunk_idx + 1)
-                    remaining_time = avg_time * remaining_chunks
-                else:
-                    avg_time = 0.0
-                    remaining_time = 0.0
+        def task():
+            # Load the model and run one short generation while the user is
+            # still picking a document, so the first Generate or Quick Sample
+            # does not pay for it.
+            try:
+                with self._model_lock:
+                    self._set_status(WARMUP_STATUS)
+                    if DEFAULT_SERVER_URL:
+                        connect_model_server(DEFAULT_SERVER_URL, timeout=0.5)
+                    report = warm_up_model(ref_path, voice_name)
+                if report is None:
+                    self._ui(self._finish_warmup, "Failed to load PocketTTS model.")
+                    return
+                self._ui(self._finish_warmup, f"Ready (model loaded in {report['model_load']:.1f}s, first generation {report['first_generation']:.1f}s).")
+                self._model_ready()
+            except Exception as exc:
+                traceback.print_exc()
+                self._ui(self._finish_warmup, f"Model warm-up error: {exc}")
 
-                info = f"Processing chunk {idx + 1}/{len(all_chunks)}"
-                if avg_time > 0:
-                    info += f" | Avg: {avg_time:.2f}m | Est. Remaining: {remaining_time:.2f}m"
-                self._set_chunk_info(info)
-                self._set_status(f"Generating chunk {idx + 1}...")
+        threading.Thread(target=task, daemon=True).start()
 
-                out_path = os.path.join(output_directory, f"output_{idx + 1}.wav")
-                success = False
-                for attempt in range(1, 4):
-                    try:
-                        synthesize_chunk_to_file(state, chunk_text, out_path, temp_val, speed_val)
-                        success = True
-                        break
-                    except Exception as chunk_error:
-                        print(f"[Chunk {idx + 1}] Attempt {attempt} failed: {chunk_error}")
-                        if attempt >= 3:
-                            print(f"[Chunk {idx + 1}] Skipping.")
-                            break
-                        time.sleep(1)
-
-                if not success:
-                    continue
+    def _finish_warmup(self, message):
+        # Leave the status alone if the user has started something since.
+        if self.status_var.get() == WARMUP_STATUS:
+            self.status_var.set(message)
 
-                output_files.append(out_path)
-                self._set_progress(idx + 1, len(all_chunks))
-                elapsed = time.time() - started
-                times.append(elapsed)
-                print(f"[Chunk {idx + 1}] Done in {elapsed:.2f}s")
-                gc.collect()
+    def _model_ready(self):
+        if audition_cache is not None and not self._auditions_started:
+            self._auditions_started = True
+            self._ui(self._start_auditions)
 
-            if not stop_event.is_set():
-                self._set_status(f"Done. Saved {len(output_files)} files.")
+    def _audition_settings(self):
+        temperatures = sorted(set(AUDITION_TEMPERATURES) | {round(float(self.temp_var.get()), 2)})
+        speeds = sorted(set(AUDITION_SPEEDS) | {round(float(self.speed_var.get()), 2)})
+        return self.audition_text, audition_grid(temperatures, speeds)
 
-            if self.combine_mp3_var.get() and output_files:
-                self._set_status("Merging to MP3...")
-                custom_name = self.mp3_name_var.get().strip() or "final_output"
-                mp3_path = combine_output_to_mp3(output_files, output_directory, custom_name)
-                if mp3_path:
-                    self._set_status(f"Done. MP3 saved: {os.path.basename(mp3_path)}")
-                else:
-                    self._set_status("Done. Files saved, but MP3 merge failed.")
-        except Exception as exc:
-            print("\nUncaught error in generate_speech():")
-            traceback.print_exc()
-            self._set_status(f"An error occurred: {exc}")
-        finally:
-            if temp_file and os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except OSError:
-                    pass
-            self._set_generate_enabled(True)
+    def _start_auditions(self):
+        self._audition_generation += 1
+        generation = self._audition_generation
+        text, grid = self._audition_settings()
 
-    def generate_quick_sample(self):
         def task():
-            temp_ref = None
-            temp_out = os.path.abspath("quick_sample.wav")
-            try:
-                self._set_status("Generating quick sample...")
-                if not ensure_model_loaded():
-                    self._set_status("Failed to load PocketTTS model.")
+            for voice_name, temp_val, speed_val in grid:
+                if generation != self._audition_generation:
                     return
+                if audition_cache.contains(audition_key(text, voice_name, temp_val, speed_val)):
+                    continue
+                with self._model_lock:
+                    if generation != self._audition_generation:
+                        return
+                    try:
+                        render_audition(text, voice_name, temp_val, speed_val)
+                    except Exception as exc:
+                        print(f"[System] Audition {voice_name} @ {temp_val}/{speed_val}x failed: {exc}")
+                self._ui(self._refresh_auditions)
+                # Give a render or preview waiting on the lock its turn.
+                time.sleep(0.1)
 
-                state, temp_ref = prepare_voice_state(self.ref_audio_var.get().strip(), self.voice_var.get().strip())
-                synthesize_chunk_to_file(state, SAMPLE_TEXT, temp_out, float(self.temp_var.get()), float(self.speed_var.get()))
+        threading.Thread(target=task, daemon=True).start()
 
-                if temp_ref and os.path.exists(temp_ref):
-                    try:
-                        os.remove(temp_ref)
-                    except OSError:
-                        pass
-                    temp_ref = None
-
-                self._set_status("Playing quick sample...")
-                if sys.platform == "win32":
-                    import winsound
-                    winsound.PlaySound(temp_out, winsound.SND_FILENAME)
-                else:
-                    subprocess.run(["aplay", temp_out], capture_output=True)
-                self._set_status("Quick sample done.")
+    def open_auditions(self):
+        if self._audition_tree is not None and self._audition_tree.winfo_exists():
+            self._audition_tree.winfo_toplevel().lift()
+            return
+
+        dialog = tk.Toplevel(self)
+        dialog.title("Voice Auditions")
+        dialog.configure(bg="#1f2430")
+        dialog.geometry("560x520")
+        dialog.transient(self)
+
+        body = ttk.Frame(dialog, style="Card.TFrame", padding=12)
+        body.pack(fill="both", expand=True)
+        body.columnconfigure(0, weight=1)
+        body.rowconfigure(2, weight=1)
+
+        ttk.Label(body, text="Passage:", style="Body.TLabel").grid(row=0, column=0, sticky="w")
+        passage = tk.Text(body, wrap="word", height=3, bg="#2a3142", fg="#edf2ff", insertbackground="#edf2ff", relief="flat", padx=8, pady=6)
+        passage.grid(row=1, column=0, sticky="ew", pady=(4, 10))
+        passage.insert("1.0", self.audition_text)
+
+        tree = ttk.Treeview(body, columns=("voice", "temperature", "speed", "status"), show="headings", selectmode="browse")
+        for column, title, width in (("voice", "Voice", 160), ("temperature", "Temperature", 110), ("speed", "Speed", 90), ("status", "Status", 110)):
+            tree.heading(column, text=title, anchor="w")
+            tree.column(column, width=width, anchor="w")
+        tree.tag_configure("ready", foreground=ChunkBrowser.STATUS_COLORS["done"])
+        tree.tag_configure("pending", foreground=ChunkBrowser.STATUS_COLORS["pending"])
+        tree.grid(row=2, column=0, sticky="nsew")
+        self._audition_tree = tree
+
+        def selected():
+            selection = tree.selection()
+            if not selection:
+                return None
+            voice_name, temp_val, speed_val, _ = tree.item(selection[0], "values")
+            return voice_name, float(temp_val), float(speed_val)
+
+        def play():
+            choice = selected()
+            if choice:
+                voice_name, temp_val, speed_val = choice
+                self._start_preview(self.audition_text, f"Audition {voice_name}", voice_name, temp_val, speed_val, audition=True)
+
+        def use():
+            choice = selected()
+            if choice:
+                voice_name, temp_val, speed_val = choice
+                self.ref_audio_var.set("")
+                self.voice_var.set(voice_name)
+                self.temp_var.set(temp_val)
+                self.speed_var.set(speed_val)
+
+        def apply_passage():
+            text = " ".join(passage.get("1.0", "end-1c").split())
+            if text and text != self.audition_text:
+                self.audition_text = text
+                if self._auditions_started:
+                    self._start_auditions()
+            self._refresh_auditions()
+
+        tree.bind("<Double-1>", lambda event: play())
+        buttons = ttk.Frame(body, style="Card.TFrame")
+        buttons.grid(row=3, column=0, sticky="ew", pady=(10, 0))
+        ttk.Button(buttons, text="Play", style="Sample.TButton", command=play).pack(side="left")
+        ttk.Button(buttons, text="Use Settings", command=use).pack(side="left", padx=(8, 0))
+        ttk.Button(buttons, text="Use Passage", command=apply_passage).pack(side="left", padx=(8, 0))
+        ttk.Button(buttons, text="Close", command=dialog.destroy).pack(side="right")
+        self._refresh_auditions()
+
+    def _refresh_auditions(self):
+        tree = self._audition_tree
+        if tree is None or not tree.winfo_exists():
+            return
+        text, grid = self._audition_settings()
+        selection = tree.selection()
+        selected = tuple(str(value) for value in tree.item(selection[0], "values")[:3]) if selection else None
+        tree.delete(*tree.get_children())
+        for voice_name, temp_val, speed_val in grid:
+            ready = pocket_model is not None and audition_cache is not None and audition_cache.contains(audition_key(text, voice_name, temp_val, speed_val))
+            status = "ready" if ready else "pending"
+            item = tree.insert("", "end", values=(voice_name, temp_val, speed_val, status), tags=(status,))
+            if selected == (voice_name, str(temp_val), str(speed_val)):
+                tree.selection_set(item)
+
+
+DOCUMENT_EXTENSIONS = (".pdf", ".txt", ".epub")
+MANIFEST_EXTENSIONS = (".json", ".jsonl")
+
+
+def _read_manifest(manifest_path):
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as handle:
+        if manifest_path.lower().endswith(".jsonl"):
+            entries = [json.loads(line) for line in handle if line.strip()]
+        else:
+            entries = json.load(handle)
+    if isinstance(entries, dict):
+        entries = entries.get("books", [])
+
+    jobs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"input": entry}
+        job = dict(entry)
+        if not is_url(job["input"]):
+            job["input"] = os.path.join(base_dir, job["input"])
+        if job.get("ref_audio"):
+            job["ref_audio"] = os.path.join(base_dir, job["ref_audio"])
+        if job.get("out"):
+            job["out"] = os.path.join(base_dir, job["out"])
+        jobs.append(job)
+    return jobs
+
+
+def collect_render_jobs(inputs):
+    jobs = []
+    for path in inputs:
+        lower_path = path.lower()
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                    jobs.append({"input": os.path.join(path, name)})
+        elif lower_path.endswith(MANIFEST_EXTENSIONS):
+            jobs.extend(_read_manifest(path))
+        else:
+            jobs.append({"input": path})
+    return jobs
+
+
+def iter_input_parts(input_path, settings, ingest_workers=None, cleaner=None):
+    if is_url(input_path):
+        return iter_url_parts(
+            input_path,
+            settings.get("crawl") or "page",
+            int(settings.get("max_pages") or CRAWL_MAX_PAGES),
+            int(settings.get("connections") or CRAWL_CONNECTIONS),
+            settings.get("link_pattern") or None,
+        )
+    return iter_document_parts(input_path, ingest_workers, cleaner)
+
+
+def iter_input_chunks(input_path, settings):
+    cleaner = PdfTextCleaner() if settings.get("pdf_cleanup", True) else None
+    parts = iter_input_parts(input_path, settings, cleaner=cleaner)
+    for chunk in iter_text_chunks(parts, int(settings["chunk_size"]), chapters=bool(settings.get("chapters")), chunking=settings.get("chunking") or "greedy"):
+        if not isinstance(chunk, ChapterMark):
+            yield " ".join(chunk)
+
+
+def render_job(
+    settings, output_directory, chunks=None, pool=None, workers=1, ingest_workers=None, on_status=None, on_progress=None, on_chunk=None, stop=None, model_lock=None
+):
+    voice_key = (settings.get("ref_audio") or "", settings["voice"])
+    model_lock = model_lock or contextlib.nullcontext()
+    state = None
+    if pool is None:
+        with model_lock:
+            state = prepare_voice_state(*voice_key)
+    input_path = settings.get("input")
+    on_status = on_status or (lambda text: print(f"[System] {text}"))
+    cleaner = PdfTextCleaner() if chunks is None and settings.get("pdf_cleanup", True) else None
+    source = iter_input_parts(input_path, settings, ingest_workers, cleaner) if chunks is None else None
+    result = render_book(
+        state,
+        source,
+        output_directory,
+        chunk_size=int(settings["chunk_size"]),
+        temp_val=float(settings["temperature"]),
+        speed_val=float(settings["speed"]),
+        start_chunk=int(settings["start_chunk"]),
+        combine_mp3=bool(settings["combine_mp3"]),
+        mp3_name=settings.get("name") or input_stem(input_path or "") or "final_output",
+        book_format=settings.get("book_format") or "mp3",
+        on_status=on_status,
+        on_progress=on_progress,
+        pool=pool,
+        workers=workers,
+        voice_key=voice_key,
+        chunks=chunks,
+        on_chunk=on_chunk,
+        chunking=settings.get("chunking") or "greedy",
+        segmented_mp3=bool(settings.get("segmented_mp3")),
+        chapters=bool(settings.get("chapters")),
+        stop=stop,
+        model_lock=model_lock,
+    )
+    if cleaner is not None and cleaner.words_in:
+        result["cleanup"] = cleaner.report(result.get("metrics", {}).get("words_per_s"))
+        message = describe_cleanup(result["cleanup"])
+        if message:
+            on_status(message)
+    return result
+
+
+def _create_batch_pool(workers, torch_threads, voice_key=None):
+    if workers <= 1:
+        return None
+    cache_dir = chunk_cache.cache_dir if chunk_cache else None
+    cache_mb = chunk_cache.max_bytes / (1024 * 1024) if chunk_cache else 0
+    return create_render_pool(workers, torch_threads, cache_dir, cache_mb, voice_key)
+
+
+def render_batch(jobs, output_root, defaults, emit=None, workers=1, torch_threads=0, ingest_workers=None):
+    emit = emit or (lambda result: None)
+    results = []
+    pool = _create_batch_pool(workers, torch_threads, (defaults.get("ref_audio") or "", defaults["voice"]))
+    if pool is None and not ensure_model_loaded():
+        for job in jobs:
+            result = {"input": job["input"], "status": "failed", "error": "Failed to load PocketTTS model."}
+            emit(result)
+            results.append(result)
+        return results
+
+    if pool is None:
+        report_startup()
+    if pool is None and torch_threads and torch is not None:
+        torch.set_num_threads(torch_threads)
+
+    try:
+        for job in jobs:
+            settings = dict(defaults)
+            settings.update({key: value for key, value in job.items() if value is not None})
+            input_path = settings["input"]
+            stem = input_stem(input_path)
+            output_directory = settings.get("out") or os.path.join(output_root, stem)
+
+            try:
+                print(f"[System] Rendering {input_path} -> {output_directory}")
+                result = render_job(settings, output_directory, pool=pool, workers=workers, ingest_workers=ingest_workers)
             except Exception as exc:
                 traceback.print_exc()
-                self._set_status(f"Quick sample error: {exc}")
+                result = {"output_dir": output_directory, "status": "failed", "error": str(exc)}
+
+            result = {"input": input_path, **result}
+            emit(result)
+            results.append(result)
+            if stop_event.is_set():
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    return results
+
+
+class RenderQueue:
+    FILE_NAME = "render_queue.sqlite3"
+    ACTIVE = ("queued", "running", "pausing", "paused", "cancelling")
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            output_dir TEXT NOT NULL,
+            settings TEXT NOT NULL,
+            chunks TEXT,
+            priority INTEGER NOT NULL DEFAULT 0,
+            position INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            done INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            info TEXT NOT NULL DEFAULT '',
+            message TEXT NOT NULL DEFAULT '',
+            result TEXT,
+            runner TEXT,
+            heartbeat REAL,
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        )
+    """
+    COLUMNS = "id, name, output_dir, settings, priority, status, done, total, info, message, result, runner, created, updated"
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(self.SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per operation; SQLite's own locking makes
+        # the queue safe to share between the window, CLI runners and threads.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _job(self, row):
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, name, output_dir, settings, chunks=None, priority=0):
+        now = time.time()
+        total = 0
+        if chunks is not None:
+            chunks = [{"chapter": chunk.title} if isinstance(chunk, ChapterMark) else chunk for chunk in chunks]
+            total = sum(1 for chunk in chunks if isinstance(chunk, str))
+        with self._connect() as conn:
+            position = conn.execute("SELECT COALESCE(MAX(position), 0) + 1 FROM jobs").fetchone()[0]
+            cursor = conn.execute(
+                "INSERT INTO jobs (name, output_dir, settings, chunks, priority, position, total, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, output_dir, json.dumps(settings), json.dumps(chunks) if chunks is not None else None, priority, position, total, now, now),
+            )
+            return cursor.lastrowid
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def chunks(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT chunks FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        return [ChapterMark(chunk["chapter"]) if isinstance(chunk, dict) else chunk for chunk in json.loads(row[0])]
+
+    def list_jobs(self, include_finished=True):
+        query = f"SELECT {self.COLUMNS} FROM jobs"
+        if not include_finished:
+            query += " WHERE status IN (%s)" % ", ".join("?" * len(self.ACTIVE))
+        query += " ORDER BY status NOT IN ('running', 'pausing', 'cancelling'), priority DESC, position, id"
+        with self._connect() as conn:
+            rows = conn.execute(query, () if include_finished else self.ACTIVE).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim_next(self, runner):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, position, id LIMIT 1").fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', runner = ?, heartbeat = ?, message = '', updated = ? WHERE id = ?",
+                        (runner, now, now, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row is not None else None
+
+    def progress(self, job_id, done=None, total=None, info=None, message=None):
+        # Doubles as the runner's heartbeat; returns the job's status so the
+        # runner notices a pause or cancel requested from another process.
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET done = COALESCE(?, done), total = COALESCE(?, total), info = COALESCE(?, info), "
+                "message = COALESCE(?, message), heartbeat = ?, updated = ? WHERE id = ?",
+                (done, total, info, message, now, now, job_id),
+            )
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else "cancelling"
+
+    def finish(self, job_id, render_result):
+        status = render_result.get("status", "failed")
+        with self._connect() as conn:
+            current = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if current is None:
+                return None
+            if status == "stopped":
+                status = "cancelled" if current[0] == "cancelling" else "paused"
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, runner = NULL, heartbeat = NULL, updated = ? WHERE id = ?",
+                (status, json.dumps(render_result), time.time(), job_id),
+            )
+        return status
+
+    def _transition(self, job_id, changes):
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[0] not in changes:
+                return False
+            conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status = ?", (changes[row[0]], time.time(), job_id, row[0]))
+        return True
+
+    def pause(self, job_id):
+        return self._transition(job_id, {"queued": "paused", "running": "pausing"})
+
+    def resume(self, job_id):
+        # Finished-but-incomplete jobs can be resumed too; the render journal
+        # picks up where they left off.
+        return self._transition(job_id, {status: "queued" for status in ("paused", "pausing", "failed", "partial", "cancelled")})
+
+    def cancel(self, job_id):
+        return self._transition(job_id, {"queued": "cancelled", "paused": "cancelled", "running": "cancelling", "pausing": "cancelling"})
+
+    def remove(self, job_id):
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE id = ? AND status NOT IN ('running', 'pausing', 'cancelling')", (job_id,))
+        return cursor.rowcount > 0
+
+    def set_priority(self, job_id, priority):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET priority = ?, updated = ? WHERE id = ?", (int(priority), time.time(), job_id))
+
+    def move(self, job_id, offset):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, priority FROM jobs WHERE status IN ('queued', 'paused') ORDER BY priority DESC, position, id"
+                ).fetchall()
+                ids = [row[0] for row in rows]
+                if job_id in ids:
+                    index = ids.index(job_id)
+                    target = max(0, min(len(ids) - 1, index + offset))
+                    if target != index:
+                        # Take the priority of the job it jumps over so the
+                        # new order holds.
+                        priority = rows[target][1]
+                        ids.insert(target, ids.pop(index))
+                        conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+                        conn.executemany("UPDATE jobs SET position = ? WHERE id = ?", [(position, row_id) for position, row_id in enumerate(ids, 1)])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def recover(self, stale_seconds=QUEUE_STALE_SECONDS):
+        # A runner that stopped heartbeating crashed or was killed; its job
+        # goes back in the queue and resumes from the render journal.
+        cutoff = time.time() - stale_seconds
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for old, new in (("running", "queued"), ("pausing", "paused"), ("cancelling", "cancelled")):
+                conn.execute(
+                    "UPDATE jobs SET status = ?, runner = NULL, heartbeat = NULL, updated = ? WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?)",
+                    (new, time.time(), old, cutoff),
+                )
+            conn.execute("COMMIT")
+
+
+class RenderScheduler:
+    def __init__(self, render_queue, pool=None, workers=1, ingest_workers=None, model_lock=None, on_chunk=None, emit=None):
+        self.queue = render_queue
+        self.pool = pool
+        self.workers = workers
+        self.ingest_workers = ingest_workers
+        self.model_lock = model_lock or contextlib.nullcontext()
+        self.on_chunk = on_chunk or (lambda job_id, idx, status: None)
+        self.emit = emit or (lambda job, result: None)
+        self.runner_id = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self.current_job = None
+        self._job_stop = threading.Event()
+        self._wake = threading.Event()
+        self._shutdown = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def shutdown(self):
+        self._shutdown.set()
+        self._wake.set()
+
+    def stop_job(self, job_id):
+        # Each job has its own stop event, so stopping it leaves previews and
+        # other schedulers' jobs alone.
+        if job_id is not None and job_id == self.current_job:
+            self._job_stop.set()
+
+    def run(self, watch=False):
+        while not self._shutdown.is_set():
+            self.queue.recover()
+            job = self.queue.claim_next(self.runner_id)
+            if job is None:
+                if not watch:
+                    return
+                self._wake.wait(QUEUE_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        job_id = job["id"]
+        stop = threading.Event()
+        self._job_stop = stop
+        self.current_job = job_id
+        settings = job["settings"]
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(QUEUE_STALE_SECONDS / 4):
+                if self.queue.progress(job_id) in ("pausing", "cancelling"):
+                    stop.set()
+
+        def on_status(text):
+            print(f"[Job {job_id}] {text}")
+            if self.queue.progress(job_id, message=text) in ("pausing", "cancelling"):
+                stop.set()
+
+        def on_progress(done, total, info):
+            if self.queue.progress(job_id, done, total, info) in ("pausing", "cancelling"):
+                stop.set()
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            with self.model_lock:
+                loaded = self.pool is not None or ensure_model_loaded()
+            if not loaded:
+                result = {"status": "failed", "error": "Failed to load PocketTTS model."}
+            else:
+                # The model lock is taken per chunk inside the render, not for
+                # the whole book.
+                result = render_job(
+                    settings,
+                    job["output_dir"],
+                    chunks=self.queue.chunks(job_id),
+                    pool=self.pool,
+                    workers=self.workers,
+                    ingest_workers=self.ingest_workers,
+                    on_status=on_status,
+                    on_progress=on_progress,
+                    on_chunk=lambda idx, status: self.on_chunk(job_id, idx, status),
+                    stop=stop,
+                    model_lock=self.model_lock,
+                )
+        except Exception as exc:
+            traceback.print_exc()
+            result = {"status": "failed", "error": str(exc)}
+        finally:
+            finished.set()
+            self.current_job = None
+        result = {"job": job_id, "input": settings.get("input"), "output_dir": job["output_dir"], **result}
+        status = self.queue.finish(job_id, result)
+        self.queue.progress(job_id, message=result.get("error") or f"Finished: {status}.")
+        self.emit(job, result)
+        return result
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="PocketTTSUI.py", description="PocketTTS audiobook generator.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    chunk_settings = argparse.ArgumentParser(add_help=False)
+    chunk_settings.add_argument("--chunk-size", dest="chunk_size", type=int, default=DEFAULT_CHUNK_SIZE)
+    chunk_settings.add_argument("--chapters", action="store_true", help="Start a new chunk at every chapter and mark the chapters in the merged MP3. Always on for M4B.")
+    chunk_settings.add_argument("--chunking", choices=CHUNKING_MODES, default="greedy", help="greedy fills every chunk; stable anchors boundaries to the sentences themselves, so an edit only changes the chunks around it.")
+    chunk_settings.add_argument("--no-pdf-cleanup", dest="pdf_cleanup", action="store_false", help="Keep PDF running headers, page numbers and line-break hyphens.")
+
+    book_settings = argparse.ArgumentParser(add_help=False, parents=[chunk_settings])
+    book_settings.add_argument("--voice", default=VOICE_OPTIONS[0], help="Built-in voice name.")
+    book_settings.add_argument("--ref-audio", dest="ref_audio", default="", help="Reference clip for voice cloning.")
+    book_settings.add_argument("--temperature", type=float, default=0.7)
+    book_settings.add_argument("--speed", type=float, default=1.0)
+    book_settings.add_argument("--start-chunk", dest="start_chunk", type=int, default=1)
+    book_settings.add_argument("--no-mp3", dest="combine_mp3", action="store_false", help="Keep the WAV chunks instead of merging them.")
+    book_settings.add_argument("--segmented-mp3", dest="segmented_mp3", action="store_true", help="Encode each chunk to its own MP3 as it finishes and stream-copy them into the book. Faster to re-merge, but not gapless.")
+    book_settings.add_argument("--book-format", dest="book_format", choices=BOOK_FORMATS, default="mp3", help="mp3: one MP3 with chapter frames; m4b: chapters encoded as they finish, packaged as an M4B.")
+    book_settings.add_argument("--crawl", choices=CRAWL_MODES, default="page", help="For URL inputs: page reads one page; next follows \"next chapter\" links; toc reads every chapter linked from a table of contents.")
+    book_settings.add_argument("--max-pages", dest="max_pages", type=int, default=CRAWL_MAX_PAGES, help="Most chapters to fetch in a crawl.")
+    book_settings.add_argument("--connections", type=int, default=CRAWL_CONNECTIONS, help="Parallel connections for table-of-contents crawls.")
+    book_settings.add_argument("--link-pattern", dest="link_pattern", default="", help="Regex a chapter link's URL or text must match (table-of-contents crawls).")
+
+    runtime = argparse.ArgumentParser(add_help=False)
+    runtime.add_argument("--chunk-format", dest="chunk_format", choices=sorted(CHUNK_FORMATS), default="float32", help="Storage for the intermediate chunks: float32 or int16 WAV, FLAC, or one int16 spool file indexed by the render journal.")
+    runtime.add_argument("--pause-ms", dest="pause_ms", type=int, default=DEFAULT_PAUSE_MS, help="Longest silence kept where two sentences' audio joins.")
+    runtime.add_argument("--loudness-dbfs", dest="loudness_dbfs", type=float, default=DEFAULT_LOUDNESS_DBFS, help="RMS level every sub-chunk's speech is normalized to.")
+    runtime.add_argument("--crossfade-ms", dest="crossfade_ms", type=int, default=DEFAULT_CROSSFADE_MS, help="Crossfade length at sub-chunk joins.")
+    runtime.add_argument("--no-polish", dest="polish", action="store_false", help="Write the model's audio as is: no silence trimming, normalization or crossfades.")
+    runtime.add_argument("--workers", type=int, default=1, help="Synthesis processes; each loads its own model.")
+    runtime.add_argument("--torch-threads", dest="torch_threads", type=int, default=0, help="Torch threads per worker (0 keeps the torch default).")
+    runtime.add_argument("--ingest-workers", dest="ingest_workers", type=int, default=None, help="Processes extracting PDF pages / EPUB chapters (default: up to 4).")
+    runtime.add_argument("--cache-dir", dest="cache_dir", default=DEFAULT_CACHE_DIR, help="Chunk audio cache directory.")
+    runtime.add_argument("--cache-size-mb", dest="cache_size_mb", type=float, default=DEFAULT_CACHE_MB, help="Cache size cap; least recently used chunks are evicted.")
+    runtime.add_argument("--phrase-memo-mb", dest="phrase_memo_mb", type=float, default=PHRASE_MEMO_MB, help="Memory for reusing the audio of phrases repeated within a book (0 disables).")
+    runtime.add_argument("--voice-cache-dir", dest="voice_cache_dir", default=DEFAULT_VOICE_CACHE_DIR, help="Computed voice state cache directory (empty keeps states in memory only).")
+    runtime.add_argument("--web-cache-dir", dest="web_cache_dir", default=DEFAULT_WEB_CACHE_DIR, help="HTTP cache for crawled pages, revalidated with ETag/Last-Modified (empty disables it).")
+    runtime.add_argument("--no-cache", dest="use_cache", action="store_false", help="Always synthesize every chunk.")
+    runtime.add_argument("--metrics-log", dest="metrics_log", default="", help="Append per-chunk and per-book stage timings to this JSON-lines file.")
+    runtime.add_argument("--prometheus", default="", help="Keep a Prometheus textfile-collector file with cumulative render metrics at this path.")
+    runtime.add_argument("--server", default="", help="Synthesize through a running model server (e.g. http://127.0.0.1:8765) instead of loading the model.")
+
+    render = subparsers.add_parser("render", parents=[book_settings, runtime], help="Render books without opening the window.")
+    render.add_argument("inputs", nargs="+", help="Documents (.pdf/.txt/.epub), http(s) URLs, directories of documents or .json/.jsonl manifests.")
+    render.add_argument("--out", required=True, help="Output root; each book is written to its own subdirectory.")
+    render.add_argument("--report", default="", help="Also write all results as a JSON list to this path.")
+
+    queue_root = argparse.ArgumentParser(add_help=False)
+    queue_root.add_argument("--out", required=True, help=f"Output root holding the queue database ({RenderQueue.FILE_NAME}).")
+    queue_parser = subparsers.add_parser("queue", help="Durable render queue kept in the output root.")
+    actions = queue_parser.add_subparsers(dest="action", required=True)
+    add = actions.add_parser("add", parents=[queue_root, book_settings], help="Enqueue documents, directories or manifests.")
+    add.add_argument("inputs", nargs="+")
+    add.add_argument("--priority", type=int, default=0, help="Higher priorities render first.")
+    listing = actions.add_parser("list", parents=[queue_root], help="Print the jobs as JSON lines.")
+    listing.add_argument("--active", action="store_true", help="Only jobs that are not finished.")
+    run = actions.add_parser("run", parents=[queue_root, runtime], help="Render queued jobs until the queue is empty.")
+    run.add_argument("--watch", action="store_true", help="Keep running and pick up jobs as they are added.")
+    for action in ("pause", "resume", "cancel", "remove"):
+        actions.add_parser(action, parents=[queue_root], help=f"{action.capitalize()} jobs.").add_argument("ids", type=int, nargs="+")
+    move = actions.add_parser("move", parents=[queue_root], help="Move a job up (negative) or down the queue.")
+    move.add_argument("id", type=int)
+    move.add_argument("offset", type=int)
+    priority = actions.add_parser("priority", parents=[queue_root], help="Set a job's priority.")
+    priority.add_argument("id", type=int)
+    priority.add_argument("priority", type=int)
+
+    diff = subparsers.add_parser("diff", parents=[chunk_settings], help="Report which chunks an edit changes, as JSON lines.")
+    diff.add_argument("previous", help="The earlier document, or a book's output directory (its render journal and chunk settings are used).")
+    diff.add_argument("edited", help="The edited document or URL.")
+
+    serve = subparsers.add_parser("serve", help="Load the model once and serve it to local windows and batch jobs.")
+    serve.add_argument("--host", default=DEFAULT_SERVER_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT)
+    serve.add_argument("--torch-threads", dest="torch_threads", type=int, default=0)
+    serve.add_argument("--voice-cache-dir", dest="voice_cache_dir", default=DEFAULT_VOICE_CACHE_DIR, help="Computed voice state cache directory (empty keeps states in memory only).")
+    return parser
+
+
+def _book_settings(args):
+    return {
+        "voice": args.voice,
+        "ref_audio": args.ref_audio,
+        "chunk_size": args.chunk_size,
+        "chunking": args.chunking,
+        "chapters": args.chapters,
+        "temperature": args.temperature,
+        "speed": args.speed,
+        "start_chunk": args.start_chunk,
+        "combine_mp3": args.combine_mp3,
+        "book_format": args.book_format,
+        "segmented_mp3": args.segmented_mp3,
+        "pdf_cleanup": args.pdf_cleanup,
+        "crawl": args.crawl,
+        "max_pages": args.max_pages,
+        "connections": args.connections,
+        "link_pattern": args.link_pattern,
+    }
+
+
+def _configure_runtime(args):
+    if args.use_cache:
+        configure_chunk_cache(args.cache_dir, args.cache_size_mb)
+    configure_voice_state_store(args.voice_cache_dir)
+    configure_metrics(args.metrics_log, args.prometheus)
+    configure_chunk_format(args.chunk_format)
+    configure_phrase_memo(args.phrase_memo_mb)
+    configure_audio_polish(args.pause_ms, args.loudness_dbfs, args.crossfade_ms, args.polish)
+    configure_web_cache(args.web_cache_dir)
+    if not args.server:
+        return args.workers
+    with contextlib.redirect_stdout(sys.stderr):
+        if not connect_model_server(args.server):
+            return None
+    # The server owns the only model and runs one job at a time.
+    return 1
+
+
+def _json_emitter():
+    # Bound to the real stdout before logging is redirected to stderr.
+    out = sys.stdout
+
+    def emit(result):
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    return emit
+
+
+QUEUE_ACTION_PAST = {"pause": "paused", "resume": "resumed", "cancel": "cancelled", "remove": "removed"}
+
+
+def run_queue_cli(args):
+    emit = _json_emitter()
+    output_root = os.path.abspath(args.out)
+    render_queue = RenderQueue(os.path.join(output_root, RenderQueue.FILE_NAME))
+
+    if args.action == "add":
+        defaults = _book_settings(args)
+        jobs = collect_render_jobs(args.inputs)
+        if not jobs:
+            print("[System] No input documents found.", file=sys.stderr)
+            return 2
+        for job in jobs:
+            settings = dict(defaults)
+            settings.update({key: value for key, value in job.items() if value is not None})
+            if not is_url(settings["input"]):
+                settings["input"] = os.path.abspath(settings["input"])
+            if settings.get("ref_audio"):
+                settings["ref_audio"] = os.path.abspath(settings["ref_audio"])
+            stem = input_stem(settings["input"])
+            output_directory = settings.pop("out", None) or os.path.join(output_root, stem)
+            job_id = render_queue.enqueue(settings.get("name") or stem, output_directory, settings, priority=args.priority)
+            emit({"id": job_id, "input": settings["input"], "output_dir": output_directory})
+        return 0
+
+    if args.action == "list":
+        for job in render_queue.list_jobs(include_finished=not args.active):
+            emit(job)
+        return 0
+
+    if args.action == "run":
+        workers = _configure_runtime(args)
+        if workers is None:
+            return 1
+        with contextlib.redirect_stdout(sys.stderr):
+            pool = _create_batch_pool(workers, args.torch_threads)
+            if pool is None and args.torch_threads and not args.server:
+                ensure_libs("model")
+                if torch is not None:
+                    torch.set_num_threads(args.torch_threads)
+            scheduler = RenderScheduler(render_queue, pool=pool, workers=workers, ingest_workers=args.ingest_workers, emit=lambda job, result: emit(result))
+            try:
+                scheduler.run(watch=args.watch)
+            except KeyboardInterrupt:
+                stop_event.set()
             finally:
-                if temp_ref and os.path.exists(temp_ref):
-                    try:
-                        os.remove(temp_ref)
-                    except OSError:
-                        pass
-                if os.path.exists(temp_out):
-                    try:
-                        os.remove(temp_out)
-                    except OSError:
-                        pass
+                if pool is not None:
+                    pool.shutdown(wait=True)
+        return 0
+
+    if args.action == "move":
+        render_queue.move(args.id, args.offset)
+        return 0
+    if args.action == "priority":
+        render_queue.set_priority(args.id, args.priority)
+        return 0
+
+    handler = getattr(render_queue, args.action)
+    failed = [job_id for job_id in args.ids if not handler(job_id)]
+    for job_id in failed:
+        print(f"[System] Job {job_id} cannot be {QUEUE_ACTION_PAST[args.action]} from its current state.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_diff_cli(args):
+    emit = _json_emitter()
+    settings = {"chunk_size": args.chunk_size, "chunking": args.chunking, "chapters": args.chapters, "pdf_cleanup": args.pdf_cleanup}
+    with contextlib.redirect_stdout(sys.stderr):
+        if os.path.isdir(args.previous):
+            journal_path = os.path.join(args.previous, RenderJournal.FILE_NAME)
+            try:
+                journal = RenderJournal.read(args.previous)
+            except (OSError, ValueError) as exc:
+                print(f"[System] Cannot read {journal_path}: {exc}", file=sys.stderr)
+                return 1
+            params = journal.get("params", {})
+            settings.update(chunk_size=params.get("chunk_size", args.chunk_size), chunking=params.get("chunking", "greedy"), chapters=params.get("chapters", False))
+            previous_hashes = [entry["hash"] for entry in journal.get("chunks", [])]
+        else:
+            previous_hashes = [chunk_text_hash(chunk_text) for chunk_text in iter_input_chunks(args.previous, settings)]
+        chunk_texts = list(iter_input_chunks(args.edited, settings))
+    for event in diff_chunks(previous_hashes, chunk_texts, settings["chunking"] == "stable"):
+        emit(event)
+    return 0
+
+
+def run_cli(argv):
+    args = build_arg_parser().parse_args(argv)
+    if args.command == "serve":
+        configure_voice_state_store(args.voice_cache_dir)
+        return serve_model(args.host, args.port, args.torch_threads)
+    if args.command == "queue":
+        return run_queue_cli(args)
+    if args.command == "diff":
+        return run_diff_cli(args)
+    if args.command != "render":
+        build_arg_parser().print_help()
+        return 2
+
+    jobs = collect_render_jobs(args.inputs)
+    if not jobs:
+        print("[System] No input documents found.", file=sys.stderr)
+        return 2
+
+    workers = _configure_runtime(args)
+    if workers is None:
+        return 1
+
+    emit = _json_emitter()
+    with contextlib.redirect_stdout(sys.stderr):
+        results = render_batch(
+            jobs, os.path.abspath(args.out), _book_settings(args), emit, workers, args.torch_threads, args.ingest_workers
+        )
 
-        threading.Thread(target=task, daemon=True).start()
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+    return 0 if all(result.get("status") == "ok" for result in results) else 1
 
 
 def main():
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+
+    configure_chunk_cache()
+    configure_voice_state_store()
+    configure_audition_cache()
+    configure_phrase_memo()
+    configure_audio_polish()
+    configure_web_cache()
     app = PocketTTSWindow()
     app.mainloop()
 
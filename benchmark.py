@@ -0,0 +1,585 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import PocketTTSUI as pocket
+
+
+def synthetic_speech(seconds, sample_rate, seed):
+    rng = pocket.np.random.default_rng(seed)
+    t = pocket.np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 120 + 30 * pocket.np.sin(2 * pocket.np.pi * 0.7 * t)
+    phase = 2 * pocket.np.pi * pocket.np.cumsum(pitch) / sample_rate
+    voiced = sum(pocket.np.sin(k * phase) / k for k in range(1, 8))
+    envelope = pocket.np.clip(pocket.np.sin(2 * pocket.np.pi * 2.5 * t), 0, None)
+    audio = 0.2 * voiced * envelope + 0.005 * rng.standard_normal(len(t))
+    return audio.astype(pocket.np.float32)
+
+
+def bench_speed(args):
+    sample_rate = args.sample_rate
+    chunk_audio = [synthetic_speech(args.chunk_seconds, sample_rate, seed) for seed in range(args.variants)]
+    work_dir = tempfile.mkdtemp(prefix="pocket_bench_")
+    report = {
+        "benchmark": "speed",
+        "chunks": args.chunks,
+        "chunk_seconds": args.chunk_seconds,
+        "book_hours": round(args.chunks * args.chunk_seconds / 3600, 3),
+        "speed": args.speed,
+        "sample_rate": sample_rate,
+    }
+
+    try:
+        started = time.perf_counter()
+        for idx in range(args.chunks):
+            audio = pocket.time_stretch(chunk_audio[idx % args.variants], args.speed, sample_rate)
+            pocket.scipy_wav.write(os.path.join(work_dir, f"numpy_{idx}.wav"), sample_rate, audio)
+        numpy_seconds = time.perf_counter() - started
+        report["numpy"] = {"total_s": round(numpy_seconds, 3), "per_chunk_ms": round(1000 * numpy_seconds / args.chunks, 2)}
+
+        if shutil.which("ffmpeg") is None:
+            report["ffmpeg"] = {"skipped": "ffmpeg not found on PATH"}
+        else:
+            started = time.perf_counter()
+            for idx in range(args.chunks):
+                path = os.path.join(work_dir, f"ffmpeg_{idx}.wav")
+                pocket.scipy_wav.write(path, sample_rate, chunk_audio[idx % args.variants])
+                pocket.apply_speed_to_audio(path, args.speed)
+            ffmpeg_seconds = time.perf_counter() - started
+            report["ffmpeg"] = {"total_s": round(ffmpeg_seconds, 3), "per_chunk_ms": round(1000 * ffmpeg_seconds / args.chunks, 2)}
+            report["speedup"] = round(ffmpeg_seconds / numpy_seconds, 2)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return report
+
+
+def legacy_split_text_into_chunks(words, original_chunk_size, wiggle_room=20):
+    def is_sentence_end(word):
+        return word[-1] in ".!?" if word else False
+
+    chunks = []
+    current_chunk = []
+    word_count = 0
+    i = 0
+
+    while i < len(words):
+        current_chunk.append(words[i])
+        word_count += 1
+        i += 1
+
+        if word_count >= original_chunk_size:
+            if is_sentence_end(words[i - 1]):
+                chunks.append(current_chunk)
+                current_chunk = []
+                word_count = 0
+            else:
+                found = False
+                for j in range(wiggle_room):
+                    if i + j < len(words) and is_sentence_end(words[i + j]):
+                        current_chunk.extend(words[i : i + j + 1])
+                        i += j + 1
+                        found = True
+                        break
+
+                if not found:
+                    for k in range(len(current_chunk) - 1, 0, -1):
+                        if is_sentence_end(current_chunk[k]):
+                            leftover = current_chunk[k + 1 :]
+                            chunks.append(current_chunk[: k + 1])
+                            current_chunk = leftover
+                            word_count = len(leftover)
+                            found = True
+                            break
+
+                if found and word_count != len(current_chunk):
+                    chunks.append(current_chunk)
+                    current_chunk = []
+                    word_count = 0
+                elif not found:
+                    chunks.append(current_chunk)
+                    current_chunk = []
+                    word_count = 0
+
+    if current_chunk:
+        chunks.append(current_chunk)
+
+    return chunks
+
+
+def legacy_split_for_model(text, chunk_size=200):
+    raw_chunks = pocket.re.split(r"([.!?]+)", text)
+    chunks = []
+    current = ""
+    for part in raw_chunks:
+        if len(current) + len(part) < chunk_size:
+            current += part
+        else:
+            if current:
+                chunks.append(current)
+            current = part
+    if current:
+        chunks.append(current)
+
+    final_chunks = []
+    for chunk in chunks:
+        if not chunk.strip():
+            continue
+        while len(chunk) > chunk_size:
+            split = chunk[:chunk_size].rfind(" ")
+            if split == -1:
+                split = chunk_size
+            final_chunks.append(chunk[:split])
+            chunk = chunk[split:]
+        final_chunks.append(chunk)
+    return [chunk.strip() for chunk in final_chunks if chunk.strip()]
+
+
+SENTENCE_PARTS = [
+    "Mr. Holloway opened the door",
+    "the lamps along the harbour flickered once and went dark",
+    "\u201cWho is there?\u201d she asked",
+    "nobody answered for a long time",
+    "J. R. Ashdown had warned them about the tide",
+    "the ledger listed 3.5 tons of grain, e.g. wheat and barley",
+    "he waited",
+    "somewhere a bell rang out across the water",
+]
+
+
+UNPUNCTUATE = str.maketrans("", "", ".!?")
+
+
+def synthetic_text(target_bytes, seed, punctuation=True):
+    rng = pocket.np.random.default_rng(seed)
+    sentences = []
+    size = 0
+    while size < target_bytes:
+        count = int(rng.integers(1, 4))
+        body = " ".join(SENTENCE_PARTS[int(rng.integers(len(SENTENCE_PARTS)))] for _ in range(count))
+        if not punctuation:
+            body = body.translate(UNPUNCTUATE)
+        else:
+            body = body[0].upper() + body[1:] + [".", ".", "!", "?", "..."][int(rng.integers(5))]
+        sentences.append(body)
+        size += len(body) + 1
+        if punctuation and rng.random() < 0.08:
+            sentences.append("\n\n")
+    return " ".join(sentences)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    value = func(*args)
+    return value, round(time.perf_counter() - started, 4)
+
+
+def bench_segment(args):
+    report = {"benchmark": "segment", "chunk_size": args.chunk_size, "sizes": []}
+    for size_mb in args.sizes_mb:
+        text = synthetic_text(int(size_mb * 1024 * 1024), seed=int(size_mb * 10))
+        words = text.split()
+        entry = {"mb": size_mb, "words": len(words)}
+
+        boundaries, entry["sentence_index_s"] = timed(pocket.build_sentence_index, text)
+        entry["sentences"] = len(boundaries)
+        chunks, entry["chunker_s"] = timed(lambda: list(pocket.iter_text_chunks(text, args.chunk_size)))
+        entry["chunks"] = len(chunks)
+        _, entry["legacy_chunker_s"] = timed(legacy_split_text_into_chunks, words, args.chunk_size)
+        pieces, entry["model_splitter_s"] = timed(pocket.split_for_model, text)
+        entry["model_pieces"] = len(pieces)
+        _, entry["legacy_model_splitter_s"] = timed(legacy_split_for_model, text)
+
+        unpunctuated = synthetic_text(int(min(size_mb, args.unpunctuated_mb) * 1024 * 1024), seed=1, punctuation=False)
+        entry["unpunctuated_mb"] = round(len(unpunctuated) / (1024 * 1024), 3)
+        _, entry["unpunctuated_model_splitter_s"] = timed(pocket.split_for_model, unpunctuated)
+        _, entry["unpunctuated_legacy_model_splitter_s"] = timed(legacy_split_for_model, unpunctuated)
+        report["sizes"].append(entry)
+    return report
+
+
+def edited_texts(text, edits, seed):
+    # One small edit per copy: a sentence inserted, a sentence deleted, or a
+    # word changed, at a random place in the book.
+    rng = pocket.np.random.default_rng(seed)
+    starts = [0] + pocket.build_sentence_index(text)
+    for number in range(edits):
+        kind = ("insert", "delete", "word")[number % 3]
+        pos = int(rng.integers(1, len(starts) - 1))
+        start, end = starts[pos], starts[pos + 1]
+        if kind == "insert":
+            yield kind, f"{text[:start]} Nobody had expected the letter to arrive that morning. {text[start:]}"
+        elif kind == "delete":
+            yield kind, text[:start] + text[end:]
+        else:
+            words = text[start:end].split(" ")
+            words[len(words) // 2] = "lantern"
+            yield kind, text[:start] + " ".join(words) + text[end:]
+
+
+def bench_locality(args):
+    if args.text:
+        with open(args.text, "r", encoding="utf-8") as handle:
+            text = handle.read()
+        source = os.path.basename(args.text)
+    else:
+        text = synthetic_text(int(args.kb * 1024), seed=7)
+        source = "synthetic"
+    report = {"benchmark": "locality", "source": source, "words": len(text.split()), "edits": args.edits, "sizes": []}
+    for chunk_size in args.chunk_sizes:
+        entry = {"chunk_size": chunk_size}
+        for chunking in pocket.CHUNKING_MODES:
+
+            def chunk(body):
+                return [" ".join(words) for words in pocket.iter_text_chunks(body, chunk_size, chunking=chunking)]
+
+            original = chunk(text)
+            previous = [pocket.chunk_text_hash(chunk_text) for chunk_text in original]
+            changed = {}
+            for kind, edited in edited_texts(text, args.edits, seed=chunk_size):
+                summary = list(pocket.diff_chunks(previous, chunk(edited), chunking == "stable"))[-1]
+                changed.setdefault(kind, []).append(summary["changed"])
+            counts = sorted(count for values in changed.values() for count in values)
+            entry[chunking] = {
+                "chunks": len(original),
+                "mean_words": round(sum(len(chunk_text.split()) for chunk_text in original) / len(original), 1),
+                "changed_mean": round(sum(counts) / len(counts), 2),
+                "changed_median": counts[len(counts) // 2],
+                "changed_p90": counts[int(len(counts) * 0.9)],
+                "changed_max": counts[-1],
+                "by_edit": {kind: round(sum(values) / len(values), 2) for kind, values in changed.items()},
+            }
+        report["sizes"].append(entry)
+    return report
+
+
+RTF_PASSAGE = (
+    "The lamps along the harbour flickered once and went dark. "
+    "Somewhere a bell rang out across the water, and for a long time nobody answered. "
+    "When the tide finally turned, the boats came home one by one, heavy with salt and silence."
+)
+
+
+class FakeModel:
+    CHARS_PER_SECOND = 15.0
+
+    def __init__(self, rtf=0.0, sample_rate=24000):
+        self.rtf = rtf
+        self.sample_rate = sample_rate
+        self.temp = 0.7
+        self.template = synthetic_speech(1.0, sample_rate, seed=0)
+
+    def generate_audio(self, state, text):
+        seconds = max(len(text) / self.CHARS_PER_SECOND, 0.1)
+        if self.rtf:
+            time.sleep(seconds * self.rtf)
+        return pocket.torch.from_numpy(pocket.np.resize(self.template, int(seconds * self.sample_rate)))
+
+
+def corpus_words(count, seed):
+    words = []
+    target = count * 7
+    while len(words) < count:
+        words = synthetic_text(target, seed).split()
+        target *= 2
+    return words[:count]
+
+
+def bench_pipeline(args):
+    model = FakeModel(args.rtf, args.sample_rate)
+    pocket.pocket_model = model
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    report = {
+        "benchmark": "pipeline",
+        "model": "fake",
+        "rtf": args.rtf,
+        "chunk_size": args.chunk_size,
+        "speed": args.speed,
+        "sample_rate": args.sample_rate,
+        "audio_chunks": args.audio_chunks,
+        "corpora": [],
+    }
+    if not has_ffmpeg:
+        report["ffmpeg"] = "skipped: ffmpeg not found on PATH"
+
+    for count in args.words:
+        words = corpus_words(count, seed=count)
+        entry = {"words": len(words)}
+        chunks, entry["chunker_s"] = timed(pocket.split_text_into_chunks, words, args.chunk_size)
+        entry["chunks"] = len(chunks)
+        texts = [" ".join(chunk) for chunk in chunks]
+        pieces, entry["model_splitter_s"] = timed(lambda: [piece for text in texts for piece in pocket.split_for_model(text)])
+        entry["model_pieces"] = len(pieces)
+
+        # Audio stages are timed on the first few chunks and projected to the
+        # whole corpus; a million words is roughly a hundred hours of audio.
+        totals = {"generate": 0.0, "wav_write": 0.0, "time_stretch": 0.0}
+        if has_ffmpeg:
+            totals.update({"ffmpeg_speed": 0.0, "combine_mp3": 0.0})
+        sample = texts[: args.audio_chunks]
+        audio_seconds = 0.0
+        work_dir = tempfile.mkdtemp(prefix="pocket_bench_")
+        try:
+            files = []
+            for idx, text in enumerate(sample):
+                audio, elapsed = timed(pocket._generate_pocket_safe, {}, text)
+                totals["generate"] += elapsed
+                audio_seconds += len(audio) / model.sample_rate
+                _, elapsed = timed(pocket.time_stretch, audio, args.speed, model.sample_rate)
+                totals["time_stretch"] += elapsed
+                path = os.path.join(work_dir, f"output_{idx + 1}.wav")
+                _, elapsed = timed(pocket.scipy_wav.write, path, model.sample_rate, audio)
+                totals["wav_write"] += elapsed
+                files.append(path)
+            if has_ffmpeg:
+                for path in files:
+                    _, elapsed = timed(pocket.apply_speed_to_audio, path, args.speed)
+                    totals["ffmpeg_speed"] += elapsed
+                _, totals["combine_mp3"] = timed(pocket.combine_output_to_mp3, files, work_dir, "bench", False)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        entry["audio_chunks"] = len(sample)
+        entry["sampled_audio_s"] = round(audio_seconds, 2)
+        entry["stages"] = {}
+        for name, total in totals.items():
+            per_chunk = total / max(len(sample), 1)
+            entry["stages"][name] = {
+                "sampled_s": round(total, 4),
+                "per_chunk_ms": round(1000 * per_chunk, 3),
+                "projected_s": round(per_chunk * len(chunks), 2),
+            }
+        report["corpora"].append(entry)
+    return report
+
+
+def legacy_assemble(state, text, out_path, speed, sample_rate):
+    audio = pocket._generate_pocket_safe(state, text)
+    if speed != 1.0:
+        audio = pocket.time_stretch(audio, speed, sample_rate)
+    pocket.scipy_wav.write(out_path, sample_rate, audio)
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - started
+        return tracemalloc.get_traced_memory()[1], elapsed
+    finally:
+        tracemalloc.stop()
+
+
+def bench_assembly(args):
+    model = FakeModel(0.0, args.sample_rate)
+    pocket.pocket_model = model
+    report = {"benchmark": "assembly", "model": "fake", "speed": args.speed, "sample_rate": args.sample_rate, "chunks": []}
+    work_dir = tempfile.mkdtemp(prefix="pocket_bench_")
+    try:
+        for count in args.chunk_words:
+            text = " ".join(corpus_words(count, seed=count))
+            entry = {"words": count}
+            path = os.path.join(work_dir, "chunk.wav")
+            peak, elapsed = peak_memory(legacy_assemble, {}, text, path, args.speed, model.sample_rate)
+            entry["legacy"] = {"peak_mb": round(peak / 2**20, 2), "total_s": round(elapsed, 3), "file_mb": round(os.path.getsize(path) / 2**20, 2)}
+            for sample_format in sorted(pocket.CHUNK_FORMATS):
+                pocket.configure_chunk_format(sample_format)
+                peak, elapsed = peak_memory(pocket.synthesize_chunk_to_file, {}, text, path, 0.7, args.speed)
+                entry[sample_format] = {"peak_mb": round(peak / 2**20, 2), "total_s": round(elapsed, 3), "file_mb": round(os.path.getsize(path) / 2**20, 2)}
+            entry["audio_s"] = round(pocket.wav_duration(path), 1)
+            report["chunks"].append(entry)
+    finally:
+        pocket.configure_chunk_format()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def bench_rtf(args):
+    if args.torch_threads:
+        pocket.torch.set_num_threads(args.torch_threads)
+    if not pocket.ensure_model_loaded():
+        raise RuntimeError("Failed to load PocketTTS model.")
+    state = pocket.prepare_voice_state(args.ref_audio, args.voice)
+    pocket.pocket_model.temp = args.temperature
+    sample_rate = pocket.pocket_model.sample_rate
+    text = args.text or RTF_PASSAGE
+
+    pocket._generate_pocket_safe(state, text)
+    runs = []
+    for _ in range(args.runs):
+        audio, elapsed = timed(pocket._generate_pocket_safe, state, text)
+        audio_seconds = len(audio) / sample_rate
+        runs.append({"generate_s": elapsed, "audio_s": round(audio_seconds, 3), "rtf": round(elapsed / audio_seconds, 4)})
+
+    streamed = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        first_audio = []
+
+        def on_audio(block):
+            if not first_audio:
+                first_audio.append(time.perf_counter() - started)
+
+        pocket.stream_speech(state, text, on_audio, args.temperature)
+        streamed.append({"first_audio_s": round(first_audio[0], 4), "total_s": round(time.perf_counter() - started, 4)})
+
+    rtfs = [run["rtf"] for run in runs]
+    return {
+        "benchmark": "rtf",
+        "voice": pocket.voice_identity(args.ref_audio, args.voice),
+        "temperature": args.temperature,
+        "text_chars": len(text),
+        "torch_threads": pocket.torch.get_num_threads(),
+        "runs": runs,
+        "rtf_mean": round(sum(rtfs) / len(rtfs), 4),
+        "rtf_best": min(rtfs),
+        "stream_runs": streamed,
+        "first_audio_s_best": min(run["first_audio_s"] for run in streamed),
+    }
+
+
+STARTUP_SCENARIOS = {
+    "txt": (),
+    "pdf": ("pdf",),
+    "epub": ("epub", "html"),
+    "url": ("web", "html"),
+    "generate": ("audio", "model"),
+    "eager": tuple(pocket.LIB_LOADERS),
+}
+
+STARTUP_PROBE = """
+import contextlib, json, sys, time
+started = time.perf_counter()
+with contextlib.redirect_stdout(sys.stderr):
+    import PocketTTSUI as pocket
+    module_s = time.perf_counter() - started
+    pocket.ensure_libs(*{features!r})
+    report = {{"module_s": module_s, "libs_s": time.perf_counter() - started - module_s, "imports": dict(pocket.import_times)}}
+    if {warm!r}:
+        report.update(pocket.warm_up_model({ref_audio!r}, {voice!r}) or {{"error": "model failed to load"}})
+print(json.dumps(report))
+"""
+
+
+def run_startup_probe(features, warm=False, ref_audio="", voice=pocket.VOICE_OPTIONS[0]):
+    code = STARTUP_PROBE.format(features=tuple(features), warm=warm, ref_audio=ref_audio, voice=voice)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(pocket.__file__)), capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"}
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report["process_s"] = wall
+    return report
+
+
+def bench_startup(args):
+    report = {"benchmark": "startup", "runs": args.runs, "scenarios": {}}
+    for name in args.scenarios:
+        runs = [run_startup_probe(STARTUP_SCENARIOS[name]) for _ in range(args.runs)]
+        ok = [run for run in runs if "error" not in run]
+        if not ok:
+            report["scenarios"][name] = {"error": runs[0]["error"]}
+            continue
+        report["scenarios"][name] = {
+            "features": list(STARTUP_SCENARIOS[name]),
+            "module_s_best": round(min(run["module_s"] for run in ok), 4),
+            "libs_s_best": round(min(run["libs_s"] for run in ok), 4),
+            "process_s_best": round(min(run["process_s"] for run in ok), 4),
+            "imports": ok[-1]["imports"],
+        }
+    if args.model:
+        report["warm_up"] = run_startup_probe(STARTUP_SCENARIOS["generate"], True, args.ref_audio, args.voice)
+    return report
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="PocketTTS pipeline benchmarks.")
+    parser.add_argument("--json", default="", help="Write the report to this path as well as stdout.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    speed = subparsers.add_parser("speed", help="In-process time-stretch vs. per-chunk FFmpeg atempo over a whole book.")
+    speed.add_argument("--chunks", type=int, default=300)
+    speed.add_argument("--chunk-seconds", dest="chunk_seconds", type=float, default=40.0)
+    speed.add_argument("--variants", type=int, default=4, help="Distinct synthetic chunks to cycle through.")
+    speed.add_argument("--speed", type=float, default=1.25)
+    speed.add_argument("--sample-rate", dest="sample_rate", type=int, default=24000)
+    speed.set_defaults(func=bench_speed)
+
+    segment = subparsers.add_parser("segment", help="Sentence index, word chunker and model sub-splitter on multi-megabyte text.")
+    segment.add_argument("--sizes-mb", dest="sizes_mb", type=float, nargs="+", default=[1, 4, 8])
+    segment.add_argument("--chunk-size", dest="chunk_size", type=int, default=pocket.DEFAULT_CHUNK_SIZE)
+    segment.add_argument("--unpunctuated-mb", dest="unpunctuated_mb", type=float, default=2.0, help="Cap for the punctuation-free input (the legacy splitter is quadratic on it).")
+    segment.set_defaults(func=bench_segment)
+
+    pipeline = subparsers.add_parser("pipeline", help="Pipeline overhead per stage with a deterministic fake model.")
+    pipeline.add_argument("--words", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    pipeline.add_argument("--rtf", type=float, default=0.0, help="Real-time factor the fake model sleeps for (0 = no inference cost).")
+    pipeline.add_argument("--chunk-size", dest="chunk_size", type=int, default=pocket.DEFAULT_CHUNK_SIZE)
+    pipeline.add_argument("--audio-chunks", dest="audio_chunks", type=int, default=10, help="Chunks per corpus run through the audio stages.")
+    pipeline.add_argument("--speed", type=float, default=1.25)
+    pipeline.add_argument("--sample-rate", dest="sample_rate", type=int, default=24000)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    assembly = subparsers.add_parser("assembly", help="Peak memory of chunk assembly: list-and-concatenate vs. streaming writer.")
+    assembly.add_argument("--chunk-words", dest="chunk_words", type=int, nargs="+", default=[250, 1000, 5000])
+    assembly.add_argument("--speed", type=float, default=1.25)
+    assembly.add_argument("--sample-rate", dest="sample_rate", type=int, default=24000)
+    assembly.set_defaults(func=bench_assembly)
+
+    locality = subparsers.add_parser("locality", help="Chunks a small edit changes (and a re-render synthesizes), greedy vs. stable chunking.")
+    locality.add_argument("--text", default="", help="Plain-text book to edit instead of the synthetic one.")
+    locality.add_argument("--kb", type=float, default=512, help="Size of the synthetic book.")
+    locality.add_argument("--chunk-sizes", dest="chunk_sizes", type=int, nargs="+", default=[pocket.DEFAULT_CHUNK_SIZE])
+    locality.add_argument("--edits", type=int, default=60)
+    locality.set_defaults(func=bench_locality)
+
+    rtf = subparsers.add_parser("rtf", help="Real-time factor of the real model on a fixed passage.")
+    rtf.add_argument("--voice", default=pocket.VOICE_OPTIONS[0])
+    rtf.add_argument("--ref-audio", dest="ref_audio", default="")
+    rtf.add_argument("--text", default="", help="Passage to synthesize instead of the built-in one.")
+    rtf.add_argument("--runs", type=int, default=3)
+    rtf.add_argument("--temperature", type=float, default=0.7)
+    rtf.add_argument("--torch-threads", dest="torch_threads", type=int, default=0)
+    rtf.set_defaults(func=bench_rtf)
+
+    startup = subparsers.add_parser("startup", help="Import cost per feature in fresh processes, and optionally model load and first generation.")
+    startup.add_argument("--scenarios", nargs="+", choices=sorted(STARTUP_SCENARIOS), default=list(STARTUP_SCENARIOS))
+    startup.add_argument("--runs", type=int, default=3)
+    startup.add_argument("--model", action="store_true", help="Also load the real model and time the first generation.")
+    startup.add_argument("--voice", default=pocket.VOICE_OPTIONS[0])
+    startup.add_argument("--ref-audio", dest="ref_audio", default="")
+    startup.set_defaults(func=bench_startup)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    pocket.ensure_libs("audio", "model")
+    with contextlib.redirect_stdout(sys.stderr):
+        report = args.func(args)
+    report["environment"] = {
+        "python": platform.python_version(),
+        "numpy": pocket.np.__version__,
+        "model_version": pocket.model_version(),
+        "cpus": os.cpu_count(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _Tensor:
+    def __init__(self, array):
+        self.array = array
+
+    def numpy(self):
+        return self.array
+
+
+class FakeModel:
+    # Stands in for the PocketTTS model: a quiet tone whose length follows
+    # the text, so every chunk writes real audio without loading torch.
+    sample_rate = 8000
+
+    def __init__(self, np):
+        self.np = np
+        self.temp = 0.7
+        self.calls = []
+        self.on_generate = None
+
+    def _audio(self, text):
+        frames = 40 * len(text)
+        return (0.2 * self.np.sin(self.np.arange(frames) * 0.07)).astype(self.np.float32)
+
+    def generate_audio(self, state, text):
+        self.calls.append(text)
+        if self.on_generate is not None:
+            self.on_generate(text)
+        return _Tensor(self._audio(text))
+
+    def generate_audio_stream(self, state, text):
+        self.calls.append(text)
+        audio = self._audio(text)
+        for start in range(0, len(audio), 800):
+            yield _Tensor(audio[start : start + 800])
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("soundfile")
+    import PocketTTSUI
+
+    PocketTTSUI.ensure_libs("audio")
+    model = FakeModel(np)
+    monkeypatch.setattr(PocketTTSUI, "pocket_model", model)
+    monkeypatch.setattr(PocketTTSUI, "prepare_voice_state", lambda ref_audio_path, voice_name: {"voice": voice_name})
+    monkeypatch.setattr(PocketTTSUI, "chunk_cache", None)
+    monkeypatch.setattr(PocketTTSUI, "phrase_memo", None)
+    monkeypatch.setattr(PocketTTSUI, "audio_polish", None)
+    monkeypatch.setattr(PocketTTSUI, "chunk_format", "float32")
+    monkeypatch.setattr(PocketTTSUI, "stop_event", PocketTTSUI.threading.Event())
+    PocketTTSUI.model_ready.set()
+    yield model
+    PocketTTSUI.model_ready.clear()
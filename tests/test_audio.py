@@ -0,0 +1,92 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+
+import PocketTTSUI
+from PocketTTSUI import SPOOL_SAMPLE_BYTES, PcmSpool, PhraseMemo, TimeStretcher, time_stretch
+
+RATE = 24000
+
+
+@pytest.fixture(autouse=True)
+def audio_libs():
+    PocketTTSUI.ensure_libs("audio")
+
+
+def _tone(seconds, frequency=220.0):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (0.3 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def _dominant_frequency(audio):
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+    return np.argmax(spectrum) * RATE / len(audio)
+
+
+@pytest.mark.parametrize("speed", [0.8, 1.25, 1.5])
+def test_time_stretch_changes_length_but_not_pitch(speed):
+    audio = _tone(2.0)
+    stretched = time_stretch(audio, speed, RATE)
+    assert len(stretched) == int(round(len(audio) / speed))
+    assert _dominant_frequency(stretched) == pytest.approx(220.0, abs=3.0)
+
+
+def test_streamed_stretch_matches_one_shot():
+    audio = _tone(1.5, 180.0)
+    whole = time_stretch(audio, 1.25, RATE)
+    stretcher = TimeStretcher(1.25, RATE)
+    blocks = [stretcher.process(audio[start : start + 1337]) for start in range(0, len(audio), 1337)]
+    streamed = np.concatenate(blocks + [stretcher.flush()])
+    np.testing.assert_allclose(streamed, whole, atol=1e-6)
+
+
+def _write_wav(path, audio):
+    sf.write(str(path), audio, RATE, subtype="PCM_16")
+    return str(path)
+
+
+def test_spool_appends_exports_and_compacts(tmp_path):
+    first, second, third = _tone(0.2, 200.0), _tone(0.3, 300.0), _tone(0.1, 400.0)
+    spool = PcmSpool(str(tmp_path / "chunks.pcm"), extent_mb=1)
+    spans = [spool.append(_write_wav(tmp_path / f"{n}.wav", audio))[:2] for n, audio in enumerate((first, second, third))]
+    spool.close()
+    assert [frames for _, frames in spans] == [len(first), len(second), len(third)]
+    assert spans[1][0] == len(first) * SPOOL_SAMPLE_BYTES
+
+    PcmSpool.export_wav(spool.path, *spans[1], RATE, str(tmp_path / "out.wav"))
+    exported, rate = sf.read(str(tmp_path / "out.wav"), dtype="int16")
+    expected, _ = sf.read(str(tmp_path / "1.wav"), dtype="int16")
+    assert rate == RATE
+    np.testing.assert_array_equal(exported, expected)
+
+    # Dropping the first chunk moves the others to the front, in order.
+    offsets = PcmSpool.compact(spool.path, spans[1:])
+    assert offsets == [0, len(second) * SPOOL_SAMPLE_BYTES]
+    PcmSpool.export_wav(spool.path, offsets[1], len(third), RATE, str(tmp_path / "moved.wav"))
+    moved, _ = sf.read(str(tmp_path / "moved.wav"), dtype="int16")
+    np.testing.assert_array_equal(moved, sf.read(str(tmp_path / "2.wav"), dtype="int16")[0])
+
+
+def test_phrase_memo_is_scoped_and_bounded():
+    state, other = {"voice": "a"}, {"voice": "b"}
+    audio = np.ones(100, dtype=np.float32)
+    memo = PhraseMemo(max_bytes=3 * audio.nbytes)
+    memo.put(state, 0.7, "Hello there.", audio, 1.0)
+    assert memo.get(state, 0.7, "Hello there.") is None
+
+    memo.begin("book")
+    memo.put(state, 0.7, "Hello  there.", audio, 1.0)
+    assert memo.get(state, 0.7, "Hello there.")[1] == 1.0
+    assert memo.get(other, 0.7, "Hello there.") is None
+    assert memo.get(state, 1.0, "Hello there.") is None
+
+    for number in range(3):
+        memo.put(state, 0.7, f"Line {number}.", audio, 1.0)
+    assert memo.get(state, 0.7, "Hello there.") is None
+    assert memo.get(state, 0.7, "Line 2.") is not None
+    memo.put(state, 0.7, "Too long.", np.ones(400, dtype=np.float32), 1.0)
+    assert memo.get(state, 0.7, "Too long.") is None
+
+    memo.begin("another book")
+    assert memo.get(state, 0.7, "Line 2.") is None
@@ -0,0 +1,40 @@
+import PocketTTSUI
+from PocketTTSUI import AudioPolisher, audition_key, render_audition, store_audition
+
+TEXT = "A short passage to audition the voice with."
+
+
+def _use_audition_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(PocketTTSUI, "audition_cache", PocketTTSUI.ChunkAudioCache(str(tmp_path / "auditions"), 64 * 1024 * 1024))
+
+
+def test_streamed_and_rendered_auditions_do_not_share_a_key(monkeypatch, tmp_path, fake_model):
+    _use_audition_cache(monkeypatch, tmp_path)
+    # The fake_model fixture puts audio_polish back afterwards.
+    PocketTTSUI.configure_audio_polish()
+    polished = audition_key(TEXT, "alba", 0.7, 1.0)
+    streamed = audition_key(TEXT, "alba", 0.7, 1.0, streamed=True)
+    assert polished != streamed
+
+    raw = fake_model._audio(TEXT)
+    store_audition(streamed, raw)
+    assert not PocketTTSUI.audition_cache.contains(polished)
+    path = render_audition(TEXT, "alba", 0.7, 1.0)
+    assert path == PocketTTSUI.audition_cache.lookup(polished)
+    rendered, _ = PocketTTSUI.sf.read(path, dtype="float32")
+    assert len(rendered) != len(raw) or not fake_model.np.allclose(rendered, raw)
+
+
+def test_without_polish_streamed_audio_is_the_rendered_audition(fake_model):
+    assert PocketTTSUI.audio_polish is None
+    assert audition_key(TEXT, "alba", 0.7, 1.25) == audition_key(TEXT, "alba", 0.7, 1.25, streamed=True)
+
+
+def test_polisher_trims_silence_and_levels_speech(fake_model):
+    np = fake_model.np
+    silence = np.zeros(4000, dtype=np.float32)
+    speech = fake_model._audio(TEXT) * np.float32(0.1)
+    polisher = AudioPolisher(fake_model.sample_rate)
+    out = np.concatenate([polisher.process(np.concatenate([silence, speech, silence])), polisher.flush()])
+    assert len(out) < len(speech) + 2 * len(silence)
+    assert np.sqrt(np.mean(np.square(out))) > np.sqrt(np.mean(np.square(speech)))
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import PocketTTSUI
+from PocketTTSUI import FairScheduler, _pack_frame, _read_frame
+
+
+@pytest.fixture(autouse=True)
+def audio_libs():
+    PocketTTSUI.ensure_libs("audio")
+
+
+def _read_all(stream):
+    blocks = []
+    while True:
+        block = _read_frame(stream)
+        if block is None:
+            return blocks
+        blocks.append(block)
+
+
+def test_frames_round_trip_with_an_empty_block():
+    sent = [np.linspace(-1, 1, 480, dtype=np.float32), np.zeros(0, dtype=np.float32), np.full(7, 0.25, dtype=np.float32)]
+    stream = io.BytesIO(b"".join(_pack_frame(block) for block in sent) + _pack_frame(None))
+    received = _read_all(stream)
+    assert [len(block) for block in received] == [480, 0, 7]
+    for got, want in zip(received, sent):
+        np.testing.assert_array_equal(got, want)
+    assert stream.read() == b""
+
+
+def test_error_frame_raises_with_the_server_message():
+    stream = io.BytesIO(_pack_frame(np.ones(3, dtype=np.float32)) + _pack_frame(RuntimeError("voice missing")))
+    assert len(_read_frame(stream)) == 3
+    with pytest.raises(RuntimeError, match="voice missing"):
+        _read_frame(stream)
+
+
+def test_truncated_stream_is_an_error():
+    data = _pack_frame(np.ones(16, dtype=np.float32))
+    with pytest.raises(ConnectionError):
+        _read_frame(io.BytesIO(data[:-4]))
+    with pytest.raises(ConnectionError):
+        _read_frame(io.BytesIO(b""))
+
+
+def test_scheduler_takes_turns_between_clients():
+    scheduler = FairScheduler()
+    for job in ("book-1", "book-2", "book-3"):
+        scheduler.submit("book", job)
+    scheduler.submit("preview", "sample")
+    client_id, job = scheduler.next_job()
+    assert (client_id, job) == ("book", "book-1")
+    scheduler.requeue(client_id, job)
+    assert scheduler.next_job() == ("preview", "sample")
+    assert scheduler.next_job() == ("book", "book-1")
+    assert scheduler.pending() == {"book": 2}
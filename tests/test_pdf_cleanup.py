@@ -0,0 +1,73 @@
+from PocketTTSUI import PdfTextCleaner
+
+
+def _roman(number):
+    numerals = [(10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+    text = ""
+    for value, numeral in numerals:
+        while number >= value:
+            text += numeral
+            number -= value
+    return text
+
+
+def _clean(pages):
+    cleaner = PdfTextCleaner()
+    return "".join(cleaner.clean(pages)), cleaner
+
+
+def test_roman_chapter_headings_are_kept():
+    pages = [f"{heading}\n\nThe story goes on for page {n}. It is long enough to read.\n\n{n + 1}" for n, heading in enumerate(["I", "II", "III", "IV", "V", "VI"])]
+    text, cleaner = _clean(pages)
+    for heading in ("I", "II", "III", "IV", "V", "VI"):
+        assert f"\n{heading}\n" in f"\n{text}"
+    assert cleaner.removed["page_numbers"] == 6
+
+
+def test_roman_words_on_their_own_line_are_kept():
+    pages = ["Mix\n\nStir the batter well.", "CD\n\nThe album was long.", "DC\n\nThe capital was busy.", "MD\n\nThe doctor was in."]
+    text, cleaner = _clean(pages)
+    for word in ("Mix", "CD", "DC", "MD"):
+        assert word in text
+    assert not cleaner.removed["page_numbers"]
+
+
+def test_lowercase_roman_page_sequence_is_dropped():
+    pages = [f"The preface continues on this page. It has a few sentences.\n\n{_roman(n)}" for n in range(1, 13)]
+    text, cleaner = _clean(pages)
+    assert not any(f"\n{_roman(n)}\n" in text for n in range(1, 13))
+    assert cleaner.removed["page_numbers"] == 12
+
+
+def test_lone_lowercase_numeral_is_kept():
+    pages = ["The list begins here.\n\nvi", "Another page of plain text.", "And one more page."]
+    text, cleaner = _clean(pages)
+    assert "vi" in text.split()
+    assert not cleaner.removed["page_numbers"]
+
+
+def test_arabic_page_sequence_is_dropped():
+    pages = [f"The chapter runs on across the pages. Nothing else is here.\n\n- {n} -" for n in range(40, 52)]
+    text, cleaner = _clean(pages)
+    assert not any(str(n) in text for n in range(40, 52))
+    # "- 40 -" counts as three words.
+    assert cleaner.removed["page_numbers"] == 36
+
+
+def test_chapter_number_headings_are_kept():
+    pages = []
+    for n in range(1, 13):
+        heading = f"{n // 3 + 1}\n\n" if n % 3 == 0 else ""
+        pages.append(f"{heading}The chapter text goes on for a while here.\n\n{n + 100}")
+    text, cleaner = _clean(pages)
+    for chapter in (2, 3, 4, 5):
+        assert f"\n{chapter}\n" in f"\n{text}"
+    assert not any(str(n + 100) in text for n in range(1, 13))
+    assert cleaner.removed["page_numbers"] == 12
+
+
+def test_number_title_is_kept():
+    pages = ["1984\n\nA novel.", "Part One\n\nIt was a bright cold day in April.", "The clocks were striking thirteen."]
+    text, cleaner = _clean(pages)
+    assert text.startswith("1984")
+    assert not cleaner.removed["page_numbers"]
@@ -0,0 +1,190 @@
+import os
+
+import pytest
+
+import PocketTTSUI
+from PocketTTSUI import ChapterMark, chapter_times, render_book, write_chapter_metadata
+
+BOOK = [
+    ChapterMark("Arrival"),
+    "The boat reached the island at dawn.",
+    "Gulls followed it into the harbour.",
+    ChapterMark("The Lighthouse"),
+    "Nobody had kept the light for years.",
+    "The stairs were wet and the lamp was cold.",
+    "She climbed them anyway.",
+]
+TEXTS = [chunk for chunk in BOOK if not isinstance(chunk, ChapterMark)]
+
+
+def _seconds(text):
+    # The fake model writes 40 frames per character at 8 kHz.
+    return 40 * len(text) / 8000
+
+
+def _render(tmp_path, chunks=BOOK, **options):
+    options.setdefault("combine_mp3", False)
+    return render_book({"voice": "alba"}, None, str(tmp_path / "book"), chunks=list(chunks), chunk_size=50, **options)
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return path
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    # Records what would be handed to ffmpeg and writes empty outputs.
+    calls = {"chapters": [], "segments": [], "m4b": [], "mp3": []}
+
+    def encode_chapter(wav_files, out_path):
+        calls["chapters"].append(os.path.basename(out_path))
+        _touch(out_path)
+        return sum(PocketTTSUI.wav_duration(path) for path in wav_files)
+
+    def encode_spool_chapter(spool_path, spans, sample_rate, out_path):
+        calls["chapters"].append(os.path.basename(out_path))
+        _touch(out_path)
+        return sum(frames for _, frames in spans) / sample_rate
+
+    def encode_segment(wav_path, out_path):
+        calls["segments"].append(os.path.basename(out_path))
+        _touch(out_path)
+        return PocketTTSUI.wav_duration(wav_path)
+
+    def package_m4b(chapters, output_dir, custom_name="final_output"):
+        calls["m4b"].append([(title, duration) for title, _, duration in chapters])
+        return _touch(os.path.join(output_dir, f"{custom_name}.m4b"))
+
+    def combine_output_to_mp3(output_files, output_dir, custom_name="final_output", cleanup=True, chapters=None, stream_copy=False):
+        calls["mp3"].append(([os.path.basename(path) for path in output_files], chapters))
+        return _touch(os.path.join(output_dir, f"{custom_name}.mp3"))
+
+    def combine_spool_to_mp3(spool_path, spans, sample_rate, output_dir, custom_name="final_output", chapters=None):
+        calls["mp3"].append((list(spans), chapters))
+        return _touch(os.path.join(output_dir, f"{custom_name}.mp3"))
+
+    for function in (encode_chapter, encode_spool_chapter, encode_segment, package_m4b, combine_output_to_mp3, combine_spool_to_mp3):
+        monkeypatch.setattr(PocketTTSUI, function.__name__, function)
+    return calls
+
+
+def _stop_after(count):
+    stop = PocketTTSUI.threading.Event()
+    done = []
+
+    def on_chunk(idx, status):
+        if status == "done":
+            done.append(idx)
+            if len(done) == count:
+                stop.set()
+
+    return stop, on_chunk
+
+
+def test_interrupted_render_resumes_where_it_stopped(tmp_path, fake_model):
+    stop, on_chunk = _stop_after(2)
+    first = _render(tmp_path, stop=stop, on_chunk=on_chunk)
+    assert first["status"] == "stopped"
+    assert fake_model.calls == TEXTS[:2]
+
+    second = _render(tmp_path)
+    assert second["status"] == "ok"
+    assert second["resumed"] == 2
+    assert fake_model.calls == TEXTS
+    assert [os.path.basename(path) for path in second["files"]] == [f"output_{n}.wav" for n in range(1, 6)]
+
+
+def test_resume_renders_only_the_edited_chunk(tmp_path, fake_model):
+    _render(tmp_path)
+    edited = list(BOOK)
+    edited[5] = "The stairs were dry and the lamp was warm."
+    fake_model.calls.clear()
+    result = _render(tmp_path, edited)
+    assert result["status"] == "ok"
+    assert result["resumed"] == 4
+    assert fake_model.calls == [edited[5]]
+
+
+def test_mp3_merge_marks_each_chapter(tmp_path, fake_model, fake_ffmpeg):
+    result = _render(tmp_path, combine_mp3=True, chapters=True)
+    assert result["status"] == "ok"
+    assert result["mp3"].endswith("final_output.mp3")
+    (files, chapters), = fake_ffmpeg["mp3"]
+    assert files == [f"output_{n}.wav" for n in range(1, 6)]
+    first = sum(_seconds(text) for text in TEXTS[:2])
+    book = sum(_seconds(text) for text in TEXTS)
+    assert [title for title, _, _ in chapters] == ["Arrival", "The Lighthouse"]
+    assert chapters[0][1:] == pytest.approx((0.0, first))
+    assert chapters[1][1:] == pytest.approx((first, book))
+
+    fake_model.calls.clear()
+    again = _render(tmp_path, combine_mp3=True, chapters=True)
+    assert again["status"] == "ok"
+    assert again["resumed"] == len(TEXTS)
+    assert fake_model.calls == []
+    assert len(fake_ffmpeg["mp3"]) == 1
+
+
+def test_segmented_mp3_is_a_stream_copy_of_the_segments(tmp_path, fake_model, fake_ffmpeg):
+    result = _render(tmp_path, combine_mp3=True, segmented_mp3=True, chapters=True)
+    assert result["status"] == "ok"
+    segments = [f"segment_{n}.mp3" for n in range(1, 6)]
+    assert sorted(fake_ffmpeg["segments"]) == segments
+    (files, chapters), = fake_ffmpeg["mp3"]
+    assert files == segments
+    assert chapters[1][1] == pytest.approx(sum(_seconds(text) for text in TEXTS[:2]), abs=1e-3)
+    assert not [name for name in os.listdir(tmp_path / "book") if name.endswith(".wav")]
+
+
+@pytest.mark.parametrize("sample_format", ["float32", "spool"])
+def test_m4b_encodes_chapters_and_packages_them(tmp_path, monkeypatch, fake_model, fake_ffmpeg, sample_format):
+    monkeypatch.setattr(PocketTTSUI, "chunk_format", sample_format)
+    result = _render(tmp_path, combine_mp3=True, book_format="m4b")
+    assert result["status"] == "ok"
+    assert result["m4b"].endswith("final_output.m4b")
+    assert fake_ffmpeg["chapters"] == ["001 Arrival.m4a", "002 The Lighthouse.m4a"]
+    assert [chapter["title"] for chapter in result["chapters"]] == ["Arrival", "The Lighthouse"]
+    (chapters,) = fake_ffmpeg["m4b"]
+    assert [title for title, _ in chapters] == ["Arrival", "The Lighthouse"]
+    assert [duration for _, duration in chapters] == pytest.approx(
+        [sum(_seconds(text) for text in TEXTS[:2]), sum(_seconds(text) for text in TEXTS[2:])], abs=1e-3
+    )
+
+    # Editing the second chapter re-renders and re-encodes only that chapter.
+    edited = list(BOOK)
+    edited[6] = "She climbed them slowly."
+    fake_model.calls.clear()
+    again = _render(tmp_path, edited, combine_mp3=True, book_format="m4b")
+    assert again["status"] == "ok"
+    # The edited chunk is rendered as it is registered; the chapter's other
+    # chunks were merged away and follow once the chapter is closed.
+    assert sorted(fake_model.calls) == sorted(TEXTS[2:4] + [edited[6]])
+    assert fake_ffmpeg["chapters"][2:] == ["002 The Lighthouse.m4a"]
+    assert len(fake_ffmpeg["m4b"]) == 2
+
+
+def test_spooled_mp3_reads_every_chunk_from_the_spool(tmp_path, monkeypatch, fake_model, fake_ffmpeg):
+    monkeypatch.setattr(PocketTTSUI, "chunk_format", "spool")
+    stop, on_chunk = _stop_after(3)
+    assert _render(tmp_path, combine_mp3=True, stop=stop, on_chunk=on_chunk)["status"] == "stopped"
+    result = _render(tmp_path, combine_mp3=True)
+    assert result["status"] == "ok"
+    assert result["resumed"] == 3
+    (spans, _), = fake_ffmpeg["mp3"]
+    assert [frames for _, frames in spans] == [40 * len(text) for text in TEXTS]
+    assert not [name for name in os.listdir(tmp_path / "book") if name.endswith(".wav")]
+
+
+def test_chapter_metadata_lists_each_chapter_in_milliseconds(tmp_path):
+    chapters = chapter_times([("One", 1.25), ("Two; =part #2", 2.5)])
+    assert chapters == [("One", 0.0, 1.25), ("Two; =part #2", 1.25, 3.75)]
+    path = tmp_path / "chapters.ffmeta"
+    write_chapter_metadata(str(path), chapters, "Book")
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == ";FFMETADATA1"
+    assert "title=Book" in lines
+    assert lines.count("[CHAPTER]") == 2
+    assert "START=1250" in lines and "END=3750" in lines
+    assert r"title=Two\; \=part \#2" in lines
@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+
+import PocketTTSUI
+from PocketTTSUI import RenderJournal, render_book
+
+PARAMS = {"chunk_size": 50, "chunking": "greedy"}
+CHUNKS = [f"Sentence number {n} of the book." for n in range(8)]
+
+
+@pytest.fixture
+def snapshots(monkeypatch):
+    # Counts full rewrites of the journal file.
+    writes = []
+    write_json_atomic = PocketTTSUI.write_json_atomic
+
+    def counting(path, payload):
+        writes.append(os.path.basename(path))
+        write_json_atomic(path, payload)
+
+    monkeypatch.setattr(PocketTTSUI, "write_json_atomic", counting)
+    return writes
+
+
+def _journal(tmp_path, count=3):
+    journal = RenderJournal(str(tmp_path), PARAMS)
+    for n in range(count):
+        journal.register(f"hash{n}")
+    journal.finish_registration()
+    return journal
+
+
+def _log_lines(tmp_path):
+    with open(tmp_path / RenderJournal.LOG_NAME, encoding="utf-8") as handle:
+        return handle.readlines()
+
+
+def test_marks_append_to_the_log_instead_of_rewriting_the_journal(tmp_path, snapshots):
+    journal = _journal(tmp_path)
+    written = len(snapshots)
+    for idx in range(3):
+        open(journal.file_path(idx), "wb").close()
+        journal.mark(idx, "done")
+    assert len(snapshots) == written
+    assert len(_log_lines(tmp_path)) == 1 + 3
+    assert [entry["status"] for entry in RenderJournal.read(str(tmp_path))["chunks"]] == ["done"] * 3
+
+    journal.close()
+    assert not os.path.exists(tmp_path / RenderJournal.LOG_NAME)
+    with open(tmp_path / RenderJournal.FILE_NAME, encoding="utf-8") as handle:
+        assert [entry["status"] for entry in json.load(handle)["chunks"]] == ["done"] * 3
+
+
+def test_a_torn_last_line_and_a_stale_log_are_ignored(tmp_path):
+    journal = _journal(tmp_path)
+    journal.mark(0, "done")
+    journal.mark(1, "done")
+    journal._log.write('{"chunk": 2, "entry": {"hash"')
+    journal._log.flush()
+    assert [entry["status"] for entry in RenderJournal.read(str(tmp_path))["chunks"]] == ["done", "done", "pending"]
+
+    # A log from before the last snapshot was already folded into it.
+    lines = _log_lines(tmp_path)
+    journal.save()
+    with open(tmp_path / RenderJournal.LOG_NAME, "w", encoding="utf-8") as handle:
+        handle.write(lines[0] + json.dumps({"chunk": 0, "entry": {"hash": "other", "file": "x.wav", "status": "failed"}}) + "\n")
+    assert RenderJournal.read(str(tmp_path))["chunks"][0]["hash"] == "hash0"
+
+
+def test_render_writes_the_journal_a_fixed_number_of_times(tmp_path, fake_model, snapshots):
+    writes = []
+    for count in (2, len(CHUNKS)):
+        del snapshots[:]
+        result = render_book({"voice": "alba"}, None, str(tmp_path / str(count)), chunks=CHUNKS[:count], combine_mp3=False)
+        assert result["status"] == "ok"
+        writes.append(snapshots.count(RenderJournal.FILE_NAME))
+    assert writes[0] == writes[1] <= 3
+
+
+def test_crashed_render_resumes_from_the_log(tmp_path, monkeypatch, fake_model):
+    output_directory = str(tmp_path / "book")
+    stop = PocketTTSUI.threading.Event()
+
+    def on_chunk(idx, status):
+        if status == "done" and idx == 2:
+            stop.set()
+
+    # A crash leaves the log behind without folding it into the snapshot.
+    with monkeypatch.context() as patch:
+        patch.setattr(RenderJournal, "close", lambda self: None)
+        first = render_book({"voice": "alba"}, None, output_directory, chunks=CHUNKS, combine_mp3=False, stop=stop, on_chunk=on_chunk)
+    assert first["status"] == "stopped"
+    with open(os.path.join(output_directory, RenderJournal.FILE_NAME), encoding="utf-8") as handle:
+        assert all(entry["status"] == "pending" for entry in json.load(handle)["chunks"])
+    assert len(_log_lines(tmp_path / "book")) == 1 + 3
+
+    fake_model.calls.clear()
+    second = render_book({"voice": "alba"}, None, output_directory, chunks=CHUNKS, combine_mp3=False)
+    assert second["status"] == "ok"
+    assert second["resumed"] == 3
+    assert fake_model.calls == CHUNKS[3:]
+    assert not os.path.exists(os.path.join(output_directory, RenderJournal.LOG_NAME))
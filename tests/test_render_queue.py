@@ -0,0 +1,83 @@
+import threading
+
+import PocketTTSUI
+from PocketTTSUI import RenderQueue, RenderScheduler
+
+SETTINGS = {"voice": "alba", "chunk_size": 50, "temperature": 0.7, "speed": 1.0, "start_chunk": 1, "combine_mp3": False}
+CHUNKS = ["The first chunk of the book.", "Then a second one follows.", "And the third closes it."]
+
+
+def _queue(tmp_path):
+    return RenderQueue(str(tmp_path / RenderQueue.FILE_NAME))
+
+
+def test_jobs_are_claimed_by_priority_then_order(tmp_path):
+    render_queue = _queue(tmp_path)
+    first = render_queue.enqueue("first", str(tmp_path / "a"), SETTINGS)
+    second = render_queue.enqueue("second", str(tmp_path / "b"), SETTINGS)
+    urgent = render_queue.enqueue("urgent", str(tmp_path / "c"), SETTINGS, priority=5)
+    render_queue.move(second, -1)
+    assert [render_queue.claim_next("runner")["id"] for _ in range(3)] == [urgent, second, first]
+    assert render_queue.claim_next("runner") is None
+
+
+def test_pause_resume_and_cancel_follow_the_job_state(tmp_path):
+    render_queue = _queue(tmp_path)
+    job_id = render_queue.enqueue("book", str(tmp_path / "book"), SETTINGS)
+    assert render_queue.pause(job_id)
+    assert render_queue.claim_next("runner") is None
+    assert render_queue.resume(job_id)
+    assert render_queue.claim_next("runner")["status"] == "running"
+    assert render_queue.cancel(job_id)
+    assert render_queue.progress(job_id) == "cancelling"
+    assert render_queue.finish(job_id, {"status": "stopped"}) == "cancelled"
+    assert not render_queue.cancel(job_id)
+    assert render_queue.remove(job_id)
+
+
+def test_stale_runner_gives_its_job_back(tmp_path):
+    render_queue = _queue(tmp_path)
+    job_id = render_queue.enqueue("book", str(tmp_path / "book"), SETTINGS)
+    render_queue.claim_next("crashed")
+    render_queue.recover(stale_seconds=0)
+    assert render_queue.get(job_id)["status"] == "queued"
+
+
+def test_scheduler_releases_the_model_between_chunks(tmp_path, fake_model):
+    render_queue = _queue(tmp_path)
+    job_id = render_queue.enqueue("book", str(tmp_path / "book"), SETTINGS, chunks=CHUNKS)
+    model_lock = threading.Lock()
+    held, free = [], []
+    fake_model.on_generate = lambda text: held.append(model_lock.locked())
+
+    def on_chunk(job, idx, status):
+        if status == "done" and model_lock.acquire(blocking=False):
+            free.append(idx)
+            model_lock.release()
+
+    RenderScheduler(render_queue, model_lock=model_lock, on_chunk=on_chunk).run()
+    assert render_queue.get(job_id)["status"] == "ok"
+    assert held == [True] * len(CHUNKS)
+    assert free == [0, 1, 2]
+
+
+def test_stopping_a_job_leaves_the_global_stop_alone(tmp_path, fake_model):
+    render_queue = _queue(tmp_path)
+    job_id = render_queue.enqueue("book", str(tmp_path / "book"), SETTINGS, chunks=CHUNKS)
+
+    def on_chunk(job, idx, status):
+        if status == "done":
+            scheduler.stop_job(job)
+
+    scheduler = RenderScheduler(render_queue, on_chunk=on_chunk)
+    scheduler.run()
+    assert render_queue.get(job_id)["status"] == "paused"
+    assert len(fake_model.calls) == 1
+    assert not PocketTTSUI.stop_event.is_set()
+
+    # The next job gets a fresh stop event.
+    render_queue.resume(job_id)
+    scheduler.on_chunk = lambda job, idx, status: None
+    scheduler.run()
+    assert render_queue.get(job_id)["status"] == "ok"
+    assert len(fake_model.calls) == len(CHUNKS)
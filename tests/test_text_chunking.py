@@ -0,0 +1,175 @@
+import itertools
+import random
+import re
+
+import pytest
+
+from PocketTTSUI import (
+    CHUNKING_MODES,
+    MODEL_CHUNK_CHARS,
+    ChunkMatcher,
+    build_sentence_index,
+    chunk_text_hash,
+    diff_chunks,
+    iter_text_chunks,
+    segment_words,
+    split_for_model,
+    split_text_into_chunks,
+    split_text_into_stable_chunks,
+)
+
+LONG_SENTENCE = "The storm rolled over the hills and " + "the rain kept falling on the roofs of the town " * 4 + "all night."
+
+
+def _squeeze(text):
+    return re.sub(r"\s+", "", text)
+
+
+def _random_text(rng, sentences):
+    words = ["storm", "a", "harbour", "the", "lighthouse", "keeper", "waited", "quietly", "antidisestablishmentarianism", "x" * 230]
+    parts = []
+    for _ in range(sentences):
+        length = rng.choice([1, 3, 8, 20, 60])
+        sentence = " ".join(rng.choice(words) for _ in range(length))
+        parts.append(sentence[0].upper() + sentence[1:] + rng.choice([".", "!", "?", "", ","]))
+    return " ".join(parts)
+
+
+def test_model_pieces_fit_and_lose_nothing():
+    rng = random.Random(7)
+    for _ in range(300):
+        text = _random_text(rng, rng.randint(0, 40))
+        pieces = split_for_model(text)
+        assert all(0 < len(piece) <= MODEL_CHUNK_CHARS for piece in pieces)
+        assert _squeeze("".join(pieces)) == _squeeze(text)
+
+
+def test_long_sentence_tail_joins_the_next_sentence():
+    assert len(LONG_SENTENCE) > MODEL_CHUNK_CHARS
+    pieces = split_for_model(f"{LONG_SENTENCE} The town woke up wet.")
+    assert len(pieces) == 2
+    assert pieces[1].endswith("all night. The town woke up wet.")
+
+
+def test_long_sentence_at_the_end_is_split_evenly():
+    pieces = split_for_model(LONG_SENTENCE)
+    assert len(pieces) == 2
+    assert min(len(piece) for piece in pieces) > MODEL_CHUNK_CHARS // 3
+    assert _squeeze("".join(pieces)) == _squeeze(LONG_SENTENCE)
+
+
+def test_short_sentences_are_grouped_up_to_the_limit():
+    text = " ".join(f"Sentence number {n} is short." for n in range(30))
+    pieces = split_for_model(text)
+    assert all(len(piece) < MODEL_CHUNK_CHARS for piece in pieces)
+    assert all(len(piece) > MODEL_CHUNK_CHARS - 40 for piece in pieces[:-1])
+    assert all(piece.endswith(".") for piece in pieces)
+
+
+WORDS = "the keeper of the lighthouse watched ships pass in the grey morning while gulls circled above cold water".split()
+
+
+def _prose(seed, sentences):
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(sentences):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.choice([3, 6, 10, 15, 25, 40])))
+        parts.append(sentence[0].upper() + sentence[1:] + rng.choice([".", ".", "!", "?"]))
+    return " ".join(parts)
+
+
+def _chunks(text, chunk_size, chunking):
+    return [" ".join(chunk) for chunk in iter_text_chunks(text, chunk_size, chunking=chunking)]
+
+
+def _sentences(text):
+    starts = [0] + build_sentence_index(text)
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)]) if text[start:end].strip()]
+
+
+def _changed(before, after, chunking):
+    events = list(diff_chunks([chunk_text_hash(chunk) for chunk in before], after, chunking == "stable"))
+    return events[-1], [event["chunks"] for event in events if event["event"] == "changed"]
+
+
+@pytest.mark.parametrize("chunking", CHUNKING_MODES)
+@pytest.mark.parametrize("chunk_size", [20, 100, 250])
+def test_chunks_stay_within_the_size_limit_and_keep_every_word(chunking, chunk_size):
+    text = _prose(chunk_size, 400)
+    chunks = _chunks(text, chunk_size, chunking)
+    assert max(len(chunk.split()) for chunk in chunks) <= chunk_size + 20
+    assert " ".join(chunks).split() == text.split()
+
+
+@pytest.mark.parametrize("chunking", CHUNKING_MODES)
+def test_streamed_parts_chunk_like_the_whole_text(chunking):
+    rng = random.Random(3)
+    text = _prose(11, 600)
+    words, sentence_ends = segment_words(text)
+    split = split_text_into_stable_chunks if chunking == "stable" else split_text_into_chunks
+    whole = [" ".join(chunk) for chunk in split(words, 120, 20, sentence_ends)]
+    sentences = _sentences(text)
+    parts = []
+    while sentences:
+        take = rng.randint(1, 30)
+        parts.append(" ".join(sentence.strip() for sentence in sentences[:take]))
+        sentences = sentences[take:]
+    assert [" ".join(chunk) for chunk in iter_text_chunks(parts, 120, chunking=chunking)] == whole
+
+
+@pytest.mark.parametrize("edit", ["insert", "delete", "word"])
+@pytest.mark.parametrize("share", [0.1, 0.5, 0.9])
+def test_stable_chunking_keeps_an_edit_local(edit, share):
+    text = _prose(5, 800)
+    before = _chunks(text, 100, "stable")
+    sentences = _sentences(text)
+    at = int(len(sentences) * share)
+    if edit == "insert":
+        sentences.insert(at, " Nobody had expected the letter to arrive that morning.")
+    elif edit == "delete":
+        del sentences[at]
+    else:
+        sentences[at] = sentences[at].replace(" ", " lantern ", 1)
+    after = _chunks("".join(sentences), 100, "stable")
+
+    summary, runs = _changed(before, after, "stable")
+    # A boundary forced by the size limit can shift the next few chunks
+    # until an anchor sentence lines them up again; the rest are reused.
+    assert 1 <= summary["changed"] <= 8
+    assert summary["reused"] == len(after) - summary["changed"]
+    # The changed chunks sit together, starting at the chunk holding the edit.
+    assert len(runs) == 1
+    edit_word = len("".join(sentences[:at]).split())
+    ends = list(itertools.accumulate(len(chunk.split()) for chunk in after))
+    edit_chunk = next(number for number, end in enumerate(ends, 1) if end > edit_word)
+    first, last = runs[0]
+    assert first - 1 <= edit_chunk <= last + 1
+
+
+def test_stable_chunking_changes_about_two_chunks_per_edit():
+    text = _prose(5, 800)
+    before = _chunks(text, 100, "stable")
+    rng = random.Random(1)
+    changed = []
+    for number in range(30):
+        sentences = _sentences(text)
+        at = rng.randrange(1, len(sentences) - 1)
+        if number % 3 == 0:
+            sentences.insert(at, " Nobody had expected the letter to arrive that morning.")
+        elif number % 3 == 1:
+            del sentences[at]
+        else:
+            sentences[at] = sentences[at].replace(" ", " lantern ", 1)
+        summary, _ = _changed(before, _chunks("".join(sentences), 100, "stable"), "stable")
+        changed.append(summary["changed"])
+    assert sum(changed) / len(changed) <= 2.5
+    assert max(changed) <= 8
+
+
+def test_chunk_matcher_reuses_moved_chunks_only_by_content():
+    previous = ["a", "b", "c", "b"]
+    by_position = ChunkMatcher(previous)
+    assert [by_position.match(idx, digest) for idx, digest in enumerate(["x", "a", "c", "b"])] == [None, None, 2, 3]
+    by_content = ChunkMatcher(previous, by_content=True)
+    assert [by_content.match(idx, digest) for idx, digest in enumerate(["x", "a", "b", "b", "b"])] == [None, 0, 1, 3, None]
+    assert by_content.unmatched() == [2]
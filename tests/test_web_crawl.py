@@ -0,0 +1,105 @@
+import hashlib
+import http.server
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+import PocketTTSUI
+from PocketTTSUI import ChapterMark, HttpCache, iter_url_parts
+
+CHAPTERS = [("start", "The crew sets out at dawn."), ("middle", "The storm breaks over the ship."), ("end", "They reach the harbour at last.")]
+
+
+def _chapter_page(number):
+    slug, text = CHAPTERS[number - 1]
+    next_link = f'<a href="/story/chapter/{number + 1}/{CHAPTERS[number][0]}">Next chapter</a>' if number < len(CHAPTERS) else ""
+    return f"<html><body><h1>Chapter {number}</h1><p>{text}</p>{next_link}</body></html>"
+
+
+PAGES = {f"/story/chapter/{number}/{slug}": _chapter_page(number) for number, (slug, _) in enumerate(CHAPTERS, start=1)}
+PAGES["/story/contents"] = (
+    "<html><body><h1>Contents</h1>"
+    + "".join(f'<a href="/story/chapter/{number}/{slug}">Chapter {number}</a>' for number, (slug, _) in enumerate(CHAPTERS, start=1))
+    + '<a href="/about">About</a></body></html>'
+)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        body = PAGES.get(self.path)
+        if body is None:
+            self.server.log.append((self.path, 404))
+            self.send_error(404)
+            return
+        body = body.encode("utf-8")
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self.server.log.append((self.path, 304))
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.server.log.append((self.path, 200))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.log = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(PocketTTSUI, "web_cache", HttpCache(str(tmp_path / "web-cache")))
+    try:
+        yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _crawl(url, mode):
+    return list(iter_url_parts(url, mode, connections=2))
+
+
+def test_page_mode_reads_one_page(site):
+    server, root = site
+    parts = _crawl(f"{root}/story/chapter/1/start", "page")
+    assert parts == [CHAPTERS[0][1]]
+    assert [path for path, _ in server.log] == ["/story/chapter/1/start"]
+
+
+def test_next_mode_follows_the_chain(site):
+    _, root = site
+    parts = _crawl(f"{root}/story/chapter/1/start", "next")
+    assert [part.title for part in parts if isinstance(part, ChapterMark)] == ["Chapter 1", "Chapter 2", "Chapter 3"]
+    assert [part.strip() for part in parts if isinstance(part, str)] == [text for _, text in CHAPTERS]
+
+
+def test_toc_mode_keeps_table_order_and_skips_other_links(site):
+    server, root = site
+    parts = _crawl(f"{root}/story/contents", "toc")
+    assert [part.title for part in parts if isinstance(part, ChapterMark)] == ["Chapter 1", "Chapter 2", "Chapter 3"]
+    assert [part.strip() for part in parts if isinstance(part, str)] == [text for _, text in CHAPTERS]
+    assert "/about" not in [path for path, _ in server.log]
+
+
+def test_second_crawl_revalidates_with_etag(site):
+    server, root = site
+    first = _crawl(f"{root}/story/contents", "toc")
+    assert {status for _, status in server.log} == {200}
+    server.log.clear()
+    second = _crawl(f"{root}/story/contents", "toc")
+    assert second == first
+    assert sorted(server.log) == sorted((path, 304) for path in PAGES)